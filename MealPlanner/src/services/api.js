@@ -123,14 +123,26 @@ export const logFood = async ({ user_id, food_item, meal_time,log_date }) => {
   return response.data;
 };
 
+// Largest page get_logs serves (MAX_LOG_PAGE on the backend)
+const FOOD_LOG_PAGE_SIZE = 500;
+
 export const fetchFoodLog = async (userId) => {
   try {
-    const response = await api.get('/foodlog/get_logs', {
-      params: {
-        user_id: userId,
-      },
-    });
-    return response.data; // Return the data directly for easier consumption
+    // get_logs is paged; follow X-Next-Cursor until the whole history is read
+    const logs = [];
+    let cursor;
+    do {
+      const response = await api.get('/foodlog/get_logs', {
+        params: {
+          user_id: userId,
+          limit: FOOD_LOG_PAGE_SIZE,
+          cursor,
+        },
+      });
+      logs.push(...response.data);
+      cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return logs; // Return the data directly for easier consumption
   } catch (error) {
     console.error('Error fetching food logs:', error);
     throw error; // Re-throw the error to be handled by the caller
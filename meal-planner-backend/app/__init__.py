@@ -1,21 +1,23 @@
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 
-db = SQLAlchemy()
+from .db import db
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     CORS(app)
     
     # Configure the MySQL Database URI
     app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+mysqlconnector://root:@localhost/Meal planner'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Overrides, e.g. an SQLite database for the tests
+    if config:
+        app.config.update(config)
 
     db.init_app(app)
 
     # Import routes and register blueprints
-    from .routes import users, meal_plans, meals, food_items, progress_tracking, feedback, provider_interactions, foodlog, nutritionalanalysis, User_meal_plan, diseases, Messages
+    from .routes import users, meal_plans, meals, food_items, progress_tracking, feedback, provider_interactions, foodlog, nutritionalanalysis, User_meal_plan, diseases, Messages, jobs
     
     app.register_blueprint(users.bp, url_prefix='/api/users')
     app.register_blueprint(meal_plans.bp, url_prefix='/api/meal_plans')
@@ -29,6 +31,17 @@ def create_app():
     app.register_blueprint(User_meal_plan.bp, url_prefix='/api/user_meal_plan')
     app.register_blueprint(diseases.bp, url_prefix='/api/diseases')
     app.register_blueprint(Messages.bp, url_prefix='/api/messages')
+    app.register_blueprint(jobs.bp, url_prefix='/api/jobs')
+
+    # Background worker pool for the heavy endpoints' ?async=1 mode; worker
+    # processes of batch commands run without one (JOB_QUEUE=False)
+    if app.config.get('JOB_QUEUE', True):
+        from .models.jobs import init_job_queue
+        init_job_queue(app)
+
+    # Register flask CLI commands
+    from .commands import register_commands
+    register_commands(app)
     
 
     return app
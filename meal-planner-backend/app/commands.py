@@ -0,0 +1,144 @@
+import time
+from datetime import date, datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .db import db
+
+from .models.batch_generation import resolve_patients, generate_plans, save_generated_plans
+from .models.plan_solver import SOLVERS
+from .models.daily_intake import rebuild_daily_intake
+from .models.schema_upgrade import upgrade_schema
+from .models.catalog_import import (READERS, IMPORT_FORMATS, IMPORT_BATCH_SIZE, IMPORT_CHUNK_SIZE,
+                                    CatalogImportError, import_format, import_food_items)
+from .models.analysis_batch import refresh_all_analysis, count_logged_users, USER_CHUNK_SIZE, FETCH_SIZE
+from .models.jobs import job_queue, DEFAULT_JOB_TIMEOUT
+
+
+@click.command('generate-meal-plans')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Patient to plan for (repeatable).')
+@click.option('--stage-name-id', 'stage_name_ids', type=int, multiple=True, help='Plan for every patient at this stage (repeatable).')
+@click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='First day of the plan (default: today).')
+@click.option('--solver', type=click.Choice(sorted(SOLVERS)), default='greedy')
+@click.option('--time-budget-ms', type=int, default=None, help='Per-patient solver time budget.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+@click.option('--seed', type=int, default=None, help='Base seed, for reproducible plans.')
+@with_appcontext
+def generate_meal_plans_command(user_ids, stage_name_ids, start_date, solver, time_budget_ms, workers, seed):
+    """Generate and save weekly meal plans for many patients in parallel."""
+    patients = resolve_patients(list(user_ids), list(stage_name_ids))
+    if not patients:
+        raise click.ClickException('No patients with a meal plan found')
+
+    options = {'time_budget': time_budget_ms / 1000} if time_budget_ms is not None else {}
+    start = start_date.date() if start_date else date.today()
+
+    click.echo(f'Generating plans for {len(patients)} patients starting {start.isoformat()}')
+    started = time.perf_counter()
+    results = generate_plans(patients, solver, options, workers=workers, seed=seed)
+    generated, rows = save_generated_plans(results, start)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Saved {rows} rows for {generated} patients in {elapsed:.1f}s '
+               f'({generated / elapsed if elapsed else generated:.1f} patients/s)')
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create any missing tables (existing tables are left untouched)."""
+    db.create_all()
+    click.echo('Database tables created')
+
+
+@click.command('upgrade-db')
+@with_appcontext
+def upgrade_db_command():
+    """Create missing tables, columns, indexes and unique constraints on an existing database."""
+    created = upgrade_schema()
+    for name, removed in created:
+        click.echo(f'Created {name}' + (f' (removed {removed} duplicate rows)' if removed else ''))
+    click.echo('Database schema is up to date')
+
+
+@click.command('rebuild-daily-intake')
+@with_appcontext
+def rebuild_daily_intake_command():
+    """Recompute the daily_intake rollup from all food logs."""
+    rebuild_daily_intake()
+    db.session.commit()
+    click.echo('Daily intake rollup rebuilt')
+
+
+@click.command('refresh-analysis')
+@click.option('--workers', type=int, default=1, help='Worker processes, each handling a range of user_ids.')
+@click.option('--chunk-size', type=int, default=USER_CHUNK_SIZE, help='Users aggregated and written per transaction.')
+@click.option('--fetch-size', type=int, default=FETCH_SIZE, help='Food logs read per keyset page.')
+@with_appcontext
+def refresh_analysis_command(workers, chunk_size, fetch_size):
+    """Rebuild the nutritional analysis of every user from their food logs."""
+    total = count_logged_users()
+    click.echo(f'Refreshing nutritional analysis for {total} users with {workers} worker(s)')
+
+    started = time.perf_counter()
+    users = logs = buckets = 0
+    for chunk_users, chunk_logs, chunk_buckets in refresh_all_analysis(workers, chunk_size, fetch_size):
+        users += chunk_users
+        logs += chunk_logs
+        buckets += chunk_buckets
+        elapsed = time.perf_counter() - started
+        click.echo(f'{users}/{total} users, {logs} logs, {buckets} buckets '
+                   f'({users / elapsed if elapsed else users:.0f} users/s, {logs / elapsed if elapsed else logs:.0f} logs/s)')
+
+    elapsed = time.perf_counter() - started
+    click.echo(f'Refreshed {users} users in {elapsed:.1f}s')
+
+
+@click.command('import-food-items')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default=None, help='File format (default: from the extension).')
+@click.option('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows per INSERT statement.')
+@click.option('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Rows per committed transaction.')
+@with_appcontext
+def import_food_items_command(path, fmt, batch_size, chunk_size):
+    """Stream food items from a CSV or NDJSON file into the catalog."""
+    try:
+        fmt = import_format(path, fmt)
+    except CatalogImportError as e:
+        raise click.ClickException(str(e))
+
+    def progress(imported, rejected, elapsed):
+        click.echo(f'{imported} rows imported, {rejected} rejected '
+                   f'({imported / elapsed if elapsed else imported:.0f} rows/s)')
+
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        result = import_food_items(READERS[fmt](stream), batch_size, chunk_size, progress)
+
+    for reject in result['rejects']:
+        click.echo(f"line {reject['line']}: {reject['error']}", err=True)
+    click.echo(f"Imported {result['imported']} rows, rejected {result['rejected']} "
+               f"in {result['elapsed_seconds']:.1f}s ({result['rows_per_second'] or 0:.0f} rows/s)")
+
+
+@click.command('run-jobs')
+@click.option('--timeout', type=int, default=None, help='Seconds without a heartbeat after which a running job counts as orphaned.')
+@with_appcontext
+def run_jobs_command(timeout):
+    """Run the queued jobs orphaned by a restart, then exit."""
+    queue = job_queue()
+    if timeout is None:
+        timeout = current_app.config.get('JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)
+    click.echo(f'Running {queue.recover(timeout)} queued job(s)')
+    queue.shutdown()
+    click.echo('Done')
+
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(upgrade_db_command)
+    app.cli.add_command(rebuild_daily_intake_command)
+    app.cli.add_command(generate_meal_plans_command)
+    app.cli.add_command(refresh_analysis_command)
+    app.cli.add_command(import_food_items_command)
+    app.cli.add_command(run_jobs_command)
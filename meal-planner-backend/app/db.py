@@ -1 +1,3 @@
-from app import db
\ No newline at end of file
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
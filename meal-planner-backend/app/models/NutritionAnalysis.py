@@ -5,6 +5,10 @@ from ..db import db
 
 class NutritionAnalysis(db.Model):
     __tablename__ = 'nutritionalanalysis'
+    # One row per bucket: a day, a week (dated by its last day) or a month
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'timeframe', 'log_date', name='uq_nutritionalanalysis_bucket'),
+    )
     
     analysis_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -34,3 +38,12 @@ class NutritionAnalysis(db.Model):
             'fiber': float(self.fiber) if self.fiber is not None else None,
             'sat_fat': float(self.sat_fat) if self.sat_fat is not None else None,
         }
+
+
+class AnalysisWatermark(db.Model):
+    __tablename__ = 'analysis_watermarks'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    last_log_id = db.Column(db.Integer, nullable=False)  # Newest FoodLog.log_id already aggregated
+    anchor_date = db.Column(db.Date, nullable=False)      # First log date; weeks are counted from it
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
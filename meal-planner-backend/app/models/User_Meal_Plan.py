@@ -3,6 +3,10 @@ from ..db import db
 
 class UserMealPlan(db.Model):
     __tablename__ = 'user_meal_plan'
+    # A patient's plan by date (current stage, adherence, replanning)
+    __table_args__ = (
+        db.Index('ix_user_meal_plan_user_date', 'user_id', 'log_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
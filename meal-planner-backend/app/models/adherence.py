@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from sqlalchemy import select, func, and_
+
+from ..db import db
+from .users import User
+from .meal_plans import MealPlan
+from .User_Meal_Plan import UserMealPlan
+from .daily_intake import DailyIntake, INTAKE_NUTRIENTS
+from .provider_interactions import ProviderInteraction
+
+# MealPlan goal column for each intake nutrient
+GOAL_COLUMNS = {
+    'calories': 'caloric_goal',
+    'protein': 'protein_goal',
+    'carbs': 'carbs_goal',
+    'fats': 'fats_goal',
+    'fiber': 'fiber_goal',
+    'sat_fat': 'sat_fat_goal',
+}
+# Goals that are upper limits: only going over them is out of range
+LIMIT_NUTRIENTS = ('sat_fat',)
+DEFAULT_TOLERANCE = 20  # Percent either side of a goal that still counts as on target
+
+
+def _current_stages():
+    """Subquery of each patient's stage, taken from their latest planned day."""
+    latest = (
+        select(UserMealPlan.user_id, func.max(UserMealPlan.log_date).label('log_date'))
+        .group_by(UserMealPlan.user_id)
+        .subquery()
+    )
+    return (
+        select(UserMealPlan.user_id, func.max(UserMealPlan.stage_name).label('stage_name'))
+        .join(latest, and_(UserMealPlan.user_id == latest.c.user_id, UserMealPlan.log_date == latest.c.log_date))
+        .group_by(UserMealPlan.user_id)
+        .subquery()
+    )
+
+
+def _intake_totals(start, end):
+    """Subquery of each user's summed daily_intake rows between ``start`` and ``end``."""
+    return (
+        select(
+            DailyIntake.user_id,
+            func.count().label('days_logged'),
+            *[func.sum(getattr(DailyIntake, nutrient)).label(nutrient) for nutrient in INTAKE_NUTRIENTS],
+        )
+        .where(DailyIntake.log_date.between(start, end))
+        .group_by(DailyIntake.user_id)
+        .subquery()
+    )
+
+
+def adherence_panel(end, days, nutritionist_id=None, tolerance=DEFAULT_TOLERANCE):
+    """Average daily intake of each patient over ``days`` days ending ``end``, against their MealPlan.
+
+    One query joins users, their current stage from user_meal_plan, the
+    stage's meal_plans goals and the daily_intake rollup, so the cost depends
+    on patients and days rather than on the number of food logs. With
+    ``nutritionist_id`` only patients the nutritionist has interacted with are
+    included. Averages are over the days with logs; a patient is out of range
+    when any nutrient is more than ``tolerance`` percent off its goal (or over
+    it, for limits), or when nothing was logged in the window.
+    """
+    start = end - timedelta(days=days - 1)
+    stages = _current_stages()
+    intake = _intake_totals(start, end)
+
+    query = (
+        select(
+            User.user_id, User.name, stages.c.stage_name,
+            func.coalesce(intake.c.days_logged, 0).label('days_logged'),
+            *[intake.c[nutrient] for nutrient in INTAKE_NUTRIENTS],
+            *[getattr(MealPlan, goal) for goal in GOAL_COLUMNS.values()],
+        )
+        .join(stages, stages.c.user_id == User.user_id)
+        .join(MealPlan, and_(MealPlan.disease_id == User.disease_id, MealPlan.stage_name == stages.c.stage_name))
+        .outerjoin(intake, intake.c.user_id == User.user_id)
+        .where(User.role == 'patient')
+        .order_by(User.user_id)
+    )
+    if nutritionist_id is not None:
+        panel = select(ProviderInteraction.patient_id).where(ProviderInteraction.provider_id == nutritionist_id)
+        query = query.where(User.user_id.in_(panel))
+
+    patients = []
+    for row in db.session.execute(query).mappings():
+        days_logged = row['days_logged']
+        percent_of_target = {}
+        out_of_range = []
+        for nutrient, goal_column in GOAL_COLUMNS.items():
+            goal = float(row[goal_column])
+            if not days_logged or not goal:
+                percent_of_target[nutrient] = None
+                continue
+            percent = percent_of_target[nutrient] = round(float(row[nutrient]) / days_logged / goal * 100, 1)
+            if percent > 100 + tolerance or (nutrient not in LIMIT_NUTRIENTS and percent < 100 - tolerance):
+                out_of_range.append(nutrient)
+
+        patients.append({
+            'user_id': row['user_id'],
+            'name': row['name'],
+            'stage_name': row['stage_name'],
+            'days_logged': days_logged,
+            'percent_of_target': percent_of_target,
+            'out_of_range_nutrients': out_of_range,
+            'out_of_range': bool(out_of_range) or not days_logged,
+        })
+    return patients
@@ -0,0 +1,248 @@
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select, insert, delete, func, and_, or_
+
+from ..db import db
+from .foodlog import FoodLog
+from .NutritionAnalysis import NutritionAnalysis, AnalysisWatermark
+from .nutrition_rollups import NUTRIENTS
+
+# Food log rows read per keyset page
+FETCH_SIZE = 10000
+# Users aggregated and written per transaction
+USER_CHUNK_SIZE = 1000
+
+MONTH_NAMES = [date(2000, month, 1).strftime('%B') for month in range(1, 13)]
+
+# Flask app of a worker process, created by the pool initializer
+_worker_app = None
+
+
+def user_id_ranges(partitions):
+    """Splits the users with food logs into up to ``partitions`` contiguous
+    ``(start, stop)`` user_id ranges holding about as many logs each.
+
+    NTILE deals the logs, in user order, into equal tiles; every range starts
+    at the first user of a tile, so a user's logs never span two ranges.
+    ``stop`` is exclusive and None for the last range.
+    """
+    tiles = select(FoodLog.user_id, func.ntile(partitions).over(order_by=FoodLog.user_id).label('tile')).subquery()
+    starts = db.session.execute(
+        select(func.min(tiles.c.user_id)).group_by(tiles.c.tile).order_by(func.min(tiles.c.user_id))
+    ).scalars().all()
+    # A user with more logs than a tile starts several tiles; keep one range
+    starts = sorted(set(starts))
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def _after(key):
+    """Rows past ``key`` = (user_id, log_date, log_id) in index order, spelled out
+    so the optimizer sees a range on user_id."""
+    user_id, log_date, log_id = key
+    return and_(
+        FoodLog.user_id >= user_id,
+        or_(FoodLog.user_id > user_id,
+            FoodLog.log_date > log_date,
+            and_(FoodLog.log_date == log_date, FoodLog.log_id > log_id)),
+    )
+
+
+def _stream_logs(start, stop, fetch_size):
+    """Yields the food logs of users in ``[start, stop)`` ordered by user, date and id.
+
+    The range is read off the (user_id, log_date, log_id) index in keyset
+    pages of ``fetch_size`` rows, each continuing after the last row of the
+    previous one. Memory stays bounded by one page whatever the driver:
+    mysql+mysqlconnector has no server-side cursor and would otherwise
+    buffer the whole range. Pages are read on their own connection, so the
+    writes of the session are not blocked by an open result set.
+    """
+    query = (
+        select(FoodLog.user_id, FoodLog.log_id, FoodLog.log_date,
+               *[getattr(FoodLog, nutrient) for nutrient in NUTRIENTS])
+        .order_by(FoodLog.user_id, FoodLog.log_date, FoodLog.log_id)
+        .limit(fetch_size)
+    )
+    if start is not None:
+        query = query.where(FoodLog.user_id >= start)
+    if stop is not None:
+        query = query.where(FoodLog.user_id < stop)
+
+    page = query
+    while True:
+        with db.engine.connect() as connection:
+            rows = connection.execute(page).all()
+        yield from rows
+        if len(rows) < fetch_size:
+            return
+        last = rows[-1]
+        page = query.where(_after((last[0], last[2], last[1])))
+
+
+def _user_chunks(rows, chunk_size):
+    """Groups the ordered log rows into lists holding ``chunk_size`` whole users."""
+    chunk = []
+    users = 0
+    current = None
+    for row in rows:
+        if row[0] != current:
+            if users == chunk_size:
+                yield chunk
+                chunk = []
+                users = 0
+            current = row[0]
+            users += 1
+        chunk.append(row)
+    if chunk:
+        yield chunk
+
+
+def _segments(*keys):
+    """Start index of every run of equal keys in rows already sorted by them."""
+    change = np.zeros(len(keys[0]), dtype=bool)
+    change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def _sums(values, starts):
+    """Per-segment sums and non-null counts of each nutrient column."""
+    present = ~np.isnan(values)
+    return (np.add.reduceat(np.where(present, values, 0.0), starts, axis=0),
+            np.add.reduceat(present, starts, axis=0))
+
+
+def _nutrient_values(totals, counts, average):
+    values = totals / np.maximum(counts, 1) if average else totals
+    # Rounded to the column scale; a bucket without any value for a nutrient
+    # stays NULL, as with SQL SUM/AVG
+    return [
+        {nutrient: (round(float(value), 2) if count else None) for nutrient, value, count in zip(NUTRIENTS, row, row_counts)}
+        for row, row_counts in zip(values, counts)
+    ]
+
+
+def aggregate_chunk(rows):
+    """Computes daily, weekly and monthly nutritionalanalysis rows for a chunk of users.
+
+    ``rows`` are ``(user_id, log_id, log_date, *NUTRIENTS)`` ordered by user
+    and date. The buckets match refresh_nutritional_analysis: daily totals,
+    the average meal per 7-day week counted from the user's first log, and the
+    average meal per calendar month dated by its last log. Everything is
+    segmented with NumPy in one pass over the chunk.
+    Returns ``(entries, watermarks)``.
+    """
+    users = np.array([row[0] for row in rows], dtype=np.int64)
+    log_ids = np.array([row[1] for row in rows], dtype=np.int64)
+    dates = [row[2] for row in rows]
+    days = np.array([day.toordinal() for day in dates], dtype=np.int64)
+    months = np.array([day.year * 12 + day.month - 1 for day in dates], dtype=np.int64)
+    values = np.array([[math.nan if value is None else value for value in row[3:]] for row in rows], dtype=float)
+
+    # Each user's first log anchors their week numbering
+    user_starts = _segments(users)
+    anchors = days[user_starts]
+    anchor_of_row = np.repeat(anchors, np.diff(np.append(user_starts, len(rows))))
+    weeks = (days - anchor_of_row) // 7
+
+    entries = []
+
+    starts = _segments(users, days)
+    totals, counts = _sums(values, starts)
+    for start, nutrients in zip(starts, _nutrient_values(totals, counts, average=False)):
+        entries.append({'user_id': int(users[start]), 'timeframe': 'daily', 'log_date': dates[start],
+                        'day_variant': dates[start].strftime('%A'), **nutrients})
+
+    starts = _segments(users, weeks)
+    totals, counts = _sums(values, starts)
+    for start, nutrients in zip(starts, _nutrient_values(totals, counts, average=True)):
+        week = int(weeks[start])
+        entries.append({'user_id': int(users[start]), 'timeframe': 'weekly',
+                        'log_date': date.fromordinal(int(anchor_of_row[start]) + 7 * week + 6),  # The last date of the week
+                        'day_variant': f'Week {week + 1}', **nutrients})
+
+    starts = _segments(users, months)
+    ends = np.append(starts[1:], len(rows)) - 1
+    totals, counts = _sums(values, starts)
+    for start, end, nutrients in zip(starts, ends, _nutrient_values(totals, counts, average=True)):
+        entries.append({'user_id': int(users[start]), 'timeframe': 'monthly', 'log_date': dates[end],
+                        'day_variant': MONTH_NAMES[int(months[start]) % 12], **nutrients})
+
+    last_log_ids = np.maximum.reduceat(log_ids, user_starts)
+    watermarks = [
+        {'user_id': int(users[start]), 'last_log_id': int(last_log_id), 'anchor_date': date.fromordinal(int(anchor))}
+        for start, last_log_id, anchor in zip(user_starts, last_log_ids, anchors)
+    ]
+    return entries, watermarks
+
+
+def _write_chunk(entries, watermarks):
+    # Replace the chunk's users' analysis and watermarks, one statement per table each way
+    user_ids = [watermark['user_id'] for watermark in watermarks]
+    db.session.execute(delete(NutritionAnalysis).where(NutritionAnalysis.user_id.in_(user_ids)))
+    db.session.execute(delete(AnalysisWatermark).where(AnalysisWatermark.user_id.in_(user_ids)))
+    db.session.execute(insert(NutritionAnalysis), entries)
+    db.session.execute(insert(AnalysisWatermark), watermarks)
+    db.session.commit()
+
+
+def refresh_partition(start=None, stop=None, chunk_size=USER_CHUNK_SIZE, fetch_size=FETCH_SIZE):
+    """Rebuilds the analysis of every user with ``start <= user_id < stop`` (all users by default).
+
+    Yields ``(users, logs, buckets)`` after each chunk of users is committed.
+    """
+    try:
+        for rows in _user_chunks(_stream_logs(start, stop, fetch_size), chunk_size):
+            entries, watermarks = aggregate_chunk(rows)
+            _write_chunk(entries, watermarks)
+            yield len(watermarks), len(rows), len(entries)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _init_worker():
+    # A bare app: database access only, no job queue
+    global _worker_app
+    from .. import create_app
+    _worker_app = create_app({'JOB_QUEUE': False})
+
+
+def _run_partition(task):
+    start, stop, chunk_size, fetch_size = task
+    users = logs = buckets = 0
+    with _worker_app.app_context():
+        for chunk_users, chunk_logs, chunk_buckets in refresh_partition(start, stop, chunk_size, fetch_size):
+            users += chunk_users
+            logs += chunk_logs
+            buckets += chunk_buckets
+    return users, logs, buckets
+
+
+def refresh_all_analysis(workers=1, chunk_size=USER_CHUNK_SIZE, fetch_size=FETCH_SIZE):
+    """Rebuilds nutritionalanalysis for every user with food logs.
+
+    With several workers, users are split into more contiguous user_id
+    ranges than workers (see user_id_ranges) and each range runs in its own
+    process, scanning only its slice of the foodlog index.
+    Yields ``(users, logs, buckets)`` as chunks (one worker) or partitions
+    (several workers) complete, for progress reporting.
+    """
+    if workers <= 1:
+        yield from refresh_partition(None, None, chunk_size, fetch_size)
+        return
+
+    tasks = [(start, stop, chunk_size, fetch_size) for start, stop in user_id_ranges(workers * 4)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for future in as_completed([pool.submit(_run_partition, task) for task in tasks]):
+            result = future.result()
+            if result[0]:
+                yield result
+
+
+def count_logged_users():
+    return db.session.execute(select(db.func.count(db.distinct(FoodLog.user_id)))).scalar()
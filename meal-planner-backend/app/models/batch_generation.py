@@ -0,0 +1,154 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import delete, insert, or_, and_
+
+from ..db import db
+from .users import User
+from .Diseases import Disease
+from .meal_plans import MealPlan
+from .User_Meal_Plan import UserMealPlan
+from .catalog import get_catalog
+from .feasibility import meal_plan_budget
+from .plan_solver import SOLVERS
+from .plan_adherence import invalidate_adherence
+
+# Patients written per DELETE/INSERT round when saving generated plans
+PATIENT_CHUNK_SIZE = 50
+
+# Catalog snapshot handed to each worker process once, by the pool initializer
+_worker_catalog = None
+
+
+def resolve_patients(user_ids=None, stage_name_ids=None):
+    """Returns ``(user_id, stage_name, goals)`` for every patient to plan for.
+
+    Patients are selected by id, by the stage_name_id of their disease stage,
+    or both; goals come from the stage's MealPlan, all in one joined query.
+    """
+    query = (
+        db.session.query(User.user_id, Disease.stage_name, MealPlan)
+        .join(Disease, User.disease_id == Disease.disease_id)
+        .join(MealPlan, and_(MealPlan.disease_id == Disease.disease_id,
+                             MealPlan.stage_name == Disease.stage_name))
+        .filter(User.role == 'patient')
+    )
+    filters = []
+    if user_ids:
+        filters.append(User.user_id.in_(user_ids))
+    if stage_name_ids:
+        filters.append(Disease.stage_name_id.in_(stage_name_ids))
+    if filters:
+        query = query.filter(or_(*filters))
+
+    return [
+        (user_id, stage_name, meal_plan_budget(meal_plan))
+        for user_id, stage_name, meal_plan in query.order_by(User.user_id).all()
+    ]
+
+
+def _init_worker(catalog):
+    global _worker_catalog
+    _worker_catalog = catalog
+
+
+def _generate(task):
+    user_id, stage_name, goals, solver, options, seed = task
+    week = SOLVERS[solver](_worker_catalog, goals, random.Random(seed), **options)
+    return user_id, stage_name, week
+
+
+def generate_plans(patients, solver='greedy', options=None, workers=None, seed=None):
+    """Generates a weekly plan per patient on a process pool sharing one catalog snapshot.
+
+    Yields ``(user_id, stage_name, week)`` in the order of ``patients``.
+    """
+    options = options or {}
+    workers = workers or os.cpu_count() or 1
+    base_seed = seed if seed is not None else random.randrange(2 ** 32)
+    tasks = [
+        (user_id, stage_name, goals, solver, options, base_seed + user_id)
+        for user_id, stage_name, goals in patients
+    ]
+
+    catalog = get_catalog()
+    if workers == 1 or len(tasks) < 2:
+        _init_worker(catalog)
+        yield from map(_generate, tasks)
+        return
+
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalog,)) as pool:
+        yield from pool.map(_generate, tasks, chunksize=chunksize)
+
+
+def plan_rows(user_id, stage_name, week, start_date):
+    """Flattens a generated week into user_meal_plan rows starting at ``start_date``."""
+    for day_index, (day, daily_meals) in enumerate(week.items()):
+        log_date = start_date + timedelta(days=day_index)
+        for meal_type, meals in daily_meals.items():
+            for meal in meals:
+                yield {
+                    'user_id': user_id,
+                    'stage_name': stage_name,
+                    'day': day,
+                    'meal_name': meal['name'],
+                    'meal_type': meal_type,
+                    'calories': meal['calories'],
+                    'protein': meal['protein'],
+                    'carbs': meal['carbs'],
+                    'fats': meal['fat'],
+                    'fiber': meal['fiber'],
+                    'sat_fat': meal['sat_fat'],
+                    'grams': meal['grams'],
+                    'measure': meal['measure'],
+                    'log_date': log_date,
+                }
+
+
+def _write_chunk(chunk, start_date):
+    # One DELETE per stage for the chunk's patients, then one multi-row INSERT
+    users_by_stage = {}
+    rows = []
+    for user_id, stage_name, week in chunk:
+        users_by_stage.setdefault(stage_name, []).append(user_id)
+        rows.extend(plan_rows(user_id, stage_name, week, start_date))
+    for stage_name, user_ids in users_by_stage.items():
+        db.session.execute(
+            delete(UserMealPlan)
+            .where(UserMealPlan.user_id.in_(user_ids),
+                   UserMealPlan.stage_name == stage_name,
+                   UserMealPlan.log_date >= start_date)
+        )
+        invalidate_adherence(user_ids, start_date)
+    if rows:
+        db.session.execute(insert(UserMealPlan), rows)
+    return len(rows)
+
+
+def save_generated_plans(results, start_date, chunk_size=PATIENT_CHUNK_SIZE):
+    """Replaces each patient's plan from ``start_date`` on using set-based statements.
+
+    Results are written in chunks of patients, all inside a single transaction.
+    Returns ``(patients, rows)`` written.
+    """
+    patients = 0
+    total_rows = 0
+    chunk = []
+    try:
+        for result in results:
+            chunk.append(result)
+            if len(chunk) >= chunk_size:
+                total_rows += _write_chunk(chunk, start_date)
+                patients += len(chunk)
+                chunk = []
+        if chunk:
+            total_rows += _write_chunk(chunk, start_date)
+            patients += len(chunk)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return patients, total_rows
@@ -0,0 +1,139 @@
+from array import array
+from threading import Lock
+
+from ..db import db
+from .food_items import FoodItem
+from .catalog_sync import current_catalog_version
+
+# Nutrient columns kept per partition, in the order used by the generators
+NUTRIENT_COLUMNS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sat_fat')
+
+
+class CatalogPartition:
+    """All food items of one food_type, stored column-wise.
+
+    Numeric columns are converted to floats once, when the snapshot is built,
+    and kept in compact ``array('d')`` buffers instead of one ORM object per row.
+    """
+
+    __slots__ = ('food_type', 'food_ids', 'names', 'measures', 'grams', 'matrix', '_name_index') + NUTRIENT_COLUMNS
+
+    def __init__(self, food_type):
+        self.food_type = food_type
+        self.food_ids = array('l')
+        self.names = []
+        self.measures = []
+        self.grams = array('d')
+        for column in NUTRIENT_COLUMNS:
+            setattr(self, column, array('d'))
+        # NumPy view of the nutrient columns, built on first use (see feasibility.py)
+        self.matrix = None
+        self._name_index = None
+
+    def __len__(self):
+        return len(self.food_ids)
+
+    def append(self, row):
+        self.food_ids.append(row.food_id)
+        self.names.append(row.name)
+        self.measures.append(row.measure)
+        self.grams.append(_to_float(row.grams))
+        for column in NUTRIENT_COLUMNS:
+            getattr(self, column).append(_to_float(getattr(row, column)))
+
+    def name_mask(self, names):
+        """Boolean list marking the foods whose name is in ``names``."""
+        if self._name_index is None:
+            index = {}
+            for position, name in enumerate(self.names):
+                index.setdefault(name, []).append(position)
+            self._name_index = index
+        mask = [False] * len(self)
+        for name in names:
+            for position in self._name_index.get(name, ()):
+                mask[position] = True
+        return mask
+
+    def item(self, index):
+        """Returns the food at ``index`` in the shape the meal generators use."""
+        return {
+            'name': self.names[index],
+            'measure': self.measures[index],
+            'grams': self.grams[index],
+            'calories': self.calories[index],
+            'protein': self.protein[index],
+            'carbs': self.carbs[index],
+            'fiber': self.fiber[index],
+            'fat': self.fat[index],
+            'sat_fat': self.sat_fat[index],
+        }
+
+
+class CatalogSnapshot:
+    """Immutable, versioned view of the food_items table partitioned by food_type."""
+
+    def __init__(self, version, partitions):
+        self.version = version
+        self.partitions = partitions
+
+    def partition(self, food_type):
+        # food_type is matched case-insensitively, like the MySQL collation the
+        # previous filter_by(food_type=...) queries relied on ('Snack' == 'snack')
+        return self.partitions.get((food_type or '').lower())
+
+    def __len__(self):
+        return sum(len(partition) for partition in self.partitions.values())
+
+
+_lock = Lock()
+_snapshot = None
+
+
+def _to_float(value):
+    # Missing nutrient values count as zero
+    return float(value) if value is not None else 0.0
+
+
+def _load_snapshot(version):
+    rows = db.session.query(
+        FoodItem.food_id,
+        FoodItem.name,
+        FoodItem.measure,
+        FoodItem.grams,
+        FoodItem.food_type,
+        *[getattr(FoodItem, column) for column in NUTRIENT_COLUMNS]
+    ).order_by(FoodItem.food_id).all()
+
+    partitions = {}
+    for row in rows:
+        key = (row.food_type or '').lower()
+        if key not in partitions:
+            partitions[key] = CatalogPartition(row.food_type)
+        partitions[key].append(row)
+    return CatalogSnapshot(version, partitions)
+
+
+def get_catalog():
+    """Returns the snapshot at the current catalog version, loading it with a single query if stale.
+
+    The version is read from the shared catalog_changes log, so a write made
+    through any worker process makes every worker reload its snapshot, and
+    the caches keyed by ``snapshot.version`` (search index, plan cache) with it.
+    """
+    global _snapshot
+    version = current_catalog_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = _load_snapshot(version)
+        return _snapshot
+
+
+def invalidate_catalog():
+    """Drops this process's snapshot right away; other processes reload on the next version check."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
@@ -0,0 +1,181 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import select, insert, func
+
+from ..db import db
+from .food_items import FoodItem
+from .catalog import invalidate_catalog
+from .catalog_sync import CatalogChange, record_catalog_changes
+
+# Rows per multi-row INSERT, and rows per committed transaction
+IMPORT_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 10000
+# Rejected rows kept for the report; further rejects are only counted
+MAX_REPORTED_REJECTS = 1000
+
+TEXT_COLUMNS = {'name': 255, 'measure': 255, 'food_type': 255}
+NUMERIC_COLUMNS = ('grams', 'calories', 'protein', 'carbs', 'fiber', 'fat', 'sat_fat')
+REQUIRED_COLUMNS = ('name', 'food_type')
+# Largest value a Numeric(6, 2) column holds
+NUMERIC_LIMIT = Decimal('9999.99')
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+class CatalogImportError(ValueError):
+    """The file as a whole cannot be imported, e.g. its format is unknown."""
+
+
+def read_csv(stream):
+    """Yields ``(line, row)`` from a text stream with a header line."""
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(stream):
+    """Yields ``(line, row)`` for every non-blank line of a text stream of JSON objects."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+            continue
+        yield line_number, row
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+def import_format(filename, declared=None):
+    """Picks the reader from an explicit format or the file extension."""
+    fmt = declared or (filename or '').rsplit('.', 1)[-1].lower()
+    if fmt in ('json', 'jsonl'):
+        fmt = 'ndjson'
+    if fmt not in READERS:
+        raise CatalogImportError(f"Unknown import format {fmt!r}; use one of {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+
+def validate_row(row):
+    """Returns a food_items row dict for ``row``, or raises ValueError naming the problem.
+
+    Keys that are not FoodItem columns are ignored; empty values become NULL.
+    """
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+    item = {}
+    for column, length in TEXT_COLUMNS.items():
+        value = row.get(column)
+        value = str(value).strip() if value is not None else ''
+        if len(value) > length:
+            raise ValueError(f'{column} is longer than {length} characters')
+        item[column] = value or None
+    for column in REQUIRED_COLUMNS:
+        if not item[column]:
+            raise ValueError(f'{column} is required')
+
+    for column in NUMERIC_COLUMNS:
+        value = row.get(column)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            item[column] = None
+            continue
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f'{column} is not a number: {value!r}')
+        # Range-checked after rounding to the column scale: 9999.995 stores as 10000.00
+        try:
+            number = number.quantize(Decimal('0.01')) if number.is_finite() else None
+        except InvalidOperation:
+            number = None
+        if number is None or abs(number) > NUMERIC_LIMIT:
+            raise ValueError(f'{column} is out of range: {value!r}')
+        item[column] = number
+
+    micronutrients = row.get('micronutrients')
+    item['micronutrients'] = str(micronutrients) if micronutrients not in (None, '') else None
+    return item
+
+
+def _write_chunk(rows, batch_size):
+    """Inserts ``rows`` with multi-row INSERTs and logs their ids as catalog creates, in one transaction.
+
+    Where the database returns the ids of a multi-row INSERT (SQLite,
+    PostgreSQL, MariaDB) those are logged. MySQL does not, so the new ids are
+    selected above the highest id seen before the chunk. Items created
+    concurrently above that id have already been logged by their writer in
+    the same transaction as their insert, and are excluded.
+    """
+    if db.session.get_bind().dialect.insert_executemany_returning:
+        food_ids = []
+        for start in range(0, len(rows), batch_size):
+            food_ids += db.session.scalars(insert(FoodItem).returning(FoodItem.food_id), rows[start:start + batch_size]).all()
+        record_catalog_changes(food_ids, 'create')
+    else:
+        last_id = db.session.execute(select(func.max(FoodItem.food_id))).scalar() or 0
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(insert(FoodItem), rows[start:start + batch_size])
+        logged = select(CatalogChange.food_id).where(CatalogChange.food_id == FoodItem.food_id)
+        record_catalog_changes(select(FoodItem.food_id).where(FoodItem.food_id > last_id, ~logged.exists()), 'create')
+    db.session.commit()
+
+
+def import_food_items(records, batch_size=IMPORT_BATCH_SIZE, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Validates and inserts ``(line, row)`` records from one of the READERS.
+
+    Rows are buffered ``chunk_size`` at a time, so memory stays flat whatever
+    the file size, and each chunk is committed on its own: a failure keeps the
+    chunks already written. ``progress(imported, rejected, elapsed)`` is called
+    after each commit. Returns a summary with the first rejects.
+    """
+    started = time.perf_counter()
+    imported = rejected = 0
+    rejects = []
+    chunk = []
+
+    def flush():
+        nonlocal imported, chunk
+        if chunk:
+            _write_chunk(chunk, batch_size)
+            imported += len(chunk)
+            chunk = []
+            invalidate_catalog()
+            if progress:
+                progress(imported, rejected, time.perf_counter() - started)
+
+    try:
+        for line, row in records:
+            try:
+                if isinstance(row, Exception):
+                    raise ValueError(f'Invalid JSON: {row}')
+                chunk.append(validate_row(row))
+            except ValueError as e:
+                rejected += 1
+                if len(rejects) < MAX_REPORTED_REJECTS:
+                    rejects.append({'line': line, 'error': str(e)})
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        'imported': imported,
+        'rejected': rejected,
+        'rejects': rejects,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(imported / elapsed, 1) if elapsed else None,
+    }
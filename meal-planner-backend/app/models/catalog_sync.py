@@ -0,0 +1,125 @@
+from threading import Lock
+
+from flask import json
+from sqlalchemy import Select, select, func, literal
+
+from ..db import db
+from .food_items import FoodItem
+from .columnar import as_float, columnar_body
+from .read_path import stream_rows
+
+CHANGE_OPS = ('create', 'update', 'delete')
+CATALOG_NUMERIC_COLUMNS = ('grams', 'calories', 'protein', 'carbs', 'fiber', 'fat', 'sat_fat')
+CATALOG_COLUMNS = (FoodItem.food_id, FoodItem.name, FoodItem.measure,
+                   *[getattr(FoodItem, column) for column in CATALOG_NUMERIC_COLUMNS],
+                   FoodItem.micronutrients, FoodItem.food_type, FoodItem.created_at)
+
+
+class CatalogChange(db.Model):
+    """Append-only log of food_items writes; its newest version is the catalog version."""
+    __tablename__ = 'catalog_changes'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    food_id = db.Column(db.Integer, nullable=False)  # No foreign key: deleted items stay logged
+    op = db.Column(db.Enum(*CHANGE_OPS, name='catalog_change_op'), nullable=False)
+    changed_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+
+def record_catalog_changes(food_ids, op):
+    """Logs a write to food_items in the caller's transaction.
+
+    Every write to food_items goes through here: the log drives the catalog
+    version, the ETag, ``?since=`` deltas and the in-memory indexes.
+    ``food_ids`` is a list of ids, or a ``select()`` of them when only the
+    database knows the ids (one INSERT ... SELECT).
+    """
+    table = CatalogChange.__table__
+    if isinstance(food_ids, Select):
+        db.session.execute(table.insert().from_select(['food_id', 'op'], food_ids.add_columns(literal(op))))
+    elif food_ids:
+        db.session.execute(table.insert(), [{'food_id': food_id, 'op': op} for food_id in food_ids])
+
+
+def current_catalog_version():
+    """Version of the newest logged change (0 before any); a primary-key lookup."""
+    return db.session.execute(select(func.max(CatalogChange.version))).scalar() or 0
+
+
+def catalog_etag(version):
+    return f'catalog-{version}'
+
+
+def catalog_changes_since(since):
+    """Ids of items created or updated after version ``since``, and ids deleted after it.
+
+    Only the latest change of each item counts, so an item created and then
+    deleted within the window is reported as deleted only.
+    Returns ``(changed_ids, deleted_ids)``, both sorted.
+    """
+    latest = (
+        select(CatalogChange.food_id, func.max(CatalogChange.version).label('version'))
+        .where(CatalogChange.version > since)
+        .group_by(CatalogChange.food_id)
+        .subquery()
+    )
+    changes = db.session.execute(
+        select(CatalogChange.food_id, CatalogChange.op)
+        .join(latest, CatalogChange.version == latest.c.version)
+    ).all()
+
+    deleted = sorted(food_id for food_id, op in changes if op == 'delete')
+    changed = sorted(food_id for food_id, op in changes if op != 'delete')
+    return changed, deleted
+
+
+def catalog_delta(since):
+    """Items (serialized) created or updated after version ``since``, and ids deleted after it.
+
+    Returns ``(items, deleted_ids)``; see catalog_changes_since.
+    """
+    changed, deleted = catalog_changes_since(since)
+    items = [catalog_row(item) for item in stream_rows(
+        select(*CATALOG_COLUMNS).where(FoodItem.food_id.in_(changed)).order_by(FoodItem.food_id)
+    )] if changed else []
+    return items, deleted
+
+
+def catalog_row(item):
+    """A food_items RowMapping in the shape of FoodItem.serialize."""
+    row = dict(item)
+    for column in CATALOG_NUMERIC_COLUMNS:
+        row[column] = str(row[column])
+    row['created_at'] = row['created_at'].isoformat()
+    return row
+
+
+_lock = Lock()
+_serialized = {}  # format -> (version, JSON body of the full catalog)
+
+
+def _columnar_catalog():
+    return columnar_body(
+        ['food_id', 'name', 'measure', *CATALOG_NUMERIC_COLUMNS, 'micronutrients', 'food_type', 'created_at'],
+        db.session.execute(
+            select(FoodItem.food_id, FoodItem.name, FoodItem.measure,
+                   *[as_float(getattr(FoodItem, column)) for column in CATALOG_NUMERIC_COLUMNS],
+                   FoodItem.micronutrients, FoodItem.food_type, FoodItem.created_at)
+            .order_by(FoodItem.food_id)
+        ),
+    )
+
+
+def serialized_catalog(version, columnar=False):
+    """JSON body of GET /api/food_items/ for ``version``, built once per version and format."""
+    fmt = 'columnar' if columnar else 'rows'
+    cached = _serialized.get(fmt)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    if columnar:
+        body = _columnar_catalog()
+    else:
+        body = json.dumps([catalog_row(item) for item in stream_rows(select(*CATALOG_COLUMNS).order_by(FoodItem.food_id))])
+    with _lock:
+        _serialized[fmt] = (version, body)
+    return body
@@ -0,0 +1,48 @@
+import json
+from datetime import date
+
+from flask import Response
+from sqlalchemy import Float, type_coerce
+
+from ..db import db
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+
+def as_float(column):
+    """Reads a Numeric column as float, converted by the result processor instead of per-row code."""
+    return type_coerce(column, Float).label(column.key)
+
+
+def _iso(values):
+    return [value.isoformat() if value is not None else None for value in values]
+
+
+def columnar_body(names, rows):
+    """JSON of ``rows`` (tuples) as ``{"count": n, "columns": {name: [values, ...]}}``.
+
+    Rows are transposed in one pass. orjson, when installed, encodes dates and
+    datetimes natively; otherwise they are turned into ISO strings first.
+    """
+    rows = list(rows)
+    columns = list(zip(*rows)) if rows else [() for _ in names]
+    if orjson is None:
+        columns = [_iso(values) if isinstance(next((value for value in values if value is not None), None), date)
+                   else values for values in columns]
+    payload = {'count': len(rows), 'columns': dict(zip(names, map(list, columns)))}
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def columnar_response(stmt):
+    """Runs a Core ``select()`` and returns its rows as a columnar JSON response."""
+    result = db.session.execute(stmt)
+    return Response(columnar_body(list(result.keys()), result), mimetype='application/json')
+
+
+def wants_columnar(args):
+    return args.get('format') == 'columnar'
@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+from sqlalchemy import select, insert, delete, func
+
+from ..db import db
+from .foodlog import FoodLog
+
+# Nutrient columns summed per day, named as in foodlog
+INTAKE_NUTRIENTS = ('calories', 'protein', 'carbs', 'fats', 'fiber', 'sat_fat')
+
+
+class DailyIntake(db.Model):
+    __tablename__ = 'daily_intake'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    log_date = db.Column(db.Date, primary_key=True)
+    calories = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    protein = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    carbs = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    fats = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    fiber = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    sat_fat = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)  # Food logs summed into the row
+
+    def serialize(self):
+        return {
+            'user_id': self.user_id,
+            'log_date': self.log_date.isoformat(),
+            **{nutrient: float(getattr(self, nutrient)) for nutrient in INTAKE_NUTRIENTS},
+            'entry_count': self.entry_count,
+        }
+
+
+def _upsert_statement(rows):
+    """INSERT ... that adds to the existing row on a (user_id, log_date) conflict."""
+    table = DailyIntake.__table__
+    columns = INTAKE_NUTRIENTS + ('entry_count',)
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        return stmt.on_duplicate_key_update({column: table.c[column] + stmt.inserted[column] for column in columns})
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.log_date],
+        set_={column: table.c[column] + stmt.excluded[column] for column in columns},
+    )
+
+
+def record_intake(logs):
+    """Adds food log rows to the daily rollup, in the caller's transaction.
+
+    ``logs`` are dicts with user_id, log_date and the INTAKE_NUTRIENTS values
+    (as inserted into foodlog). Logs are summed per (user_id, log_date) first,
+    so each affected day costs one row in a single upsert statement.
+    """
+    totals = {}
+    for log in logs:
+        key = (log['user_id'], log['log_date'])
+        row = totals.get(key)
+        if row is None:
+            row = totals[key] = {'user_id': key[0], 'log_date': key[1], 'entry_count': 0,
+                                 **{nutrient: 0 for nutrient in INTAKE_NUTRIENTS}}
+        for nutrient in INTAKE_NUTRIENTS:
+            row[nutrient] += log[nutrient] or 0
+        row['entry_count'] += 1
+    if totals:
+        db.session.execute(_upsert_statement(list(totals.values())))
+
+
+def rebuild_daily_intake():
+    """Recomputes the whole rollup from foodlog with one INSERT ... SELECT ... GROUP BY.
+
+    Used to backfill the table; the caller commits.
+    """
+    db.session.execute(delete(DailyIntake))
+    columns = ('user_id', 'log_date') + INTAKE_NUTRIENTS + ('entry_count',)
+    db.session.execute(
+        insert(DailyIntake).from_select(
+            columns,
+            select(FoodLog.user_id, FoodLog.log_date,
+                   *[func.coalesce(func.sum(getattr(FoodLog, nutrient)), 0) for nutrient in INTAKE_NUTRIENTS],
+                   func.count())
+            .group_by(FoodLog.user_id, FoodLog.log_date)
+        )
+    )
+
+
+def intake_range(user_id, start, end):
+    """Daily rollup rows of a user between two dates (inclusive), one primary-key range scan."""
+    return (
+        DailyIntake.query
+        .filter(DailyIntake.user_id == user_id, DailyIntake.log_date.between(start, end))
+        .order_by(DailyIntake.log_date)
+        .all()
+    )
+
+
+def rollup_intake(days, timeframe):
+    """Sums daily rollup rows into Monday-based weeks or calendar months."""
+    buckets = {}
+    for day in days:
+        if timeframe == 'weekly':
+            key = day.log_date - timedelta(days=day.log_date.weekday())
+        else:
+            key = day.log_date.replace(day=1)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {'start_date': key.isoformat(), 'days_logged': 0, 'entry_count': 0,
+                                     **{nutrient: 0.0 for nutrient in INTAKE_NUTRIENTS}}
+        for nutrient in INTAKE_NUTRIENTS:
+            bucket[nutrient] += float(getattr(day, nutrient))
+        bucket['days_logged'] += 1
+        bucket['entry_count'] += day.entry_count
+    for bucket in buckets.values():
+        for nutrient in INTAKE_NUTRIENTS:
+            bucket[nutrient] = round(bucket[nutrient], 2)
+    return [buckets[key] for key in sorted(buckets)]
@@ -0,0 +1,84 @@
+import random
+
+import numpy as np
+
+from .catalog import NUTRIENT_COLUMNS
+
+# Maps the nutrient names used by meal plan budgets onto the catalog columns
+BUDGET_KEYS = {
+    'calories': 'calories',
+    'protein': 'protein',
+    'carbs': 'carbs',
+    'fats': 'fat',
+    'fat': 'fat',
+    'fiber': 'fiber',
+    'sat_fat': 'sat_fat',
+}
+
+
+class NutrientMatrix:
+    """Foods x (calories, protein, carbs, fat, fiber, sat_fat) matrix of one catalog partition."""
+
+    def __init__(self, partition):
+        self.partition = partition
+        self.values = np.column_stack([
+            np.frombuffer(getattr(partition, column), dtype=np.float64)
+            for column in NUTRIENT_COLUMNS
+        ]) if len(partition) else np.empty((0, len(NUTRIENT_COLUMNS)))
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def feasible_mask(self, budget, exclude=None):
+        """Boolean mask of the foods whose every nutrient fits within ``budget``."""
+        mask = (self.values <= budget).all(axis=1)
+        if exclude is not None:
+            mask &= ~exclude
+        return mask
+
+    def pick_feasible(self, budget, rng=random, exclude=None):
+        """Index of a random food that fits ``budget``, or None if nothing fits.
+
+        Equivalent to shuffling the partition and taking the first item that fits.
+        """
+        candidates = np.flatnonzero(self.feasible_mask(budget, exclude))
+        if not candidates.size:
+            return None
+        return int(candidates[rng.randrange(candidates.size)])
+
+    def closest_calories(self, budget, exclude=None):
+        """Index of the food whose calories are closest to the remaining calorie budget."""
+        distance = np.abs(self.values[:, 0] - budget[0])
+        if exclude is not None:
+            distance = np.where(exclude, np.inf, distance)
+        if not distance.size or not np.isfinite(distance.min()):
+            return None
+        return int(np.argmin(distance))
+
+
+def nutrient_matrix(partition):
+    """Returns the partition's nutrient matrix, building it once per snapshot."""
+    matrix = partition.matrix
+    if matrix is None:
+        matrix = partition.matrix = NutrientMatrix(partition)
+    return matrix
+
+
+def budget_vector(limits):
+    """Converts a nutrient dict (e.g. a meal plan's daily goals) into a budget vector."""
+    budget = np.zeros(len(NUTRIENT_COLUMNS))
+    for key, value in limits.items():
+        budget[NUTRIENT_COLUMNS.index(BUDGET_KEYS[key])] = float(value)
+    return budget
+
+
+def meal_plan_budget(meal_plan):
+    """Daily budget vector of a MealPlan's goals."""
+    return budget_vector({
+        'calories': meal_plan.caloric_goal,
+        'protein': meal_plan.protein_goal,
+        'carbs': meal_plan.carbs_goal,
+        'fats': meal_plan.fats_goal,
+        'fiber': meal_plan.fiber_goal,
+        'sat_fat': meal_plan.sat_fat_goal,
+    })
@@ -0,0 +1,154 @@
+import re
+from bisect import bisect_left
+from threading import Lock
+
+import numpy as np
+
+from .catalog import get_catalog
+
+# Share of the query's trigrams a name must contain to count as a fuzzy match
+MIN_TRIGRAM_SIMILARITY = 0.3
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' '.join(_WORD.findall((text or '').lower()))
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _prefix_range(keys, prefix):
+    """Slice of the sorted ``keys`` that start with ``prefix``."""
+    start = bisect_left(keys, prefix)
+    return start, bisect_left(keys, prefix + '\uffff', start)
+
+
+def _best(ranks, count):
+    """The ``count`` smallest values of ``ranks``, sorted."""
+    if len(ranks) > count:
+        ranks = ranks[np.argpartition(ranks, count)[:count]]
+    return np.sort(ranks)
+
+
+class FoodSearchIndex:
+    """Prefix and trigram index over the names and food types of a catalog snapshot.
+
+    Matches are ranked in tiers: names starting with the query, then names
+    or food types with a word starting with it, then names sharing enough
+    trigrams with it (typos, infixes). Within a tier shorter names come first.
+    Every food has a precomputed rank in that order, so a query only selects
+    the best ranks of a bisected range or of the trigram counts with NumPy.
+    """
+
+    def __init__(self, catalog):
+        self.version = catalog.version
+        self.entries = []       # (partition, index) of every food
+        names = []              # normalized name per entry
+        food_types = []         # lower-cased food_type per entry
+        for key, partition in catalog.partitions.items():
+            for index, name in enumerate(partition.names):
+                self.entries.append((partition, index))
+                names.append(normalize(name))
+                food_types.append(key)
+
+        # Entries renumbered by rank: shorter names first, then alphabetically
+        order = sorted(range(len(names)), key=lambda entry: (len(names[entry]), names[entry]))
+        self.entries = [self.entries[entry] for entry in order]
+        names = [names[entry] for entry in order]
+        self.type_codes = {food_type: code for code, food_type in enumerate(sorted(set(food_types)))}
+        self.food_types = np.array([self.type_codes[food_types[entry]] for entry in order], dtype=np.int32)
+        self.name_lengths = np.array([len(name) for name in names], dtype=np.int32)
+
+        # Full names, and every word of the name and food type, sorted for bisect
+        keys = sorted(zip(names, range(len(names))))
+        self.name_sorted = [name for name, _ in keys]
+        self.name_ranks = np.array([rank for _, rank in keys], dtype=np.int32)
+        words = []
+        for rank, name in enumerate(names):
+            food_type = normalize(food_types[order[rank]])
+            words.extend((word, rank) for word in set(name.split()) | set(food_type.split()))
+        words.sort()
+        self.word_sorted = [word for word, _ in words]
+        self.word_ranks = np.array([rank for _, rank in words], dtype=np.int32)
+
+        # Trigram -> ranks of the names containing it, for vectorized counting
+        postings = {}
+        for rank, name in enumerate(names):
+            for gram in trigrams(name):
+                postings.setdefault(gram, []).append(rank)
+        self.postings = {gram: np.array(ranks, dtype=np.int32) for gram, ranks in postings.items()}
+
+    def _prefix_matches(self, sorted_keys, ranks, query, type_code, limit):
+        start, end = _prefix_range(sorted_keys, query)
+        candidates = ranks[start:end]
+        if type_code is not None:
+            candidates = candidates[self.food_types[candidates] == type_code]
+        # A food can match through several words; oversample, then drop repeats
+        best = _best(candidates, limit * 4)
+        if len(best) < len(candidates) and len(np.unique(best)) < limit:
+            best = np.sort(candidates)
+        return [int(rank) for rank in dict.fromkeys(best.tolist())]
+
+    def _trigram_matches(self, query, type_code, limit):
+        grams = trigrams(query)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return []
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.entries))
+        if type_code is not None:
+            counts[self.food_types != type_code] = 0
+        candidates = np.flatnonzero(counts >= max(MIN_TRIGRAM_SIMILARITY * len(grams), 1))
+        # Most shared trigrams first; ranks break ties in favour of shorter names
+        keys = (len(grams) - counts[candidates]).astype(np.int64) * len(self.entries) + candidates
+        return [int(key % len(self.entries)) for key in _best(keys, limit)]
+
+    def search(self, query, limit=10, food_type=None):
+        """Returns up to ``limit`` ``(entry, tier)`` pairs, best first."""
+        query = normalize(query)
+        if not query:
+            return []
+        type_code = None
+        if food_type:
+            type_code = self.type_codes.get(food_type.lower())
+            if type_code is None:
+                return []
+
+        results = {}
+        tiers = [
+            lambda: self._prefix_matches(self.name_sorted, self.name_ranks, query, type_code, limit),
+            lambda: self._prefix_matches(self.word_sorted, self.word_ranks, query, type_code, limit + len(results)),
+        ]
+        if len(query) >= 3:
+            tiers.append(lambda: self._trigram_matches(query, type_code, limit + len(results)))
+        for tier, matches in enumerate(tiers):
+            for rank in matches():
+                results.setdefault(rank, tier)
+                if len(results) >= limit:
+                    return list(results.items())
+        return list(results.items())
+
+    def item(self, entry):
+        partition, index = self.entries[entry]
+        return {'food_id': partition.food_ids[index], 'food_type': partition.food_type, **partition.item(index)}
+
+
+_lock = Lock()
+_index = None
+
+
+def get_search_index():
+    """Returns the search index of the current catalog snapshot, rebuilding it if the catalog changed."""
+    global _index
+    catalog = get_catalog()
+    index = _index
+    if index is not None and index.version == catalog.version:
+        return index
+
+    with _lock:
+        if _index is None or _index.version != catalog.version:
+            _index = FoodSearchIndex(catalog)
+        return _index
@@ -0,0 +1,151 @@
+from threading import Lock
+
+import numpy as np
+from sqlalchemy import select
+
+from .food_items import FoodItem
+from .catalog_sync import current_catalog_version, catalog_changes_since
+from .read_path import stream_rows
+
+# Nutrients compared, per gram of food
+SUBSTITUTE_NUTRIENTS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sat_fat')
+# Above this share of the index changing, a full rebuild beats patching
+MAX_PATCH_FRACTION = 0.25
+
+
+class SubstitutionIndex:
+    """Per-gram nutrient vectors of every food, for nearest-neighbour substitutes.
+
+    Vectors are divided by each nutrient's spread across the catalog so that
+    calories do not outweigh the other nutrients. Foods without a gram weight
+    cannot be compared and are left out. Instances are never modified:
+    ``patched`` returns a new index, so readers need no lock.
+    """
+
+    def __init__(self, version, food_ids, food_types, per_gram, scale=None):
+        order = np.argsort(food_ids, kind='stable')
+        self.version = version
+        self.food_ids = np.asarray(food_ids, dtype=np.int64)[order]
+        self.food_types = [food_types[position] for position in order]
+        self.per_gram = np.asarray(per_gram, dtype=np.float64).reshape(-1, len(SUBSTITUTE_NUTRIENTS))[order]
+        if scale is None:
+            spread = self.per_gram.std(axis=0) if len(self.per_gram) else np.ones(len(SUBSTITUTE_NUTRIENTS))
+            scale = np.where(spread > 0, spread, 1.0)
+        self.scale = scale
+        self.vectors = self.per_gram / scale
+        self.type_codes = {}
+        self.type_index = np.array([self.type_codes.setdefault(food_type, len(self.type_codes))
+                                    for food_type in self.food_types], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.food_ids)
+
+    @classmethod
+    def build(cls, version):
+        return cls(version, *_load_vectors())
+
+    def patched(self, version, changed_ids, deleted_ids):
+        """A new index with ``changed_ids`` reloaded and ``deleted_ids`` dropped.
+
+        Only the changed rows are read; the nutrient scale is kept until the
+        next full build.
+        """
+        keep = ~np.isin(self.food_ids, np.asarray(changed_ids + deleted_ids, dtype=np.int64))
+        food_ids, food_types, per_gram = _load_vectors(changed_ids) if changed_ids else ([], [], [])
+        return SubstitutionIndex(
+            version,
+            np.concatenate([self.food_ids[keep], np.asarray(food_ids, dtype=np.int64)]),
+            [food_type for food_type, kept in zip(self.food_types, keep) if kept] + food_types,
+            np.vstack([self.per_gram[keep], np.asarray(per_gram, dtype=np.float64).reshape(-1, len(SUBSTITUTE_NUTRIENTS))]),
+            self.scale,
+        )
+
+    def position(self, food_id):
+        position = int(np.searchsorted(self.food_ids, food_id))
+        if position < len(self.food_ids) and self.food_ids[position] == food_id:
+            return position
+        return None
+
+    def substitutes(self, food_id, k=10, same_type=False, lower=()):
+        """Returns up to ``k`` ``(food_id, distance)`` pairs closest to ``food_id``, nearest first.
+
+        ``same_type`` keeps foods of the same food_type only; every nutrient
+        in ``lower`` must be lower per gram than in the original food.
+        Returns None when ``food_id`` is not in the index.
+        """
+        position = self.position(food_id)
+        if position is None:
+            return None
+
+        if same_type or lower:
+            mask = np.ones(len(self.food_ids), dtype=bool)
+            mask[position] = False
+            if same_type:
+                mask &= self.type_index == self.type_index[position]
+            for nutrient in lower:
+                column = SUBSTITUTE_NUTRIENTS.index(nutrient)
+                mask &= self.per_gram[:, column] < self.per_gram[position, column]
+            candidates = np.flatnonzero(mask)
+            difference = self.vectors[candidates] - self.vectors[position]
+        else:
+            # No filter: every food is a candidate and copying them is skipped
+            candidates = np.arange(len(self.food_ids))
+            difference = self.vectors - self.vectors[position]
+        distances = np.sqrt(np.einsum('ij,ij->i', difference, difference))
+        count = len(candidates)
+        if not (same_type or lower):
+            distances[position] = np.inf
+            count -= 1
+        if not count:
+            return []
+
+        k = min(k, count)
+        best = np.argpartition(distances, k - 1)[:k] if count > k else np.argsort(distances)[:k]
+        best = best[np.argsort(distances[best], kind='stable')]
+        return [(int(self.food_ids[candidates[i]]), float(distances[i])) for i in best]
+
+
+def _load_vectors(food_ids=None):
+    # (food_ids, food_types, per-gram nutrient rows) of the foods with a gram weight
+    query = select(FoodItem.food_id, FoodItem.food_type, FoodItem.grams,
+                   *[getattr(FoodItem, column) for column in SUBSTITUTE_NUTRIENTS]).where(FoodItem.grams > 0)
+    if food_ids is not None:
+        query = query.where(FoodItem.food_id.in_(food_ids))
+    ids, food_types, per_gram = [], [], []
+    for row in stream_rows(query):
+        grams = float(row['grams'])
+        ids.append(row['food_id'])
+        food_types.append((row['food_type'] or '').lower())
+        # Missing nutrient values count as zero, as in the catalog snapshot
+        per_gram.extend(float(row[column] or 0) / grams for column in SUBSTITUTE_NUTRIENTS)
+    return ids, food_types, per_gram
+
+
+_lock = Lock()
+_index = None
+
+
+def get_substitution_index():
+    """Returns the substitution index at the current catalog version.
+
+    A stale index is patched with the items logged in catalog_changes since
+    its version; it is rebuilt from scratch on first use or when too much of
+    the catalog changed.
+    """
+    global _index
+    version = current_catalog_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        index = _index
+        if index is None or index.version > version:
+            _index = SubstitutionIndex.build(version)
+        elif index.version < version:
+            changed, deleted = catalog_changes_since(index.version)
+            if len(changed) + len(deleted) > MAX_PATCH_FRACTION * max(len(index), 1):
+                _index = SubstitutionIndex.build(version)
+            else:
+                _index = index.patched(version, changed, deleted)
+        return _index
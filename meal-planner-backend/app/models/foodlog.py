@@ -2,8 +2,29 @@ from datetime import datetime
 
 from ..db import db
 
+
+# Log ids below a watermark that refreshes read again. Ids are handed out at
+# insert time but become visible at commit, so a log can appear after a
+# higher id was already aggregated; re-reading this many ids back picks it up
+LOG_ID_OVERLAP = 1000
+
+
+def log_today():
+    """Today's date in UTC, the date a food log without one is filed under.
+
+    Every reader and writer of log dates (food logs, the daily intake rollup,
+    adherence) uses this clock, so a log never lands on a different day than
+    the totals that count it.
+    """
+    return datetime.utcnow().date()
+
+
 class FoodLog(db.Model):
     __tablename__ = 'foodlog'
+    # Per-user scans in date order (analysis refresh, log history)
+    __table_args__ = (
+        db.Index('ix_foodlog_user_date', 'user_id', 'log_date', 'log_id'),
+    )
 
     log_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -17,7 +38,7 @@ class FoodLog(db.Model):
     sat_fat = db.Column(db.Numeric(10, 2), nullable=True)
     grams = db.Column(db.Numeric(10, 2), nullable=False)
     measure = db.Column(db.String(50), nullable=False)  # e.g., grams, cups, etc.
-    log_date = db.Column(db.Date, default=datetime.utcnow, nullable=False)
+    log_date = db.Column(db.Date, default=log_today, nullable=False)
 
     # Relationship back to the user
     users = db.relationship("User", back_populates="foodlog")
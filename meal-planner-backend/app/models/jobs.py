@@ -0,0 +1,338 @@
+import json
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from threading import Condition, Lock, Thread
+
+from flask import current_app
+from sqlalchemy import select, func, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..db import db
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+# Seconds between heartbeats of the jobs a queue is running
+JOB_HEARTBEAT_INTERVAL = 15
+# A running job whose heartbeat is this many seconds old is taken to have died with its owner
+DEFAULT_JOB_TIMEOUT = 120
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    job_id = db.Column(db.String(36), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)             # Handler name, e.g. 'nutritional_analysis'
+    status = db.Column(db.Enum(*JOB_STATUSES, name='job_status'), nullable=False, default='queued')
+    payload = db.Column(db.Text)                                # JSON arguments for the handler
+    result = db.Column(db.Text)                                 # JSON result once succeeded
+    error = db.Column(db.Text)                                  # Error message once failed
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    owner = db.Column(db.String(64))                            # Queue that claimed the job, see JobQueue.owner
+    heartbeat_at = db.Column(db.DateTime)                       # Refreshed by the owner while the job runs
+
+
+def _job_dict(job_id, kind, status, payload=None, result=None, error=None,
+              created_at=None, started_at=None, finished_at=None):
+    return {
+        'job_id': job_id,
+        'kind': kind,
+        'status': status,
+        'payload': payload,
+        'result': result,
+        'error': error,
+        'created_at': created_at.isoformat() if created_at else None,
+        'started_at': started_at.isoformat() if started_at else None,
+        'finished_at': finished_at.isoformat() if finished_at else None,
+    }
+
+
+class DatabaseJobStore:
+    """Persists jobs in the jobs table so their status survives across workers."""
+
+    def create(self, job_id, kind, payload):
+        db.session.add(Job(job_id=job_id, kind=kind, status='queued', payload=json.dumps(payload),
+                           created_at=datetime.utcnow()))
+        db.session.commit()
+
+    def claim(self, job_id, owner):
+        """Moves a queued job to 'running' for ``owner``; False when another queue already claimed it."""
+        now = datetime.utcnow()
+        result = db.session.execute(
+            Job.__table__.update()
+            .where(Job.job_id == job_id, Job.status == 'queued')
+            .values(status='running', owner=owner, started_at=now, heartbeat_at=now)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def heartbeat(self, owner):
+        db.session.execute(
+            Job.__table__.update()
+            .where(Job.owner == owner, Job.status == 'running')
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    def finish(self, job_id, owner, **values):
+        """Records the outcome of a job; False when the job is no longer running for ``owner``
+        (recovery failed it), in which case the row is left alone."""
+        if 'result' in values:
+            values['result'] = json.dumps(values['result'])
+        result = db.session.execute(
+            Job.__table__.update()
+            .where(Job.job_id == job_id, Job.owner == owner, Job.status == 'running')
+            .values(**values)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def recover(self, stale_before, owner):
+        """Fails running jobs of other owners whose last heartbeat is older than
+        ``stale_before``, and returns the queued jobs.
+
+        Jobs are persisted with their kind and payload, so a queued job whose
+        process went away can be claimed and run by any worker.
+        """
+        db.session.execute(
+            Job.__table__.update()
+            .where(Job.status == 'running', or_(Job.owner.is_(None), Job.owner != owner),
+                   func.coalesce(Job.heartbeat_at, Job.started_at) < stale_before)
+            .values(status='failed', error='Interrupted before finishing', finished_at=datetime.utcnow())
+        )
+        db.session.commit()
+        rows = db.session.execute(
+            select(Job.job_id, Job.kind, Job.payload).where(Job.status == 'queued').order_by(Job.created_at)
+        )
+        return [(job_id, kind, json.loads(payload) if payload else {}) for job_id, kind, payload in rows]
+
+    def get(self, job_id):
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return None
+        db.session.refresh(job)
+        return _job_dict(job.job_id, job.kind, job.status,
+                         json.loads(job.payload) if job.payload else None,
+                         json.loads(job.result) if job.result else None,
+                         job.error, job.created_at, job.started_at, job.finished_at)
+
+
+class MemoryJobStore:
+    """Local stand-in for DatabaseJobStore; jobs only live as long as the process."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = Lock()
+
+    def create(self, job_id, kind, payload):
+        with self._lock:
+            self._jobs[job_id] = {'job_id': job_id, 'kind': kind, 'status': 'queued', 'payload': payload,
+                                  'created_at': datetime.utcnow()}
+
+    def claim(self, job_id, owner):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job['status'] != 'queued':
+                return False
+            job.update(status='running', owner=owner, started_at=datetime.utcnow())
+            return True
+
+    def heartbeat(self, owner):
+        # Jobs cannot outlive the process that owns them
+        pass
+
+    def finish(self, job_id, owner, **values):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job['status'] != 'running' or job.get('owner') != owner:
+                return False
+            job.update(values)
+            return True
+
+    def recover(self, stale_before, owner):
+        # Jobs die with the process, so there is never anything to recover
+        return []
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return _job_dict(**{key: value for key, value in job.items() if key != 'owner'})
+
+
+JOB_STORES = {
+    'database': DatabaseJobStore,
+    'memory': MemoryJobStore,
+}
+
+
+class JobQueue:
+    """In-process job queue: a thread pool running registered handlers.
+
+    No external broker is involved. Handlers run inside an application context
+    and return a JSON-serializable result. Threads only start once a job is
+    submitted or recovered. While jobs run, a heartbeat thread marks them as
+    alive under the queue's ``owner`` id, so recovery elsewhere leaves them be.
+    """
+
+    def __init__(self, app, store, max_workers, heartbeat_interval=JOB_HEARTBEAT_INTERVAL):
+        self.app = app
+        self.store = store
+        self.handlers = {}
+        self.owner = f'{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.heartbeat_interval = heartbeat_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._finished = Condition()
+        self._running = set()
+        self._running_lock = Lock()
+        self._heartbeat = None
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def submit(self, kind, payload):
+        if kind not in self.handlers:
+            raise KeyError(f'No handler registered for job kind {kind}')
+        job_id = str(uuid.uuid4())
+        self.store.create(job_id, kind, payload)
+        self._executor.submit(self._run, job_id, kind, payload)
+        return job_id
+
+    def recover(self, timeout):
+        """Resubmits jobs queued by a process that exited before running them.
+
+        Running jobs of other queues without a heartbeat for ``timeout``
+        seconds are marked failed. Claiming keeps two processes from running
+        the same job. Returns the number of jobs resubmitted.
+        """
+        with self.app.app_context():
+            try:
+                jobs = self.store.recover(datetime.utcnow() - timedelta(seconds=timeout), self.owner)
+            except SQLAlchemyError as e:
+                # E.g. the jobs table does not exist yet
+                db.session.rollback()
+                self.app.logger.warning('Job recovery skipped: %s', e)
+                return 0
+        for job_id, kind, payload in jobs:
+            if kind in self.handlers:
+                self._executor.submit(self._run, job_id, kind, payload)
+        return len(jobs)
+
+    def shutdown(self):
+        """Waits for every submitted job to finish."""
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job_id, kind, payload):
+        with self.app.app_context():
+            if not self.store.claim(job_id, self.owner):
+                return
+            self._started(job_id)
+            try:
+                result = self.handlers[kind](**payload)
+            except Exception as e:
+                db.session.rollback()
+                values = {'status': 'failed', 'error': str(e)}
+            else:
+                values = {'status': 'succeeded', 'result': result}
+            finally:
+                with self._running_lock:
+                    self._running.discard(job_id)
+            if not self.store.finish(job_id, self.owner, finished_at=datetime.utcnow(), **values):
+                self.app.logger.warning('Job %s was failed by recovery before it finished', job_id)
+        with self._finished:
+            self._finished.notify_all()
+
+    def _started(self, job_id):
+        with self._running_lock:
+            self._running.add(job_id)
+            if self._heartbeat is None:
+                self._heartbeat = Thread(target=self._beat, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        # Runs while this queue has jobs running, then exits until the next one starts
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._running_lock:
+                if not self._running:
+                    self._heartbeat = None
+                    return
+            with self.app.app_context():
+                try:
+                    self.store.heartbeat(self.owner)
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    self.app.logger.warning('Job heartbeat failed: %s', e)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """Returns the job once it has finished or ``timeout`` seconds have passed."""
+        deadline = datetime.utcnow().timestamp() + timeout
+        job = self.get(job_id)
+        while job and job['status'] in ('queued', 'running'):
+            remaining = deadline - datetime.utcnow().timestamp()
+            if remaining <= 0:
+                break
+            with self._finished:
+                self._finished.wait(min(remaining, 1.0))
+            job = self.get(job_id)
+        return job
+
+
+def _nutritional_analysis_job(user_id):
+    from .nutrition_rollups import refresh_nutritional_analysis
+
+    buckets = refresh_nutritional_analysis(user_id)
+    if buckets is None:
+        raise ValueError('No food logs found for the user')
+    db.session.commit()
+    return {'updated_buckets': buckets}
+
+
+def _weekly_meals_job(plan_id, seed=None):
+    from .meal_generation import generate_weekly_meals
+
+    return {'plan_id': plan_id, 'meals': generate_weekly_meals(plan_id, seed)}
+
+
+def _batch_meal_plans_job(user_ids, stage_name_ids, solver, start_date, time_budget_ms=None):
+    from .batch_generation import resolve_patients, generate_plans, save_generated_plans
+
+    started = time.perf_counter()
+    options = {'time_budget': time_budget_ms / 1000} if time_budget_ms is not None else {}
+    patients = resolve_patients(user_ids, stage_name_ids)
+    generated, rows = save_generated_plans(generate_plans(patients, solver, options),
+                                           date.fromisoformat(start_date))
+    return {'patients': generated, 'rows': rows, 'elapsed_seconds': round(time.perf_counter() - started, 3)}
+
+
+def init_job_queue(app):
+    """Creates the app's job queue; JOB_STORE selects 'database' (default) or 'memory'.
+
+    Only an app created with JOB_RECOVERY set (the serving process, see
+    run.py) picks up jobs orphaned by a restart on startup; CLI commands and
+    worker processes leave them to it or to ``flask run-jobs``. JOB_TIMEOUT
+    (seconds) is how long a running job may go without a heartbeat before
+    recovery treats it as orphaned.
+    """
+    store = JOB_STORES[app.config.get('JOB_STORE', 'database')]()
+    queue = JobQueue(app, store, app.config.get('JOB_WORKERS', 4))
+    queue.register('nutritional_analysis', _nutritional_analysis_job)
+    queue.register('weekly_meals', _weekly_meals_job)
+    queue.register('batch_meal_plans', _batch_meal_plans_job)
+    app.extensions['job_queue'] = queue
+    if app.config.get('JOB_RECOVERY'):
+        # Pick up jobs orphaned by a restart without delaying startup
+        queue._executor.submit(queue.recover, app.config.get('JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT))
+    return queue
+
+
+def job_queue():
+    return current_app.extensions['job_queue']
@@ -0,0 +1,85 @@
+import math
+
+from sqlalchemy import select, insert, update, delete
+
+from ..db import db
+from .User_Meal_Plan import UserMealPlan
+
+# Columns compared to decide whether a matched row needs an UPDATE
+VALUE_COLUMNS = ('day', 'calories', 'protein', 'carbs', 'fats', 'fiber', 'sat_fat', 'grams', 'measure')
+
+
+def _row_key(row):
+    return row['log_date'], row['meal_type'], row['meal_name']
+
+
+def _changed(stored, incoming):
+    for column in VALUE_COLUMNS:
+        old, new = stored[column], incoming[column]
+        if isinstance(old, float) and isinstance(new, (int, float)):
+            if not math.isclose(old, new, rel_tol=1e-9, abs_tol=1e-6):
+                return True
+        elif old != new:
+            return True
+    return False
+
+
+def sync_user_meal_plan(user_id, stage_name, rows, start_date):
+    """Brings the stored plan from ``start_date`` onward in line with ``rows``.
+
+    Stored and incoming meals are matched by (date, meal_type, meal_name), i.e.
+    by day, meal type and meal name within the saved week. Matched meals are
+    updated only if their values changed, a replaced meal reuses the stored
+    row of its slot, and only what is left over is inserted or deleted. The caller
+    commits. Returns ``{'inserted': n, 'updated': n, 'deleted': n}``.
+    """
+    stored = db.session.execute(
+        select(UserMealPlan.id, UserMealPlan.log_date, UserMealPlan.meal_type,
+               UserMealPlan.meal_name, *[getattr(UserMealPlan, column) for column in VALUE_COLUMNS])
+        .where(UserMealPlan.user_id == user_id,
+               UserMealPlan.stage_name == stage_name,
+               UserMealPlan.log_date >= start_date)
+        .order_by(UserMealPlan.id)
+    ).mappings().all()
+
+    # The same meal can appear twice in a slot, so keep a list per key
+    existing = {}
+    for row in stored:
+        existing.setdefault(_row_key(row), []).append(row)
+
+    unmatched, updates = [], []
+    for row in rows:
+        matches = existing.get(_row_key(row))
+        if not matches:
+            unmatched.append(row)
+            continue
+        match = matches.pop(0)
+        if _changed(match, row):
+            updates.append({'id': match['id'], **{column: row[column] for column in VALUE_COLUMNS}})
+
+    # A meal swapped for another one in the same slot reuses the stored row
+    leftovers = {}
+    for matches in existing.values():
+        for row in matches:
+            leftovers.setdefault((row['log_date'], row['meal_type']), []).append(row)
+    inserts = []
+    for row in unmatched:
+        slot = leftovers.get((row['log_date'], row['meal_type']))
+        if slot:
+            match = slot.pop(0)
+            updates.append({'id': match['id'], 'meal_name': row['meal_name'],
+                            **{column: row[column] for column in VALUE_COLUMNS}})
+        else:
+            inserts.append(row)
+
+    deletes = [row['id'] for slot in leftovers.values() for row in slot]
+
+    if deletes:
+        db.session.execute(delete(UserMealPlan).where(UserMealPlan.id.in_(deletes)))
+    if updates:
+        # ORM bulk UPDATE by primary key
+        db.session.execute(update(UserMealPlan), updates)
+    if inserts:
+        db.session.execute(insert(UserMealPlan), inserts)
+
+    return {'inserted': len(inserts), 'updated': len(updates), 'deleted': len(deletes)}
@@ -0,0 +1,220 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, func, extract, or_
+
+from ..db import db
+from .foodlog import FoodLog, LOG_ID_OVERLAP
+from .daily_intake import DailyIntake
+from .NutritionAnalysis import NutritionAnalysis, AnalysisWatermark
+
+# Nutrient columns of foodlog / nutritionalanalysis
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fats', 'fiber', 'sat_fat')
+
+
+def _nutrient_columns(aggregate):
+    return [aggregate(getattr(FoodLog, nutrient)).label(nutrient) for nutrient in NUTRIENTS]
+
+
+def _nutrients(row):
+    return {nutrient: row[nutrient] for nutrient in NUTRIENTS}
+
+
+def first_log_date(user_id):
+    return db.session.execute(
+        select(func.min(FoodLog.log_date)).where(FoodLog.user_id == user_id)
+    ).scalar()
+
+
+def daily_rollup(user_id, *filters):
+    """Total intake per logged day."""
+    rows = db.session.execute(
+        select(FoodLog.log_date, *_nutrient_columns(func.sum))
+        .where(FoodLog.user_id == user_id, *filters)
+        .group_by(FoodLog.log_date)
+        .order_by(FoodLog.log_date)
+    ).mappings()
+    return [
+        {'log_date': row['log_date'], 'day_variant': row['log_date'].strftime('%A'), **_nutrients(row)}
+        for row in rows
+    ]
+
+
+def week_bucket(anchor):
+    """SQL expression numbering 7-day weeks from ``anchor`` (week 0 starts on the anchor)."""
+    return func.floor(func.datediff(FoodLog.log_date, anchor) / 7)
+
+
+def weekly_rollup(user_id, anchor, *filters):
+    """Average logged meal per week, weeks counted from the user's first log (``anchor``)."""
+    bucket = week_bucket(anchor).label('bucket')
+    rows = db.session.execute(
+        select(bucket, *_nutrient_columns(func.avg))
+        .where(FoodLog.user_id == user_id, *filters)
+        .group_by(bucket)
+        .order_by(bucket)
+    ).mappings()
+    return [
+        {
+            'log_date': anchor + timedelta(days=7 * int(row['bucket']) + 6),  # The last date of the week
+            'day_variant': f"Week {int(row['bucket']) + 1}",
+            **_nutrients(row),
+        }
+        for row in rows
+    ]
+
+
+def monthly_rollup(user_id, *filters):
+    """Average logged meal per calendar month, dated by the month's last log."""
+    year = extract('year', FoodLog.log_date).label('year')
+    month = extract('month', FoodLog.log_date).label('month')
+    rows = db.session.execute(
+        select(year, month, func.max(FoodLog.log_date).label('last_log_date'), *_nutrient_columns(func.avg))
+        .where(FoodLog.user_id == user_id, *filters)
+        .group_by(year, month)
+        .order_by(year, month)
+    ).mappings()
+    return [
+        {
+            'log_date': row['last_log_date'],
+            'day_variant': datetime(int(row['year']), int(row['month']), 1).strftime('%B'),
+            **_nutrients(row),
+        }
+        for row in rows
+    ]
+
+
+def yearly_rollup(user_id, date_from=None, date_to=None, limit=None):
+    """Total intake per calendar year, newest first, dated by the year's last logged day.
+
+    Sums the daily_intake rollup (one row per logged day) instead of the raw
+    food logs; ``limit`` keeps the newest years only.
+    """
+    year = extract('year', DailyIntake.log_date).label('year')
+    query = (
+        select(year, func.max(DailyIntake.log_date).label('last_log_date'),
+               *[func.sum(getattr(DailyIntake, nutrient)).label(nutrient) for nutrient in NUTRIENTS])
+        .where(DailyIntake.user_id == user_id)
+        .group_by(year)
+        .order_by(year.desc())
+    )
+    if date_from:
+        query = query.where(DailyIntake.log_date >= date_from)
+    if date_to:
+        query = query.where(DailyIntake.log_date <= date_to)
+    if limit is not None:
+        query = query.limit(limit)
+    return [
+        {
+            'user_id': user_id,
+            'log_date': row['last_log_date'].isoformat(),
+            'timeframe': 'yearly',
+            'day_variant': str(int(row['year'])),
+            **{nutrient: float(row[nutrient]) if row[nutrient] is not None else None for nutrient in NUTRIENTS},
+        }
+        for row in db.session.execute(query).mappings()
+    ]
+
+
+def _month_range(year, month):
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return start, end
+
+
+def upsert_statement(table, rows, keys, columns):
+    """INSERT ... that overwrites ``columns`` of the existing row on a conflict over ``keys``."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in columns})
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[key] for key in keys],
+        set_={column: stmt.excluded[column] for column in columns},
+    )
+
+
+def refresh_nutritional_analysis(user_id):
+    """Brings the user's nutritionalanalysis rows up to date with their food logs.
+
+    Only logs past the user's watermark (the last aggregated log_id, less
+    LOG_ID_OVERLAP for late commits) are inspected. The daily, weekly and
+    monthly buckets they fall into are re-aggregated in SQL and upserted on
+    uq_nutritionalanalysis_bucket, so each bucket keeps exactly one row even
+    when refreshes run concurrently and re-reading the overlap is harmless.
+    A first run, or a log dated before the week anchor, rebuilds everything.
+    The caller commits. Returns the number of buckets written, or None if the
+    user has no logs at all.
+    """
+    watermark = db.session.get(AnalysisWatermark, user_id)
+    since = watermark.last_log_id - LOG_ID_OVERLAP if watermark else 0
+
+    new_logs = db.session.execute(
+        select(func.max(FoodLog.log_id), func.min(FoodLog.log_date))
+        .where(FoodLog.user_id == user_id, FoodLog.log_id > since)
+    ).one()
+    last_log_id, earliest = new_logs
+    if last_log_id is None:
+        return None if watermark is None else 0
+
+    analysis = NutritionAnalysis.__table__
+    if watermark is None or earliest < watermark.anchor_date:
+        # Full rebuild: weeks are renumbered from the (new) first log
+        anchor = first_log_date(user_id)
+        db.session.execute(analysis.delete().where(analysis.c.user_id == user_id))
+        daily = daily_rollup(user_id)
+        weekly = weekly_rollup(user_id, anchor)
+        monthly = monthly_rollup(user_id)
+        month_ranges = []
+    else:
+        anchor = watermark.anchor_date
+        dates = db.session.execute(
+            select(FoodLog.log_date).distinct()
+            .where(FoodLog.user_id == user_id, FoodLog.log_id > since)
+        ).scalars().all()
+
+        weeks = sorted({(day - anchor).days // 7 for day in dates})
+        week_ranges = [(anchor + timedelta(days=7 * week), anchor + timedelta(days=7 * week + 6)) for week in weeks]
+        month_ranges = [_month_range(year, month) for year, month in sorted({(day.year, day.month) for day in dates})]
+
+        # Re-aggregate only the affected buckets; they are upserted below
+        daily = daily_rollup(user_id, FoodLog.log_date.in_(dates))
+        weekly = weekly_rollup(user_id, anchor, or_(*[FoodLog.log_date.between(s, e) for s, e in week_ranges]))
+        monthly = monthly_rollup(user_id, or_(*[FoodLog.log_date.between(s, e) for s, e in month_ranges]))
+
+    entries = [
+        {'user_id': user_id, 'timeframe': timeframe, **row}
+        for timeframe, rows in (('daily', daily), ('weekly', weekly), ('monthly', monthly))
+        for row in rows
+    ]
+    if entries:
+        db.session.execute(upsert_statement(analysis, entries, ('user_id', 'timeframe', 'log_date'),
+                                             ('day_variant',) + NUTRIENTS))
+    if month_ranges:
+        # A month is dated by its last log, so a newer log moves the bucket's
+        # date: drop the row left at the old date
+        db.session.execute(analysis.delete().where(
+            analysis.c.user_id == user_id,
+            analysis.c.timeframe == 'monthly',
+            or_(*[analysis.c.log_date.between(start, end) for start, end in month_ranges]),
+            analysis.c.log_date.not_in([row['log_date'] for row in monthly]),
+        ))
+
+    if watermark is not None:
+        # The overlap alone never moves the watermark back
+        last_log_id = max(last_log_id, watermark.last_log_id)
+    # Upserted too: concurrent first refreshes of a user would both insert it
+    db.session.execute(upsert_statement(
+        AnalysisWatermark.__table__,
+        [{'user_id': user_id, 'last_log_id': last_log_id, 'anchor_date': anchor}],
+        ('user_id',), ('last_log_id', 'anchor_date'),
+    ))
+    if watermark is not None:
+        db.session.expire(watermark)
+    return len(entries)
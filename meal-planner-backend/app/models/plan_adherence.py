@@ -0,0 +1,288 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, delete, update, func, and_, or_, union, tuple_
+
+from ..db import db
+from .foodlog import FoodLog, LOG_ID_OVERLAP, log_today
+from .User_Meal_Plan import UserMealPlan
+from .adherence import LIMIT_NUTRIENTS
+from .daily_intake import INTAKE_NUTRIENTS
+from .nutrition_rollups import upsert_statement
+
+
+class MealAdherence(db.Model):
+    """Planned versus eaten totals of one patient-day, cached by refresh_adherence."""
+    __tablename__ = 'meal_adherence'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    log_date = db.Column(db.Date, primary_key=True)
+    planned_meals = db.Column(db.Integer, nullable=False, default=0)   # Meal types planned for the day
+    logged_meals = db.Column(db.Integer, nullable=False, default=0)    # Meal types with at least one log
+    matched_meals = db.Column(db.Integer, nullable=False, default=0)   # Planned meal types that were logged
+    planned_calories = db.Column(db.Float, nullable=False, default=0)
+    planned_protein = db.Column(db.Float, nullable=False, default=0)
+    planned_carbs = db.Column(db.Float, nullable=False, default=0)
+    planned_fats = db.Column(db.Float, nullable=False, default=0)
+    planned_fiber = db.Column(db.Float, nullable=False, default=0)
+    planned_sat_fat = db.Column(db.Float, nullable=False, default=0)
+    eaten_calories = db.Column(db.Float, nullable=False, default=0)
+    eaten_protein = db.Column(db.Float, nullable=False, default=0)
+    eaten_carbs = db.Column(db.Float, nullable=False, default=0)
+    eaten_fats = db.Column(db.Float, nullable=False, default=0)
+    eaten_fiber = db.Column(db.Float, nullable=False, default=0)
+    eaten_sat_fat = db.Column(db.Float, nullable=False, default=0)
+    score = db.Column(db.Float, nullable=False, default=0)            # 0-100, see day_score
+    computed_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def deviation(self):
+        return nutrient_deviation(
+            {nutrient: getattr(self, f'planned_{nutrient}') for nutrient in INTAKE_NUTRIENTS},
+            {nutrient: getattr(self, f'eaten_{nutrient}') for nutrient in INTAKE_NUTRIENTS},
+        )
+
+    def serialize(self):
+        return {
+            'user_id': self.user_id,
+            'log_date': self.log_date.isoformat(),
+            'planned_meals': self.planned_meals,
+            'logged_meals': self.logged_meals,
+            'matched_meals': self.matched_meals,
+            'planned': {nutrient: getattr(self, f'planned_{nutrient}') for nutrient in INTAKE_NUTRIENTS},
+            'eaten': {nutrient: getattr(self, f'eaten_{nutrient}') for nutrient in INTAKE_NUTRIENTS},
+            'deviation': self.deviation(),
+            'score': self.score,
+        }
+
+
+class AdherenceWatermark(db.Model):
+    __tablename__ = 'adherence_watermarks'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    last_log_id = db.Column(db.Integer, nullable=False)  # Newest FoodLog.log_id already scored
+    scored_through = db.Column(db.Date)                  # Planned days up to this date are scored
+
+
+def nutrient_deviation(planned, eaten):
+    """Relative deviation of eaten from planned per nutrient (0.1 = 10% over, -0.1 = 10% under).
+
+    None where nothing of the nutrient was planned.
+    """
+    deviation = {}
+    for nutrient in INTAKE_NUTRIENTS:
+        if not planned[nutrient]:
+            deviation[nutrient] = None
+            continue
+        value = (eaten[nutrient] - planned[nutrient]) / planned[nutrient]
+        if nutrient in LIMIT_NUTRIENTS:
+            value = max(value, 0.0)
+        deviation[nutrient] = round(value, 4)
+    return deviation
+
+
+def day_score(planned_meals, matched_meals, deviation):
+    """Adherence of a day from 0 to 100.
+
+    The share of planned meal types that were logged, scaled down by the mean
+    absolute nutrient deviation (a day 50% off on average keeps half its score).
+    A day without a plan scores 0.
+    """
+    if not planned_meals:
+        return 0.0
+    deviations = [abs(value) for value in deviation.values() if value is not None]
+    closeness = max(0.0, 1.0 - sum(deviations) / len(deviations)) if deviations else 0.0
+    return round(100.0 * matched_meals / planned_meals * closeness, 1)
+
+
+# Patients refreshed per statement set; bounds the user_id lists each statement binds
+ADHERENCE_CHUNK_SIZE = 500
+
+
+def _stale_days(user_ids, today):
+    """The patient-days of ``user_ids`` to (re)score, as a ``(user_id, log_date)`` subquery.
+
+    Only rows past each patient's watermark are read: logs with a log_id
+    above ``last_log_id`` less LOG_ID_OVERLAP (late commits), and planned or
+    logged days after ``scored_through`` up to ``today`` (ranges of the
+    per-user date indexes). Patients without a watermark are read in full.
+    Each call builds a new subquery, so one statement can embed several.
+    """
+    watermark = AdherenceWatermark.__table__
+
+    def after_watermark(model, *criteria):
+        return (
+            select(model.user_id, model.log_date)
+            .outerjoin(watermark, watermark.c.user_id == model.user_id)
+            .where(model.user_id.in_(user_ids),
+                   or_(*criteria,
+                       and_(model.log_date <= today,
+                            or_(watermark.c.scored_through.is_(None), model.log_date > watermark.c.scored_through))))
+        )
+
+    new_logs = FoodLog.log_id > func.coalesce(watermark.c.last_log_id, 0) - LOG_ID_OVERLAP
+    return union(after_watermark(UserMealPlan), after_watermark(FoodLog, new_logs)).subquery()
+
+
+def _slot_totals(model, days):
+    meal_type = func.lower(model.meal_type).label('meal_type')
+    return (
+        select(model.user_id, model.log_date, meal_type, func.count().label('meals'),
+               *[func.coalesce(func.sum(getattr(model, nutrient)), 0).label(nutrient) for nutrient in INTAKE_NUTRIENTS])
+        .join(days, and_(days.c.user_id == model.user_id, days.c.log_date == model.log_date))
+        .group_by(model.user_id, model.log_date, meal_type)
+        .subquery()
+    )
+
+
+def compare_days(days):
+    """Planned versus eaten per (patient, day, meal type) for the days selected by ``days()``, in one statement.
+
+    ``days`` builds a ``(user_id, log_date)`` subquery, such as _stale_days;
+    it is joined rather than listed, so the statement stays the same size
+    however many days are compared. Planned and logged meals are summed per
+    slot, and every slot present on either side is joined to both sums (a
+    portable full outer join).
+    Returns MealAdherence column dicts, one per patient-day.
+    """
+    planned = _slot_totals(UserMealPlan, days())
+    eaten = _slot_totals(FoodLog, days())
+    # Each side is rendered twice; separate copies keep their expanding IN parameters apart
+    slots = union(*[select(totals.c.user_id, totals.c.log_date, totals.c.meal_type)
+                    for totals in (_slot_totals(UserMealPlan, days()), _slot_totals(FoodLog, days()))]).subquery()
+
+    def same_slot(totals):
+        return and_(totals.c.user_id == slots.c.user_id, totals.c.log_date == slots.c.log_date,
+                    totals.c.meal_type == slots.c.meal_type)
+
+    rows = db.session.execute(
+        select(slots.c.user_id, slots.c.log_date,
+               planned.c.meals.label('planned_meals'), eaten.c.meals.label('eaten_meals'),
+               *[planned.c[nutrient].label(f'planned_{nutrient}') for nutrient in INTAKE_NUTRIENTS],
+               *[eaten.c[nutrient].label(f'eaten_{nutrient}') for nutrient in INTAKE_NUTRIENTS])
+        .select_from(slots)
+        .outerjoin(planned, same_slot(planned))
+        .outerjoin(eaten, same_slot(eaten))
+    ).mappings()
+
+    scored = {}
+    for row in rows:
+        key = (row['user_id'], row['log_date'])
+        day = scored.get(key)
+        if day is None:
+            day = scored[key] = {
+                'user_id': key[0], 'log_date': key[1],
+                'planned_meals': 0, 'logged_meals': 0, 'matched_meals': 0,
+                **{f'{side}_{nutrient}': 0.0 for side in ('planned', 'eaten') for nutrient in INTAKE_NUTRIENTS},
+            }
+        day['planned_meals'] += 1 if row['planned_meals'] else 0
+        day['logged_meals'] += 1 if row['eaten_meals'] else 0
+        day['matched_meals'] += 1 if row['planned_meals'] and row['eaten_meals'] else 0
+        for side in ('planned', 'eaten'):
+            for nutrient in INTAKE_NUTRIENTS:
+                day[f'{side}_{nutrient}'] += float(row[f'{side}_{nutrient}'] or 0)
+
+    for day in scored.values():
+        deviation = nutrient_deviation(
+            {nutrient: day[f'planned_{nutrient}'] for nutrient in INTAKE_NUTRIENTS},
+            {nutrient: day[f'eaten_{nutrient}'] for nutrient in INTAKE_NUTRIENTS},
+        )
+        day['score'] = day_score(day['planned_meals'], day['matched_meals'], deviation)
+    return list(scored.values())
+
+
+def refresh_adherence(user_ids, today=None):
+    """Scores the patient-days of ``user_ids`` that changed since the last refresh; the caller commits.
+
+    Set-based: per chunk of ADHERENCE_CHUNK_SIZE patients, one comparison
+    over all their stale days, one delete, one insert, one read of the
+    newest log ids and one watermark upsert, however many days are stale.
+    Returns the number of days rescored.
+    """
+    today = today or log_today()
+    rescored = 0
+    for offset in range(0, len(user_ids), ADHERENCE_CHUNK_SIZE):
+        rescored += _refresh_chunk(user_ids[offset:offset + ADHERENCE_CHUNK_SIZE], today)
+    return rescored
+
+
+def _refresh_chunk(user_ids, today):
+    def days():
+        return _stale_days(user_ids, today)
+
+    # Every stale day has a plan or a log, so each one gets a scored row back
+    scored = compare_days(days)
+    stale = days()
+    db.session.execute(delete(MealAdherence).where(
+        tuple_(MealAdherence.user_id, MealAdherence.log_date).in_(select(stale.c.user_id, stale.c.log_date))
+    ))
+    if scored:
+        db.session.execute(insert(MealAdherence), [{**day, 'computed_at': datetime.utcnow()} for day in scored])
+
+    # New watermark rows start at the newest log; existing ones only move forward
+    watermark = AdherenceWatermark.__table__
+    known = dict(db.session.execute(
+        select(watermark.c.user_id, watermark.c.last_log_id).where(watermark.c.user_id.in_(user_ids))
+    ).all())
+    newest = dict(db.session.execute(
+        select(FoodLog.user_id, func.max(FoodLog.log_id))
+        .outerjoin(watermark, watermark.c.user_id == FoodLog.user_id)
+        .where(FoodLog.user_id.in_(user_ids), FoodLog.log_id > func.coalesce(watermark.c.last_log_id, 0))
+        .group_by(FoodLog.user_id)
+    ).all())
+    rows = [{'user_id': user_id, 'last_log_id': newest.get(user_id, known.get(user_id, 0)), 'scored_through': today}
+            for user_id in user_ids]
+    db.session.execute(upsert_statement(watermark, rows, ['user_id'], ['last_log_id', 'scored_through']))
+    return len(scored)
+
+
+def invalidate_adherence(user_ids, start, end=None):
+    """Drops cached scores from ``start`` (to ``end``) after a plan change, so the
+    next refresh rescores those days. Runs in the caller's transaction."""
+    stmt = delete(MealAdherence).where(MealAdherence.user_id.in_(user_ids), MealAdherence.log_date >= start)
+    if end is not None:
+        stmt = stmt.where(MealAdherence.log_date <= end)
+    db.session.execute(stmt)
+    # Planned days are rescored from the watermark's date onwards
+    db.session.execute(
+        update(AdherenceWatermark)
+        .where(AdherenceWatermark.user_id.in_(user_ids), AdherenceWatermark.scored_through >= start)
+        .values(scored_through=start - timedelta(days=1))
+    )
+
+
+def adherence_days(user_id, start, end):
+    return (
+        MealAdherence.query
+        .filter(MealAdherence.user_id == user_id, MealAdherence.log_date.between(start, end))
+        .order_by(MealAdherence.log_date)
+        .all()
+    )
+
+
+def adherence_summary(user_ids, start, end):
+    """Average score and totals per user over the planned days between ``start`` and ``end``, in one GROUP BY."""
+    rows = db.session.execute(
+        select(MealAdherence.user_id,
+               func.count().label('days'),
+               func.avg(MealAdherence.score).label('average_score'),
+               func.sum(MealAdherence.matched_meals).label('matched_meals'),
+               func.sum(MealAdherence.planned_meals).label('planned_meals'),
+               *[func.sum(getattr(MealAdherence, f'{side}_{nutrient}')).label(f'{side}_{nutrient}')
+                 for side in ('planned', 'eaten') for nutrient in INTAKE_NUTRIENTS])
+        .where(MealAdherence.user_id.in_(user_ids), MealAdherence.log_date.between(start, end),
+               MealAdherence.planned_meals > 0)
+        .group_by(MealAdherence.user_id)
+    ).mappings()
+    summary = {}
+    for row in rows:
+        summary[row['user_id']] = {
+            'user_id': row['user_id'],
+            'days': row['days'],
+            'average_score': round(float(row['average_score']), 1),
+            'matched_meals': int(row['matched_meals']),
+            'planned_meals': int(row['planned_meals']),
+            'deviation': nutrient_deviation(
+                {nutrient: float(row[f'planned_{nutrient}']) for nutrient in INTAKE_NUTRIENTS},
+                {nutrient: float(row[f'eaten_{nutrient}']) for nutrient in INTAKE_NUTRIENTS},
+            ),
+        }
+    return summary
@@ -0,0 +1,48 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# Defaults for the generated meal plan cache
+PLAN_CACHE_SIZE = 512
+PLAN_CACHE_TTL = 15 * 60  # seconds
+
+
+class PlanCache:
+    """Bounded LRU cache whose entries also expire ``ttl`` seconds after being stored."""
+
+    def __init__(self, maxsize=PLAN_CACHE_SIZE, ttl=PLAN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Generated weekly plans, keyed by (stage_name_id, seed, catalog version,
+# MealPlan.updated_at, solver, time budget)
+plan_cache = PlanCache()
@@ -0,0 +1,237 @@
+import random
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from .feasibility import nutrient_matrix
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MEAL_TYPES = ['breakfast', 'lunch', 'Supper', 'Snack']
+
+# Relative importance of reaching each goal (calories, protein, carbs, fat, fiber, sat_fat).
+# Saturated fat is a limit rather than a target, so only exceeding it is penalised.
+GOAL_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.0, 1.0, 0.0])
+LIMIT_ONLY = np.array([False, False, False, False, False, True])
+OVERSHOOT_PENALTY = 10.0
+
+# Knapsack bounds: items per meal type, and default time budget for a whole week
+MAX_ITEMS_PER_MEAL = 2
+DEFAULT_TIME_BUDGET = 0.5
+# Perturbed restarts per day; bounding them keeps seeded runs reproducible
+MAX_RESTARTS = 40
+
+
+def plan_deviation(totals, goals):
+    """Weighted relative distance of nutrient totals from the daily goals (lower is better).
+
+    ``totals`` may be a single vector or a (candidates x nutrients) matrix.
+    Going over a goal costs OVERSHOOT_PENALTY times more than falling short.
+    """
+    safe_goals = np.where(goals > 0, goals, 1.0)
+    over = np.maximum(totals - goals, 0.0) / safe_goals
+    under = np.where(LIMIT_ONLY, 0.0, np.maximum(goals - totals, 0.0) / safe_goals)
+    weights = np.where(LIMIT_ONLY, 1.0, GOAL_WEIGHTS)
+    return (OVERSHOOT_PENALTY * over + under) @ weights
+
+
+def _greedy_choice(catalog, goals, rng, exclude):
+    """Yields ``(meal_type, partition, index)`` picking greedily through the day."""
+    remaining = goals.copy()
+    for meal_type in MEAL_TYPES:
+        food_items = catalog.partition(meal_type)
+        if not food_items:
+            yield meal_type, None, None
+            continue
+
+        matrix = nutrient_matrix(food_items)
+        excluded = exclude(food_items) if exclude else None
+        index = matrix.pick_feasible(remaining, rng, excluded)
+        if index is None:
+            index = matrix.closest_calories(remaining, excluded)
+        else:
+            remaining -= matrix.values[index]
+        yield meal_type, food_items, index
+
+
+def greedy_day(catalog, goals, rng=random, exclude=None):
+    """Fills each meal type with a random food that fits the remaining budget.
+
+    Falls back to the closest calorie match when nothing fits. ``exclude``
+    optionally maps a partition to a mask of foods that must not be picked.
+    Returns ``{meal_type: [food, ...]}`` in the shape served by ``/api/meals/<id>``.
+    """
+    return {
+        meal_type: [food_items.item(index)] if index is not None else []
+        for meal_type, food_items, index in _greedy_choice(catalog, goals, rng, exclude)
+    }
+
+
+def knapsack_day(catalog, goals, rng=random, deadline=None, exclude=None):
+    """Treats one day as a bounded multi-constraint knapsack over the catalog.
+
+    Each meal type holds one to MAX_ITEMS_PER_MEAL foods and no food is used
+    twice in a day. Starting from the greedy choice, the solver repeatedly
+    applies the best single swap or addition (scored for every candidate in one
+    vectorized pass) until no move improves ``plan_deviation``, then restarts
+    from a perturbed plan, up to MAX_RESTARTS times or until ``deadline``.
+    Returns the best plan found.
+    """
+    # Start from the greedy plan, expressed as chosen indices per meal type
+    slots = []
+    chosen = []
+    for meal_type, food_items, index in _greedy_choice(catalog, goals, rng, exclude):
+        if food_items is None:
+            continue
+        excluded = exclude(food_items) if exclude else np.zeros(len(food_items), dtype=bool)
+        slots.append((meal_type, food_items, nutrient_matrix(food_items), excluded))
+        chosen.append([index] if index is not None else [])
+
+    def totals_of(plan):
+        totals = np.zeros_like(goals)
+        for (_, _, matrix, _), indices in zip(slots, plan):
+            for index in indices:
+                totals += matrix.values[index]
+        return totals
+
+    def descend(plan):
+        totals = totals_of(plan)
+        score = plan_deviation(totals, goals)
+        improved = True
+        while improved and (deadline is None or time.perf_counter() < deadline):
+            improved = False
+            for slot_index, (_, _, matrix, excluded) in enumerate(slots):
+                indices = plan[slot_index]
+                used = excluded.copy()
+                used[indices] = True
+
+                # Candidate moves: swap out one chosen item, or add another one
+                moves = [(position, totals - matrix.values[index]) for position, index in enumerate(indices)]
+                if len(indices) < MAX_ITEMS_PER_MEAL:
+                    moves.append((None, totals))
+                for position, base in moves:
+                    scores = plan_deviation(base + matrix.values, goals)
+                    scores[used] = np.inf
+                    best = int(np.argmin(scores))
+                    if scores[best] < score - 1e-9:
+                        if position is None:
+                            indices.append(best)
+                        else:
+                            indices[position] = best
+                        totals = base + matrix.values[best]
+                        score = scores[best]
+                        improved = True
+                        break
+        return plan, score
+
+    best_plan, best_score = descend([list(indices) for indices in chosen])
+    for _ in range(MAX_RESTARTS if slots else 0):
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        # Perturb one meal of the best plan and descend again
+        plan = [list(indices) for indices in best_plan]
+        slot_index = rng.randrange(len(slots))
+        allowed = np.flatnonzero(~slots[slot_index][3])
+        if not allowed.size:
+            continue
+        plan[slot_index] = [int(allowed[rng.randrange(allowed.size)])]
+        plan, score = descend(plan)
+        if score < best_score:
+            best_plan, best_score = plan, score
+
+    daily_meals = {meal_type: [] for meal_type in MEAL_TYPES}
+    for (meal_type, food_items, _, _), indices in zip(slots, best_plan):
+        daily_meals[meal_type] = [food_items.item(index) for index in indices]
+    return daily_meals
+
+
+def greedy_week(catalog, goals, rng=random, time_budget=None):
+    return {day: greedy_day(catalog, goals, rng) for day in DAYS_OF_WEEK}
+
+
+def knapsack_week(catalog, goals, rng=random, time_budget=DEFAULT_TIME_BUDGET):
+    """Runs knapsack_day for every day, sharing ``time_budget`` seconds across the week.
+
+    With a seeded ``rng`` the result is reproducible as long as the search
+    finishes within the budget; a search cut short may differ between runs.
+    """
+    week_deadline = time.perf_counter() + time_budget
+    generated_meals = {}
+    for position, day in enumerate(DAYS_OF_WEEK):
+        # Split whatever time is left evenly over the remaining days
+        now = time.perf_counter()
+        deadline = now + max(week_deadline - now, 0.0) / (len(DAYS_OF_WEEK) - position)
+        generated_meals[day] = knapsack_day(catalog, goals, rng, deadline)
+    return generated_meals
+
+
+# Plan generators selectable with ?solver= on /api/meals/<stage_name_id>
+SOLVERS = {
+    'greedy': greedy_week,
+    'knapsack': knapsack_week,
+}
+
+
+def day_totals(daily_meals):
+    """Nutrient totals of a generated day as a vector, for scoring plans."""
+    totals = np.zeros(len(GOAL_WEIGHTS))
+    for foods in daily_meals.values():
+        for food in foods:
+            totals += [food['calories'], food['protein'], food['carbs'], food['fat'], food['fiber'], food['sat_fat']]
+    return totals
+
+
+class VarietyWindow:
+    """Remembers the dishes of the last ``days`` generated days.
+
+    State is bounded by the window length, however many weeks are generated.
+    """
+
+    def __init__(self, days):
+        self.days = deque(maxlen=max(days, 0))
+        self.counts = Counter()
+
+    def exclude(self, partition):
+        """Mask of the partition's foods served within the window.
+
+        When the window covers every food of the partition, its oldest days
+        are dropped until some food is free again, so the least recently
+        served dishes come back first and no meal is left empty.
+        """
+        days = list(self.days)
+        counts = self.counts
+        while True:
+            mask = np.array(partition.name_mask(counts), dtype=bool)
+            if not mask.all() or not days:
+                return mask
+            days.pop(0)
+            counts = Counter(name for names in days for name in names)
+
+    def push(self, daily_meals):
+        if self.days.maxlen == 0:
+            return
+        if len(self.days) == self.days.maxlen:
+            self.counts.subtract(self.days[0])
+            self.counts += Counter()  # drop names whose count reached zero
+        names = [food['name'] for foods in daily_meals.values() for food in foods]
+        self.days.append(names)
+        self.counts.update(names)
+
+
+def generate_days(catalog, goals, weeks, solver='greedy', rng=random, variety_days=7,
+                  time_budget=DEFAULT_TIME_BUDGET):
+    """Yields ``(week, day, daily_meals)`` one day at a time for ``weeks`` weeks.
+
+    No dish is repeated within ``variety_days`` days, across week boundaries.
+    For the knapsack solver ``time_budget`` applies per week, as in knapsack_week.
+    """
+    window = VarietyWindow(variety_days)
+    for week in range(1, weeks + 1):
+        for day in DAYS_OF_WEEK:
+            if solver == 'knapsack':
+                deadline = time.perf_counter() + time_budget / len(DAYS_OF_WEEK)
+                daily_meals = knapsack_day(catalog, goals, rng, deadline, window.exclude)
+            else:
+                daily_meals = greedy_day(catalog, goals, rng, window.exclude)
+            window.push(daily_meals)
+            yield week, day, daily_meals
@@ -2,6 +2,10 @@ from ..db import db
 
 class ProviderInteraction(db.Model):
     __tablename__ = 'provider_interactions'
+    # A nutritionist's patient panel
+    __table_args__ = (
+        db.Index('ix_provider_interactions_provider_patient', 'provider_id', 'patient_id'),
+    )
 
     interaction_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
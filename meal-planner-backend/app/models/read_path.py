@@ -0,0 +1,24 @@
+from ..db import db
+
+# Rows pulled from the cursor at a time
+READ_BATCH_SIZE = 1000
+
+
+def stream_rows(stmt, yield_per=READ_BATCH_SIZE):
+    """Yields the rows of a Core ``select()`` as RowMappings, ``yield_per`` at a time.
+
+    Nothing enters the session's identity map, so list endpoints that only read
+    columns skip ORM hydration. Whether the rows also stay on the server
+    depends on the driver: ``yield_per`` asks for a server-side cursor, which
+    mysql+pymysql and mysql+mysqldb provide (SSCursor), but the configured
+    mysql+mysqlconnector dialect does not support them and SQLAlchemy falls
+    back to its buffered cursor. With it the whole result is still fetched
+    into client memory by the driver; only the Python row objects are built
+    in batches. Consume the rows before running another query in the same
+    session, as a server-side cursor requires.
+    """
+    result = db.session.execute(stmt, execution_options={'yield_per': yield_per})
+    try:
+        yield from result.mappings()
+    finally:
+        result.close()
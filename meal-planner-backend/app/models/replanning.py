@@ -0,0 +1,125 @@
+import random
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from ..db import db
+from .users import User
+from .meal_plans import MealPlan
+from .User_Meal_Plan import UserMealPlan
+from .catalog import get_catalog
+from .feasibility import meal_plan_budget, nutrient_matrix
+
+# Nutrient columns of user_meal_plan, in budget vector order
+PLAN_NUTRIENTS = ('calories', 'protein', 'carbs', 'fats', 'fiber', 'sat_fat')
+
+# Meals within this many days of the slot count as already used
+VARIETY_WINDOW_DAYS = 6
+
+# Stored spelling of each meal type, by its lower case form
+MEAL_TYPE_SPELLINGS = {meal_type.lower(): meal_type for meal_type in UserMealPlan.__table__.c.meal_type.type.enums}
+
+
+class ReplanError(Exception):
+    """Raised when a slot cannot be re-planned; carries the HTTP status to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def replan_slot(user_id, stage_name, log_date, meal_type, row_id=None, rng=random):
+    """Replaces one (day, meal_type) slot of a stored plan with a new catalog item.
+
+    The budget is the day's MealPlan goals minus the other meals stored for
+    that day, and meals used within VARIETY_WINDOW_DAYS are not picked again.
+    Updates the slot's row (``row_id`` or the first one) in place, or inserts
+    one if the slot is empty. The caller commits. Returns the new row.
+    """
+    # Requests may spell the slot in any case; rows are written in the enum's
+    meal_type = MEAL_TYPE_SPELLINGS.get(str(meal_type).lower())
+    if meal_type is None:
+        raise ReplanError(f'meal_type must be one of {", ".join(MEAL_TYPE_SPELLINGS.values())}')
+
+    meal_plan = (
+        MealPlan.query
+        .join(User, User.disease_id == MealPlan.disease_id)
+        .filter(User.user_id == user_id, MealPlan.stage_name == stage_name)
+        .first()
+    )
+    if not meal_plan:
+        raise ReplanError("MealPlan not found for the user's stage and disease", 404)
+
+    # One query for the whole variety window; the slot's day is a subset of it
+    rows = db.session.execute(
+        select(UserMealPlan.id, UserMealPlan.log_date, UserMealPlan.day, UserMealPlan.meal_type,
+               UserMealPlan.meal_name, *[getattr(UserMealPlan, column) for column in PLAN_NUTRIENTS])
+        .where(UserMealPlan.user_id == user_id,
+               UserMealPlan.stage_name == stage_name,
+               UserMealPlan.log_date.between(log_date - timedelta(days=VARIETY_WINDOW_DAYS),
+                                             log_date + timedelta(days=VARIETY_WINDOW_DAYS)))
+        .order_by(UserMealPlan.id)
+    ).all()
+
+    day_rows = [row for row in rows if row.log_date == log_date]
+    if not day_rows:
+        raise ReplanError('No stored meals for the requested day', 404)
+
+    slot_rows = [row for row in day_rows if row.meal_type.lower() == meal_type.lower()]
+    if row_id is not None:
+        replaced = next((row for row in slot_rows if row.id == row_id), None)
+        if replaced is None:
+            raise ReplanError('Meal not found in the requested slot', 404)
+    else:
+        replaced = slot_rows[0] if slot_rows else None
+
+    # Remaining budget for the day once every other stored meal is counted
+    budget = meal_plan_budget(meal_plan)
+    for row in day_rows:
+        if row is not replaced:
+            budget -= [getattr(row, column) for column in PLAN_NUTRIENTS]
+
+    food_items = get_catalog().partition(meal_type)
+    if not food_items:
+        raise ReplanError(f'No food items available for {meal_type}', 404)
+    matrix = nutrient_matrix(food_items)
+    used = np.array(food_items.name_mask({row.meal_name for row in rows}), dtype=bool)
+
+    index = matrix.pick_feasible(budget, rng, used)
+    if index is None:
+        index = matrix.closest_calories(budget, used)
+    if index is None:
+        raise ReplanError(f'No unused food items left for {meal_type}', 409)
+
+    food = food_items.item(index)
+    values = {
+        'meal_name': food['name'],
+        'calories': food['calories'],
+        'protein': food['protein'],
+        'carbs': food['carbs'],
+        'fats': food['fat'],
+        'fiber': food['fiber'],
+        'sat_fat': food['sat_fat'],
+        'grams': food['grams'],
+        'measure': food['measure'],
+    }
+
+    if replaced is not None:
+        db.session.execute(
+            UserMealPlan.__table__.update()
+            .where(UserMealPlan.id == replaced.id)
+            .values(**values)
+        )
+        row_id, day, meal_type = replaced.id, replaced.day, replaced.meal_type
+    else:
+        day = day_rows[0].day
+        row_id = db.session.execute(
+            UserMealPlan.__table__.insert()
+            .values(user_id=user_id, stage_name=stage_name, day=day, meal_type=meal_type,
+                    log_date=log_date, **values)
+        ).inserted_primary_key[0]
+
+    # Both paths return the row in the shape of UserMealPlan.serialize
+    return {'id': row_id, 'user_id': user_id, 'meal_type': meal_type, **values,
+            'log_date': log_date.isoformat(), 'stage_name': stage_name, 'day': day}
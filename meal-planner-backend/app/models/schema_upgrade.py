@@ -0,0 +1,61 @@
+from sqlalchemy import UniqueConstraint, inspect, select, func, delete, text
+
+from ..db import db
+
+
+def _dedupe(table, columns):
+    # Keeps the newest row (highest primary key) of every group the
+    # constraint would reject; the derived table lets MySQL delete from the
+    # table it reads
+    (primary_key,) = table.primary_key.columns
+    keep = select(func.max(primary_key).label('keep')).group_by(*columns).subquery()
+    result = db.session.execute(delete(table).where(primary_key.not_in(select(keep.c.keep))))
+    return result.rowcount
+
+
+def upgrade_schema():
+    """Creates missing tables, then the columns, indexes and unique constraints added to existing ones.
+
+    db.create_all() leaves existing tables untouched, so columns and
+    constraints declared on a model after its table was created never reach
+    the database. New columns are added as nullable. Rows a new unique
+    constraint would reject are removed first, keeping the newest.
+    Returns a list of ``(name, removed_rows)`` for what was created.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
+    created = []
+    for table in db.metadata.sorted_tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                db.session.execute(text(
+                    f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} '
+                    f'{column.type.compile(db.engine.dialect)}'
+                ))
+                db.session.commit()
+                created.append((f'{table.name}.{column.name}', 0))
+
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        existing |= {constraint['name'] for constraint in inspector.get_unique_constraints(table.name)}
+
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append((index.name, 0))
+
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in existing:
+                columns = list(constraint.columns)
+                removed = _dedupe(table, columns)
+                db.session.commit()
+                # A unique index is how MySQL stores a UNIQUE constraint, and
+                # unlike ALTER TABLE ... ADD CONSTRAINT it also works on SQLite
+                db.session.execute(text(
+                    f'CREATE UNIQUE INDEX {quote(constraint.name)} ON {quote(table.name)} '
+                    f'({", ".join(quote(column.name) for column in columns)})'
+                ))
+                db.session.commit()
+                created.append((constraint.name, removed))
+    return created
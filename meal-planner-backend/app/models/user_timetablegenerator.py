@@ -1,6 +1,10 @@
 from flask import jsonify
 from sqlalchemy.sql import func
-from models import Disease, MealPlan, FoodItem  # Import your models
+import numpy as np
+from .Diseases import Disease
+from .meal_plans import MealPlan
+from .catalog import get_catalog
+from .feasibility import meal_plan_budget, nutrient_matrix
 
 def generate_meal_plan(stagenameid):
     # Step 1: Retrieve disease and meal plan info based on stagenameid
@@ -14,12 +18,8 @@ def generate_meal_plan(stagenameid):
         return jsonify({'error': 'Meal plan not found for the disease stage'}), 404
 
     # Nutritional goals from meal plan
-    caloric_goal = meal_plan.caloric_goal
-    protein_goal = meal_plan.protein_goal
-    carbs_goal = meal_plan.carbs_goal
-    fats_goal = meal_plan.fats_goal
-    fiber_goal = meal_plan.fiber_goal
-    sat_fat_goal = meal_plan.sat_fat_goal
+    daily_goals = meal_plan_budget(meal_plan)
+    catalog = get_catalog()
 
     # Step 2: Select food items for each meal type (breakfast, lunch, dinner, snacks)
     days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -29,47 +29,27 @@ def generate_meal_plan(stagenameid):
         
         # Calculate for each meal type
         for meal_type in ['breakfast', 'lunch', 'dinner', 'snacks']:
-            # Query food items for this meal type (add any meal type logic or categorization here)
-            food_items = FoodItem.query.filter_by(food_type=meal_type).all()
-
+            food_items = catalog.partition(meal_type)
             selected_foods = []
-            daily_nutrients = {
-                'calories': 0,
-                'protein': 0,
-                'carbs': 0,
-                'fats': 0,
-                'fiber': 0,
-                'sat_fat': 0,
-            }
-
-            # Select foods while checking nutritional values
-            for food in food_items:
-                if (daily_nutrients['calories'] + food.calories <= caloric_goal and
-                    daily_nutrients['protein'] + food.protein <= protein_goal and
-                    daily_nutrients['carbs'] + food.carbs <= carbs_goal and
-                    daily_nutrients['fats'] + food.fat <= fats_goal and
-                    daily_nutrients['fiber'] + food.fiber <= fiber_goal and
-                    daily_nutrients['sat_fat'] + food.sat_fat <= sat_fat_goal):
-                    
-                    selected_foods.append({
-                        'name': food.name,
-                        'measure': food.measure,
-                        'grams': float(food.grams),
-                        'calories': float(food.calories),
-                        'protein': float(food.protein),
-                        'carbs': float(food.carbs),
-                        'fiber': float(food.fiber),
-                        'fat': float(food.fat),
-                        'sat_fat': float(food.sat_fat),
-                    })
-
-                    # Update daily nutrient totals
-                    daily_nutrients['calories'] += food.calories
-                    daily_nutrients['protein'] += food.protein
-                    daily_nutrients['carbs'] += food.carbs
-                    daily_nutrients['fats'] += food.fat
-                    daily_nutrients['fiber'] += food.fiber
-                    daily_nutrients['sat_fat'] += food.sat_fat
+            if not food_items:
+                daily_meals[meal_type] = selected_foods
+                continue
+
+            # Walk the catalog in order, taking every food that still fits the
+            # remaining goals; each step is one vectorized feasibility check
+            matrix = nutrient_matrix(food_items)
+            remaining = daily_goals.copy()
+            position = 0
+            while position < len(matrix):
+                fits = np.flatnonzero(matrix.feasible_mask(remaining)[position:])
+                if not fits.size:
+                    break
+                index = position + int(fits[0])
+                selected_foods.append(food_items.item(index))
+
+                # Update remaining nutrient budget
+                remaining -= matrix.values[index]
+                position = index + 1
 
             daily_meals[meal_type] = selected_foods
 
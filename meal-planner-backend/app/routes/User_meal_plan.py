@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from ..models.User_Meal_Plan import UserMealPlan
+from ..models.foodlog import log_today
 from app.db import db
 
 
@@ -8,6 +9,20 @@ from app.db import db
 bp = Blueprint('user_meal_plan', __name__)
 
 from sqlalchemy.sql import func
+from sqlalchemy import delete, insert
+from ..models.batch_generation import plan_rows
+from ..models.meal_plan_sync import sync_user_meal_plan
+from ..models.replanning import replan_slot, ReplanError
+from ..models.plan_adherence import refresh_adherence, invalidate_adherence, adherence_days, adherence_summary
+from ..models.adherence import adherence_panel
+import random
+
+
+def _date_range(args, default_days=30):
+    """Reads ?from= and ?to= (YYYY-MM-DD), defaulting to the last ``default_days`` days."""
+    end = datetime.strptime(args['to'], '%Y-%m-%d').date() if args.get('to') else log_today()
+    start = datetime.strptime(args['from'], '%Y-%m-%d').date() if args.get('from') else end - timedelta(days=default_days - 1)
+    return start, end
 
 @bp.route('/save', methods=['POST'])
 def save_user_meal_plan():
@@ -20,36 +35,33 @@ def save_user_meal_plan():
     if not user_id or not meal_plan or not start_date or not stage_name:
         return jsonify({'error': 'Missing required data'}), 400
 
+    # 'replace' rewrites the plan from start_date onward; 'diff' only writes the
+    # rows that changed, e.g. after editing a single meal
+    mode = data.get('mode', 'replace')
+    if mode not in ('replace', 'diff'):
+        return jsonify({'error': f'Unknown save mode: {mode}'}), 400
+
     try:
-        # Delete existing meals for the user and stage_name from the given start_date
-        existing_meals = UserMealPlan.query.filter_by(user_id=user_id, stage_name=stage_name).filter(UserMealPlan.log_date >= start_date).all()
-        for meal in existing_meals:
-            db.session.delete(meal)
-        db.session.commit()
+        rows = list(plan_rows(user_id, stage_name, meal_plan, start_date))
+
+        # Adherence scores of the rewritten days are recomputed on next read
+        invalidate_adherence([user_id], start_date)
 
-        # Save the new meal plan
-        for day_index, (day_key, daily_meals) in enumerate(meal_plan.items()):
-            log_date = start_date + timedelta(days=day_index)
-
-            for meal_type, meals in daily_meals.items():
-                for meal in meals:
-                    user_meal = UserMealPlan(
-                        user_id=user_id,
-                        stage_name=stage_name,  # Save the stage_name
-                        day=day_key,  # Save the day
-                        meal_name=meal['name'],
-                        meal_type=meal_type,
-                        calories=meal['calories'],
-                        protein=meal['protein'],
-                        carbs=meal['carbs'],
-                        fats=meal['fat'],
-                        fiber=meal['fiber'],
-                        sat_fat=meal['sat_fat'],
-                        grams=meal['grams'],
-                        measure=meal['measure'],
-                        log_date=log_date
-                    )
-                    db.session.add(user_meal)
+        if mode == 'diff':
+            changes = sync_user_meal_plan(user_id, stage_name, rows, start_date)
+            db.session.commit()
+            return jsonify({'message': 'Meal plan saved successfully', **changes}), 201
+
+        # Replace the meals from start_date onward with one DELETE and one
+        # multi-row INSERT, committed together so the user always has a plan
+        db.session.execute(
+            delete(UserMealPlan)
+            .where(UserMealPlan.user_id == user_id,
+                   UserMealPlan.stage_name == stage_name,
+                   UserMealPlan.log_date >= start_date)
+        )
+        if rows:
+            db.session.execute(insert(UserMealPlan), rows)
 
         db.session.commit()
         return jsonify({'message': 'Meal plan saved successfully'}), 201
@@ -58,6 +70,98 @@ def save_user_meal_plan():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Replace a single (day, meal_type) slot of a stored plan
+@bp.route('/replan_slot', methods=['POST'])
+def replan_user_meal_slot():
+    data = request.get_json() or {}
+    user_id = data.get('user_id')
+    stage_name = data.get('stage_name')
+    meal_type = data.get('meal_type')
+
+    if not user_id or not stage_name or not meal_type or not (data.get('log_date') or data.get('day')):
+        return jsonify({'error': 'user_id, stage_name, meal_type and log_date or day are required'}), 400
+
+    log_date = None
+    if data.get('log_date'):
+        try:
+            log_date = datetime.strptime(data['log_date'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return jsonify({'error': 'log_date must be YYYY-MM-DD'}), 400
+
+    try:
+        if log_date is None:
+            # Without a date, use the most recent planned occurrence of the day
+            log_date = (
+                db.session.query(func.max(UserMealPlan.log_date))
+                .filter_by(user_id=user_id, stage_name=stage_name, day=data['day'])
+                .scalar()
+            )
+            if not log_date:
+                return jsonify({'error': 'No stored meals for the requested day'}), 404
+
+        rng = random.Random(data['seed']) if data.get('seed') is not None else random
+        meal = replan_slot(user_id, stage_name, log_date, meal_type, data.get('id'), rng)
+        invalidate_adherence([user_id], log_date, log_date)
+        db.session.commit()
+        return jsonify({'message': 'Meal replaced successfully', 'meal': meal}), 200
+
+    except ReplanError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Planned versus eaten adherence of one patient, per day
+@bp.route('/adherence', methods=['GET'])
+def get_user_adherence():
+    user_id = request.args.get('user_id', type=int)
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    try:
+        start, end = _date_range(request.args)
+    except ValueError:
+        return jsonify({'error': 'from and to must be YYYY-MM-DD'}), 400
+
+    try:
+        # Only days with new logs or plan changes are rescored
+        refresh_adherence([user_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    days = adherence_days(user_id, start, end)
+    summary = adherence_summary([user_id], start, end).get(user_id)
+    return jsonify({'summary': summary, 'days': [day.serialize() for day in days]}), 200
+
+# Adherence panel of every patient, or of one nutritionist's patients, with their plan scores
+@bp.route('/adherence/panel', methods=['GET'])
+def get_adherence_panel():
+    try:
+        start, end = _date_range(request.args)
+    except ValueError:
+        return jsonify({'error': 'from and to must be YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+
+    # Intake against goals comes from the patients' adherence panel; the
+    # per-day plan scores are refreshed set-based, a chunk of patients at a time
+    patients = adherence_panel(end, (end - start).days + 1, request.args.get('nutritionist_id', type=int))
+    user_ids = [patient['user_id'] for patient in patients]
+    try:
+        refresh_adherence(user_ids)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    summary = adherence_summary(user_ids, start, end)
+    return jsonify([
+        {**patient, **summary.get(patient['user_id'], {'user_id': patient['user_id'], 'days': 0, 'average_score': None})}
+        for patient in patients
+    ]), 200
+
 @bp.route('/check_stage', methods=['GET'])
 def check_stage():
     # Retrieve the user_id and stage_name from the request
@@ -1,19 +1,17 @@
 from flask import Blueprint, request, jsonify
 from app.models.Diseases import Disease
+from app.models.read_path import stream_rows
 from app.db import db
+from sqlalchemy import select
 
 bp = Blueprint('diseases', __name__)
 @bp.route('', methods=['GET'])
 def get_diseases():
-    diseases = Disease.query.all()
-    return jsonify([{
-        'disease_id': d.disease_id,
-        'disease_name': d.disease_name,
-        'description': d.description,
-        'stage_name': d.stage_name,
-        'stage_description': d.stage_description,
-        'stage_name_id': d.stage_name_id
-    } for d in diseases])
+    # Plain rows, every column is returned as stored
+    diseases = stream_rows(select(Disease.disease_id, Disease.disease_name, Disease.description,
+                                  Disease.stage_name, Disease.stage_description, Disease.stage_name_id)
+                           .order_by(Disease.disease_id))
+    return jsonify([dict(d) for d in diseases])
 
 @bp.route('/', methods=['POST'])
 def create_disease():
@@ -1,12 +1,38 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from ..models.food_items import FoodItem
 from ..models.NutritionAnalysis import NutritionAnalysis
-from ..models.foodlog import FoodLog
+from ..models.foodlog import FoodLog, log_today
+from ..models.catalog import invalidate_catalog
+from ..models.daily_intake import record_intake
+from ..models.food_search import get_search_index
+from ..models.catalog_sync import (record_catalog_changes, current_catalog_version, catalog_etag,
+                                   catalog_delta, serialized_catalog, catalog_row, CATALOG_COLUMNS)
+from ..models.food_substitutes import SUBSTITUTE_NUTRIENTS, get_substitution_index
+from ..models.read_path import stream_rows
 from ..db import db
+from ..models.columnar import wants_columnar
+from ..models.catalog_import import READERS, CatalogImportError, import_format, import_food_items
+from sqlalchemy import select, insert
+from decimal import Decimal, InvalidOperation
 import datetime
+import io
 
 bp = Blueprint('food_items', __name__)
 
+# Most entries accepted by one bulk log request
+MAX_LOG_ENTRIES = 500
+# Fields of a /nutrition/log-meals entry; log_date may be left out
+LOG_ENTRY_FIELDS = ('food_item', 'meal_time', 'log_date')
+# FoodItem columns copied into NOT NULL foodlog columns
+REQUIRED_LOG_COLUMNS = ('measure', 'grams', 'calories', 'protein', 'carbs', 'fat')
+
+# Upper bound on ?limit= for search, and how each match tier is reported
+MAX_SEARCH_RESULTS = 50
+SEARCH_MATCHES = ('prefix', 'word', 'fuzzy')
+
+# Upper bound on ?k= for substitutes
+MAX_SUBSTITUTES = 50
+
 # Create a food item
 @bp.route('/', methods=['POST'])
 def create_food_item():
@@ -20,14 +46,75 @@ def create_food_item():
     
     new_food_item = FoodItem(**data)
     db.session.add(new_food_item)
+    db.session.flush()
+    record_catalog_changes([new_food_item.food_id], 'create')
     db.session.commit()
+    invalidate_catalog()
     return jsonify(new_food_item.serialize()), 201
 
+# Import many food items from an uploaded CSV or NDJSON file
+@bp.route('/import', methods=['POST'])
+def import_food_items_file():
+    # Either a multipart upload in 'file' or the raw request body; ?format=
+    # overrides the format implied by the file name or content type
+    upload = request.files.get('file')
+    if upload:
+        filename, binary = upload.filename, upload.stream
+    else:
+        filename = 'upload.ndjson' if 'ndjson' in (request.content_type or '') else 'upload.csv'
+        binary = request.stream
+    try:
+        fmt = import_format(filename, request.args.get('format'))
+    except CatalogImportError as e:
+        return jsonify({'error': str(e)}), 400
+
+    stream = io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+    try:
+        result = import_food_items(READERS[fmt](stream))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'message': 'Food items imported', **result}), 201
+
 # Get all food items
 @bp.route('/', methods=['GET'])
 def get_food_items():
-    food_items = FoodItem.query.all()
-    return jsonify([item.serialize() for item in food_items]), 200
+    # The catalog version doubles as ETag; an unchanged catalog costs one
+    # primary-key lookup and a 304
+    # ?since=<version> returns only what changed after a version seen earlier;
+    # each delta and each list format has an ETag of its own
+    since = request.args.get('since', type=int)
+    version = current_catalog_version()
+    if since is not None:
+        etag = f'{catalog_etag(version)}-since-{since}'
+    else:
+        etag = catalog_etag(version) + ('-columnar' if wants_columnar(request.args) else '')
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    if since is not None:
+        items, deleted = catalog_delta(since)
+        response = jsonify({'version': version, 'items': items, 'deleted': deleted})
+    else:
+        # ?format=columnar sends column arrays of numbers instead of row objects
+        response = Response(serialized_catalog(version, wants_columnar(request.args)), mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['X-Catalog-Version'] = str(version)
+    response.headers['Access-Control-Expose-Headers'] = 'ETag, X-Catalog-Version'
+    return response, 200
+
+# Ranked name search for autocomplete, served from the in-memory search index
+@bp.route('/search', methods=['GET'])
+def search_food_items():
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({'error': 'q is required'}), 400
+    limit = min(max(request.args.get('limit', default=10, type=int), 1), MAX_SEARCH_RESULTS)
+
+    index = get_search_index()
+    results = index.search(query, limit, request.args.get('food_type'))
+    return jsonify([{**index.item(entry), 'match': SEARCH_MATCHES[tier]} for entry, tier in results]), 200
 
 # Get a specific food item by ID
 @bp.route('/<int:id>', methods=['GET'])
@@ -35,6 +122,66 @@ def get_food_item(id):
     food_item = FoodItem.query.get_or_404(id)
     return jsonify(food_item.serialize()), 200
 
+# Nearest foods by per-gram nutrient profile, e.g. ?lower=sat_fat&same_type=1
+@bp.route('/<int:id>/substitutes', methods=['GET'])
+def get_substitutes(id):
+    k = min(max(request.args.get('k', default=10, type=int), 1), MAX_SUBSTITUTES)
+    same_type = request.args.get('same_type', '').lower() in ('1', 'true', 'yes')
+    lower = [nutrient for value in request.args.getlist('lower') for nutrient in value.split(',') if nutrient]
+    unknown = [nutrient for nutrient in lower if nutrient not in SUBSTITUTE_NUTRIENTS]
+    if unknown:
+        return jsonify({'error': f"Unknown nutrient(s) {', '.join(unknown)}; use {', '.join(SUBSTITUTE_NUTRIENTS)}"}), 400
+
+    food_item = FoodItem.query.get_or_404(id)
+    substitutes = get_substitution_index().substitutes(id, k, same_type, lower)
+    if substitutes is None:
+        return jsonify({'error': 'Food item has no gram weight to compare by'}), 400
+
+    distances = dict(substitutes)
+    items = {item['food_id']: item for item in stream_rows(
+        select(*CATALOG_COLUMNS).where(FoodItem.food_id.in_(list(distances)))
+    )} if distances else {}
+    return jsonify({
+        'food': food_item.serialize(),
+        'substitutes': [{**catalog_row(items[food_id]), 'distance': round(distance, 4)}
+                        for food_id, distance in substitutes if food_id in items],
+    }), 200
+
+def _differs(food_item, key, value):
+    """Whether writing ``value`` to the column would change it; numbers are
+    compared at the column's scale, as stored."""
+    current = getattr(food_item, key)
+    if current is None or value is None:
+        return current is not value
+    scale = FoodItem.__table__.c[key].type.scale if isinstance(current, Decimal) else None
+    if scale is None:
+        return current != value
+    try:
+        return current != Decimal(str(value)).quantize(Decimal(1).scaleb(-scale))
+    except (InvalidOperation, ValueError):
+        # Not a number; the database reports it
+        return True
+
+# Update a food item
+@bp.route('/<int:id>', methods=['PUT'])
+def update_food_item(id):
+    food_item = FoodItem.query.get_or_404(id)
+    data = request.get_json() or {}
+
+    updatable = ['name', 'measure', 'grams', 'calories', 'protein', 'carbs', 'fiber', 'fat', 'sat_fat', 'micronutrients', 'food_type']
+    changed = False
+    for key, value in data.items():
+        if key in updatable and _differs(food_item, key, value):
+            setattr(food_item, key, value)
+            changed = True
+
+    # A no-op PUT keeps the catalog version, so client caches stay valid
+    if changed:
+        record_catalog_changes([id], 'update')
+        db.session.commit()
+        invalidate_catalog()
+    return jsonify(food_item.serialize()), 200
+
 # Update a food item
 @bp.route('/nutrition/log-meal', methods=['POST'])
 def log_meal():
@@ -49,6 +196,12 @@ def log_meal():
     if not food_item:
         return jsonify({"error": "Food item not found"}), 404
 
+    # Logs without a date default to today, as in the FoodLog model
+    try:
+        log_date = datetime.datetime.strptime(log_date, '%Y-%m-%d').date() if log_date else log_today()
+    except ValueError:
+        return jsonify({"error": "log_date must be YYYY-MM-DD"}), 400
+
     # Create a new FoodLog entry using the food item's serving size and nutrition info
     food_log = FoodLog(
         user_id=user_id,
@@ -65,16 +218,103 @@ def log_meal():
         log_date=log_date
     )
 
-    # Save the new entry to the database
+    # Save the new entry and add it to the user's daily intake in the same transaction
     db.session.add(food_log)
+    record_intake([{
+        'user_id': user_id,
+        'log_date': log_date,
+        'calories': food_item.calories,
+        'protein': food_item.protein,
+        'carbs': food_item.carbs,
+        'fats': food_item.fat,
+        'fiber': food_item.fiber,
+        'sat_fat': food_item.sat_fat,
+    }])
     db.session.commit()
 
     return jsonify({"message": "Meal logged successfully", "food_log_id": food_log.log_id}), 201
 
+# Log many food items at once, e.g. a whole day from FoodLogScreen
+@bp.route('/nutrition/log-meals', methods=['POST'])
+def log_meals():
+    data = request.get_json() or {}
+    user_id = data.get('user_id')
+    entries = data.get('entries')
+    if not isinstance(user_id, int) or not user_id or not isinstance(entries, list) or not entries:
+        return jsonify({"error": "user_id and a non-empty entries list are required"}), 400
+    if len(entries) > MAX_LOG_ENTRIES:
+        return jsonify({"error": f"At most {MAX_LOG_ENTRIES} entries can be logged at once"}), 400
+
+    # Malformed entries reject the whole request before anything is read
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            return jsonify({"error": f"entries[{index}] must be an object", "index": index}), 400
+        for field in LOG_ENTRY_FIELDS:
+            if entry.get(field) is not None and not isinstance(entry[field], str):
+                return jsonify({"error": f"entries[{index}].{field} must be a string", "index": index}), 400
+
+    # Resolve every name with one IN query; the first item of a name wins, as in log_meal
+    names = {entry['food_item'] for entry in entries if entry.get('food_item')}
+    food_items = {}
+    for food_item in FoodItem.query.filter(FoodItem.name.in_(names)).order_by(FoodItem.food_id):
+        food_items.setdefault(food_item.name, food_item)
+
+    today = log_today()
+    rows = []
+    errors = []
+    for index, entry in enumerate(entries):
+        if not entry.get('food_item') or not entry.get('meal_time'):
+            errors.append({"index": index, "error": "food_item and meal_time are required"})
+            continue
+        food_item = food_items.get(entry['food_item'])
+        if not food_item:
+            errors.append({"index": index, "error": "Food item not found"})
+            continue
+        missing = [column for column in REQUIRED_LOG_COLUMNS if getattr(food_item, column) is None]
+        if missing:
+            errors.append({"index": index, "error": f"Food item has no {', '.join(missing)}"})
+            continue
+        try:
+            log_date = datetime.datetime.strptime(entry['log_date'], '%Y-%m-%d').date() if entry.get('log_date') else today
+        except ValueError:
+            errors.append({"index": index, "error": "log_date must be YYYY-MM-DD"})
+            continue
+
+        rows.append({
+            'user_id': user_id,
+            'meal_name': food_item.name,
+            'meal_type': entry['meal_time'],
+            'calories': food_item.calories,
+            'protein': food_item.protein,
+            'carbs': food_item.carbs,
+            'fats': food_item.fat,
+            'fiber': food_item.fiber,
+            'sat_fat': food_item.sat_fat,
+            'grams': food_item.grams,
+            'measure': food_item.measure,
+            'log_date': log_date,
+        })
+
+    if not rows:
+        return jsonify({"error": "No entries could be logged", "errors": errors}), 400
+
+    # One multi-row INSERT plus the daily intake upsert, in a single transaction
+    try:
+        db.session.execute(insert(FoodLog), rows)
+        record_intake(rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({"message": "Meals logged successfully", "logged": len(rows), "errors": errors}), 201
+
 # Delete a food item
 @bp.route('/<int:id>', methods=['DELETE'])
 def delete_food_item(id):
     food_item = FoodItem.query.get_or_404(id)
     db.session.delete(food_item)
+    record_catalog_changes([id], 'delete')
     db.session.commit()
+    invalidate_catalog()
     return '', 204
@@ -4,12 +4,33 @@ from ..db import db
 
 bp = Blueprint('foodlog', __name__)
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from ..models.foodlog import FoodLog
 from ..db import db
+from ..models.columnar import as_float, columnar_body, wants_columnar
+from sqlalchemy import select, or_, and_
+from datetime import datetime
+import base64
+import binascii
 
 bp = Blueprint('foodlog', __name__)
 
+# Page size of get_logs when ?limit= is not given, and its upper bound
+DEFAULT_LOG_PAGE = 100
+MAX_LOG_PAGE = 500
+LOG_NUMERIC_COLUMNS = ('calories', 'protein', 'carbs', 'fats', 'fiber', 'sat_fat', 'grams')
+
+
+def _encode_cursor(log):
+    return base64.urlsafe_b64encode(f'{log.log_date.isoformat()}:{log.log_id}'.encode()).decode()
+
+
+def _decode_cursor(token):
+    """Returns the ``(log_date, log_id)`` of the last log of the previous page."""
+    log_date, log_id = base64.urlsafe_b64decode(token.encode()).decode().split(':')
+    return datetime.strptime(log_date, '%Y-%m-%d').date(), int(log_id)
+
+
 @bp.route('/get_logs', methods=['GET'])
 def get_food_logs():
     try:
@@ -19,16 +40,56 @@ def get_food_logs():
         if not user_id:
             return jsonify({"error": "User ID is required."}), 400
 
-        # Query food logs for the specified user
-        food_logs = FoodLog.query.filter_by(user_id=user_id).order_by(FoodLog.log_date.desc()).all()
+        # Pages are keyed on (log_date, log_id), newest first; ?cursor= continues
+        # after the previous page, ?from=/?to= bound the dates
+        limit = min(max(request.args.get('limit', default=DEFAULT_LOG_PAGE, type=int), 1), MAX_LOG_PAGE)
+        try:
+            date_from = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+            date_to = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+            cursor = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except (ValueError, binascii.Error):
+            return jsonify({"error": "from and to must be YYYY-MM-DD and cursor a value from X-Next-Cursor"}), 400
+
+        # Query food logs for the specified user, a range scan of ix_foodlog_user_date
+        filters = [FoodLog.user_id == user_id]
+        if date_from:
+            filters.append(FoodLog.log_date >= date_from)
+        if date_to:
+            filters.append(FoodLog.log_date <= date_to)
+        if cursor:
+            log_date, log_id = cursor
+            filters.append(or_(FoodLog.log_date < log_date,
+                               and_(FoodLog.log_date == log_date, FoodLog.log_id < log_id)))
+        order = (FoodLog.log_date.desc(), FoodLog.log_id.desc())
+
+        # ?format=columnar reads plain rows and sends column arrays
+        columnar = wants_columnar(request.args)
+        if columnar:
+            food_logs = db.session.execute(
+                select(FoodLog.log_id, FoodLog.user_id, FoodLog.meal_name, FoodLog.meal_type,
+                       *[as_float(getattr(FoodLog, column)) for column in LOG_NUMERIC_COLUMNS],
+                       FoodLog.measure, FoodLog.log_date)
+                .where(*filters).order_by(*order).limit(limit + 1)
+            ).all()
+        else:
+            # One extra row tells whether another page follows
+            food_logs = FoodLog.query.filter(*filters).order_by(*order).limit(limit + 1).all()
 
-        if not food_logs:
+        if not food_logs and not cursor:
             return jsonify({"message": "No food logs found for the specified user."}), 404
 
-        # Serialize food logs
-        serialized_logs = [log.serialise() for log in food_logs]
+        if columnar:
+            response = Response(columnar_body(list(food_logs[0]._fields) if food_logs else [], food_logs[:limit]),
+                                mimetype='application/json')
+        else:
+            # Serialize food logs
+            serialized_logs = [log.serialise() for log in food_logs[:limit]]
+            response = jsonify(serialized_logs)
 
-        return jsonify(serialized_logs), 200
+        if len(food_logs) > limit:
+            response.headers['X-Next-Cursor'] = _encode_cursor(food_logs[limit - 1])
+            response.headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
+        return response, 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,26 @@
+from flask import Blueprint, request, jsonify, url_for
+from ..models.jobs import job_queue
+
+bp = Blueprint('jobs', __name__)
+
+# Longest a status request may block waiting for a job to finish
+MAX_WAIT_SECONDS = 30
+
+
+def accepted(job_id):
+    """202 response pointing the client at the job's status endpoint."""
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('jobs.get_job', job_id=job_id),
+    }), 202
+
+
+# Poll a job, or long-poll with ?wait=<seconds> until it finishes
+@bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    wait = min(max(request.args.get('wait', default=0, type=float), 0), MAX_WAIT_SECONDS)
+    job = job_queue().wait(job_id, wait) if wait else job_queue().get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
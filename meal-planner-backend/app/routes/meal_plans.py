@@ -3,6 +3,7 @@ from ..models.meal_plans import MealPlan
 from ..db import db
 from ..models.Diseases import Disease
 from ..models.users import User
+from ..models.read_path import stream_rows
 from sqlalchemy import select
 
 bp = Blueprint('meal_plans', __name__)
@@ -105,19 +106,24 @@ def get_mealplan_targets(user_id):
 
 @bp.route('/', methods=['GET'])
 def get_meal_plans():
-    meal_plans = MealPlan.query.all()
+    meal_plans = stream_rows(
+        select(MealPlan.plan_id, MealPlan.disease_id, MealPlan.stage_name, MealPlan.caloric_goal,
+               MealPlan.protein_goal, MealPlan.carbs_goal, MealPlan.fats_goal, MealPlan.fiber_goal,
+               MealPlan.sat_fat_goal, MealPlan.created_at, MealPlan.updated_at)
+        .order_by(MealPlan.plan_id)
+    )
     return jsonify([{
-        'plan_id': m.plan_id,
-        'disease_id': m.disease_id,
-        'stage_name': m.stage_name,
-        'caloric_goal': m.caloric_goal,
-        'protein_goal': float(m.protein_goal),
-        'carbs_goal': float(m.carbs_goal),
-        'fats_goal': float(m.fats_goal),
-        'fiber_goal': float(m.fiber_goal),
-        'sat_fat_goal': float(m.sat_fat_goal),
-        'created_at': m.created_at,
-        'updated_at': m.updated_at
+        'plan_id': m['plan_id'],
+        'disease_id': m['disease_id'],
+        'stage_name': m['stage_name'],
+        'caloric_goal': m['caloric_goal'],
+        'protein_goal': float(m['protein_goal']),
+        'carbs_goal': float(m['carbs_goal']),
+        'fats_goal': float(m['fats_goal']),
+        'fiber_goal': float(m['fiber_goal']),
+        'sat_fat_goal': float(m['sat_fat_goal']),
+        'created_at': m['created_at'],
+        'updated_at': m['updated_at']
     } for m in meal_plans])
 
 
@@ -1,19 +1,51 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from app.models.meals import Meal
 from app.models.food_items import FoodItem  # Assuming you have a FoodItem model
 from app.models.meal_plans import MealPlan  # Assuming you have a MealPlan model
 from app.models.meal_generation import generate_weekly_meals
 from app.models.Diseases import Disease
+from app.models.catalog import get_catalog
+from app.models.feasibility import meal_plan_budget
+from app.models.plan_solver import SOLVERS, generate_days
+from app.models.plan_cache import plan_cache
+from app.models.batch_generation import resolve_patients
+from app.models.jobs import job_queue
+from app.routes.jobs import accepted
+from app.models.columnar import as_float, columnar_response, wants_columnar
+from sqlalchemy import select
 from app.db import db
+from datetime import date, datetime
+import json
 import random
+import zlib
 
 
 bp = Blueprint('meals', __name__)
 
+# Upper bound on the solver time a single request may ask for
+MAX_TIME_BUDGET_MS = 5000
+
+# Longest plan the streaming endpoint generates
+MAX_STREAM_WEEKS = 12
+
+MEAL_NUMERIC_COLUMNS = ('calories', 'protein', 'carbs', 'fats', 'grams', 'fiber', 'sat_fat')
+
 @bp.route('/', methods=['POST'])
 def create_meals():
+    # ?async=1 queues the generation and returns a job to poll instead
+    if request.args.get('async', type=int):
+        return accepted(job_queue().submit('weekly_meals', {'plan_id': 1}))
+
     # Call the meal generation function
     generate_weekly_meals(1)
+
+    # ?format=columnar sends column arrays built straight from rows
+    if wants_columnar(request.args):
+        return columnar_response(
+            select(Meal.meal_id, Meal.meal_name, Meal.meal_type,
+                   *[as_float(getattr(Meal, column)) for column in MEAL_NUMERIC_COLUMNS],
+                   Meal.measure, Meal.day, Meal.created_at)
+        ), 201
     
     # Optionally, you can return a success message or the generated meals
     # Assuming meals are generated and committed to the database
@@ -41,111 +73,156 @@ def create_meals():
     
     return jsonify({'status': 'success', 'meals': meals_data}), 201
 
-# Get all meals
-@bp.route('/<int:stage_name_id>', methods=['GET'])
-def get_meal_plan(stage_name_id):
-    # Step 1: Retrieve disease and meal plan info based on stage_name_id
+def _stage_meal_plan(stage_name_id):
+    """Returns ``(meal_plan, None)`` for a disease stage, or ``(None, error_response)``."""
     disease = Disease.query.filter_by(stage_name_id=stage_name_id).first()
-    
     if not disease:
-        return jsonify({'error': 'Disease not found for the provided stage_name_id'}), 404
-    
+        return None, (jsonify({'error': 'Disease not found for the provided stage_name_id'}), 404)
+
     # Fetch related meal plan using disease_id and stage_name
     meal_plan = MealPlan.query.filter_by(disease_id=disease.disease_id, stage_name=disease.stage_name).first()
     if not meal_plan:
-        return jsonify({'error': 'Meal plan not found for the disease stage'}), 404
+        return None, (jsonify({'error': 'Meal plan not found for the disease stage'}), 404)
+    return meal_plan, None
+
+
+def _solver_options():
+    """Reads ?solver= and ?time_budget_ms= into ``(solver, options, error_response)``."""
+    # 'greedy' (default) or 'knapsack', which searches for the closest fit to
+    # the goals within time_budget_ms
+    solver = request.args.get('solver', 'greedy')
+    if solver not in SOLVERS:
+        return None, None, (jsonify({'error': f'Unknown solver: {solver}'}), 400)
+    options = {}
+    time_budget_ms = request.args.get('time_budget_ms', type=int)
+    if time_budget_ms is not None:
+        options['time_budget'] = min(max(time_budget_ms, 0), MAX_TIME_BUDGET_MS) / 1000
+    return solver, options, None
+
+
+def _weekly_seed(stage_name_id, meal_plan, today=None):
+    """Default seed of a stage's plan: stable for (stage, plan, ISO week), new each week."""
+    year, week, _ = (today or date.today()).isocalendar()
+    return zlib.crc32(f'{stage_name_id}:{meal_plan.plan_id}:{year}-W{week:02d}'.encode())
+
+
+# Get all meals
+@bp.route('/<int:stage_name_id>', methods=['GET'])
+def get_meal_plan(stage_name_id):
+    # Step 1: Retrieve the meal plan of the disease stage
+    meal_plan, error = _stage_meal_plan(stage_name_id)
+    if error:
+        return error
 
     # Nutritional goals from meal plan
-    daily_nutrition_limits = {
-        'calories': meal_plan.caloric_goal,
-        'protein': meal_plan.protein_goal,
-        'carbs': meal_plan.carbs_goal,
-        'fats': meal_plan.fats_goal,
-        'fiber': meal_plan.fiber_goal,
-        'sat_fat': meal_plan.sat_fat_goal
-    }
-
-    # Step 2: Generate meals for each day of the week
-    generated_meals = {}
-    days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    meal_types = ['breakfast', 'lunch', 'Supper', 'Snack']
-
-    for day in days_of_week:  # Loop for days of the week
-        daily_meals = {}
-
-        # Initialize remaining nutritional limits for the day
-        remaining_nutrition = daily_nutrition_limits.copy()
-
-        for meal_type in meal_types:
-            # Query food items for this meal type
-            food_items = FoodItem.query.filter_by(food_type=meal_type).all()
-
-            if not food_items:
-                # No available food items for this meal type
-                daily_meals[meal_type] = []
-                continue
-
-            # Shuffle to randomize selection
-            random.shuffle(food_items)
-
-            # Attempt to find at least one suitable food item
-            selected_foods = []
-            for food in food_items:
-                if (remaining_nutrition['calories'] >= food.calories and
-                    remaining_nutrition['protein'] >= food.protein and
-                    remaining_nutrition['carbs'] >= food.carbs and
-                    remaining_nutrition['fats'] >= food.fat and
-                    remaining_nutrition['fiber'] >= food.fiber and
-                    remaining_nutrition['sat_fat'] >= food.sat_fat):
-                    # Suitable food found
-                    selected_foods.append({
-                        'name': food.name,
-                        'measure': food.measure,
-                        'grams': float(food.grams),
-                        'calories': float(food.calories),
-                        'protein': float(food.protein),
-                        'carbs': float(food.carbs),
-                        'fiber': float(food.fiber),
-                        'fat': float(food.fat),
-                        'sat_fat': float(food.sat_fat),
-                    })
-
-                    # Update remaining nutritional limits
-                    remaining_nutrition['calories'] -= food.calories
-                    remaining_nutrition['protein'] -= food.protein
-                    remaining_nutrition['carbs'] -= food.carbs
-                    remaining_nutrition['fats'] -= food.fat
-                    remaining_nutrition['fiber'] -= food.fiber
-                    remaining_nutrition['sat_fat'] -= food.sat_fat
-                    break  # Ensure at least one item is selected
-
-            # If no suitable item was found, fallback to the closest match
-            if not selected_foods:
-                closest_food = min(
-                    food_items,
-                    key=lambda food: abs(food.calories - remaining_nutrition['calories'])
-                )
-                selected_foods.append({
-                    'name': closest_food.name,
-                    'measure': closest_food.measure,
-                    'grams': float(closest_food.grams),
-                    'calories': float(closest_food.calories),
-                    'protein': float(closest_food.protein),
-                    'carbs': float(closest_food.carbs),
-                    'fiber': float(closest_food.fiber),
-                    'fat': float(closest_food.fat),
-                    'sat_fat': float(closest_food.sat_fat),
-                })
-
-            # Add the selected food(s) to the daily meals for this meal type
-            daily_meals[meal_type] = selected_foods
-
-        # Add daily meals to the week's meal plan
-        generated_meals[day] = daily_meals
+    daily_nutrition_limits = meal_plan_budget(meal_plan)
+
+    solver, options, error = _solver_options()
+    if error:
+        return error
+
+    # Plans are reproducible from their seed; without one the same plan is
+    # served for the stage all week, so repeat requests hit the cache
+    seed = request.args.get('seed', type=int)
+    if seed is None:
+        seed = _weekly_seed(stage_name_id, meal_plan)
+
+    # Step 2: Generate meals for each day of the week from the shared catalog
+    # snapshot, unless the same plan was generated recently
+    catalog = get_catalog()
+    cache_key = (stage_name_id, seed, catalog.version, meal_plan.updated_at, solver, options.get('time_budget'))
+    generated_meals = plan_cache.get(cache_key)
+    cache_status = 'hit'
+    if generated_meals is None:
+        generated_meals = SOLVERS[solver](catalog, daily_nutrition_limits, random.Random(seed), **options)
+        plan_cache.set(cache_key, generated_meals)
+        cache_status = 'miss'
 
     # Step 3: Return the generated meals as JSON
-    return jsonify(generated_meals)
-
+    response = jsonify(generated_meals)
+    response.headers['X-Meal-Plan-Seed'] = str(seed)
+    response.headers['X-Cache'] = cache_status
+    return response
+
+
+# Stream a multi-week plan as NDJSON, one line per generated day
+@bp.route('/<int:stage_name_id>/stream', methods=['GET'])
+def stream_meal_plan(stage_name_id):
+    meal_plan, error = _stage_meal_plan(stage_name_id)
+    if error:
+        return error
+
+    solver, options, error = _solver_options()
+    if error:
+        return error
+
+    weeks = request.args.get('weeks', default=1, type=int)
+    if not 1 <= weeks <= MAX_STREAM_WEEKS:
+        return jsonify({'error': f'weeks must be between 1 and {MAX_STREAM_WEEKS}'}), 400
+    # A dish is not repeated within this many days, across week boundaries
+    variety_days = min(max(request.args.get('variety_days', default=7, type=int), 0), 7 * MAX_STREAM_WEEKS)
+
+    seed = request.args.get('seed', type=int)
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+
+    # Everything the generator needs is loaded up front; streaming does no queries
+    days = generate_days(get_catalog(), meal_plan_budget(meal_plan), weeks, solver,
+                         random.Random(seed), variety_days, **options)
+
+    def lines():
+        for week, day, daily_meals in days:
+            yield json.dumps({'week': week, 'day': day, 'meals': daily_meals}) + '\n'
+
+    response = Response(lines(), mimetype='application/x-ndjson')
+    response.headers['X-Meal-Plan-Seed'] = str(seed)
+    return response
+
+
+
+# Queue weekly plan generation for many patients at once; poll the returned job
+def _is_id_list(value):
+    # JSON true/false would pass as ints
+    return isinstance(value, list) and all(isinstance(item, int) and not isinstance(item, bool) for item in value)
+
+
+@bp.route('/batch', methods=['POST'])
+def generate_batch_meal_plans():
+    data = request.get_json() or {}
+    user_ids = data.get('user_ids') or []
+    stage_name_ids = data.get('stage_name_ids') or []
+    for name, ids in (('user_ids', user_ids), ('stage_name_ids', stage_name_ids)):
+        if not _is_id_list(ids):
+            return jsonify({'error': f'{name} must be a list of integers'}), 400
+    if not user_ids and not stage_name_ids:
+        return jsonify({'error': 'user_ids or stage_name_ids is required'}), 400
+
+    solver = data.get('solver', 'greedy')
+    if solver not in SOLVERS:
+        return jsonify({'error': f'Unknown solver: {solver}'}), 400
+    time_budget_ms = data.get('time_budget_ms')
+    if time_budget_ms is not None:
+        try:
+            time_budget_ms = min(max(int(time_budget_ms), 0), MAX_TIME_BUDGET_MS)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'time_budget_ms must be an integer'}), 400
+
+    try:
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date() if data.get('start_date') else date.today()
+    except (TypeError, ValueError):
+        return jsonify({'error': 'start_date must be YYYY-MM-DD'}), 400
+
+    if not resolve_patients(user_ids, stage_name_ids):
+        return jsonify({'error': 'No patients with a meal plan found'}), 404
+
+    # The pool size is the server's CPU count; clients cannot choose it
+    return accepted(job_queue().submit('batch_meal_plans', {
+        'user_ids': user_ids,
+        'stage_name_ids': stage_name_ids,
+        'solver': solver,
+        'time_budget_ms': time_budget_ms,
+        'start_date': start_date.isoformat(),
+    }))
 
 
 # Get a specific meal by ID
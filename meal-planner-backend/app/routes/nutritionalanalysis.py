@@ -3,15 +3,21 @@ from ..models.NutritionAnalysis import NutritionAnalysis
 from ..db import db
 from ..models.users import User
 from ..models.meal_plans import MealPlan
-from ..models.foodlog import FoodLog
+from ..models.foodlog import FoodLog, log_today
 from ..models.User_Meal_Plan import UserMealPlan
 from datetime import date, timedelta, datetime
 from sqlalchemy import func
 from datetime import timedelta
 from sqlalchemy import extract
+from ..models.nutrition_rollups import refresh_nutritional_analysis, yearly_rollup
+from ..models.daily_intake import DailyIntake, INTAKE_NUTRIENTS, intake_range, rollup_intake
+from ..models.jobs import job_queue
+from .jobs import accepted
 
 bp = Blueprint('nutritionalanalysis', __name__)
 
+TIMEFRAMES = ('daily', 'weekly', 'monthly', 'yearly')
+
 
 @bp.route('/generate', methods=['POST'])
 def generate_nutritional_analysis():
@@ -21,145 +27,17 @@ def generate_nutritional_analysis():
         if not user_id:
             return jsonify({'error': 'Missing user_id'}), 400
 
-        # Fetch all food logs for the user
-        food_logs = FoodLog.query.filter_by(user_id=user_id).order_by(FoodLog.log_date).all()
-        if not food_logs:
-            return jsonify({'error': 'No food logs found for the user'}), 404
-
-        daily_data = []
-        weekly_data = []
-        monthly_data = {}
-
-        start_date = food_logs[0].log_date
-        current_month = start_date.month
-        last_week_start = start_date
-        weekly_temp = {'calories': [], 'protein': [], 'carbs': [], 'fats': [], 'fiber': [], 'sat_fat': []}
-        week_number = 1
-
-        for log in food_logs:
-            # Add daily data
-            daily_data.append({
-                'log_date': log.log_date,
-                'day_variant': log.log_date.strftime('%A'),
-                'calories': log.calories,
-                'protein': log.protein,
-                'carbs': log.carbs,
-                'fats': log.fats,
-                'fiber': log.fiber,
-                'sat_fat': log.sat_fat,
-            })
-
-            # Weekly aggregation
-            if (log.log_date - last_week_start).days >= 7:
-                weekly_avg = {key: sum(weekly_temp[key]) / len(weekly_temp[key]) for key in weekly_temp if weekly_temp[key]}
-                weekly_avg.update({'week': f'Week {week_number}', 'log_date': last_week_start + timedelta(days=6)})
-                weekly_data.append(weekly_avg)
-                weekly_temp = {key: [] for key in weekly_temp}
-                last_week_start = log.log_date
-                week_number += 1
-
-            # Add to weekly temp
-            weekly_temp['calories'].append(log.calories)
-            weekly_temp['protein'].append(log.protein)
-            weekly_temp['carbs'].append(log.carbs)
-            weekly_temp['fats'].append(log.fats)
-            weekly_temp['fiber'].append(log.fiber)
-            weekly_temp['sat_fat'].append(log.sat_fat)
-
-            # Monthly aggregation
-            log_year = log.log_date.year
-            log_month = log.log_date.month
-            month_key = (log_year, log_month)
-
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {'calories': [], 'protein': [], 'carbs': [], 'fats': [], 'fiber': [], 'sat_fat': []}
-
-            monthly_data[month_key]['calories'].append(log.calories)
-            monthly_data[month_key]['protein'].append(log.protein)
-            monthly_data[month_key]['carbs'].append(log.carbs)
-            monthly_data[month_key]['fats'].append(log.fats)
-            monthly_data[month_key]['fiber'].append(log.fiber)
-            monthly_data[month_key]['sat_fat'].append(log.sat_fat)
-
-        # Finalize last week's data
-        if weekly_temp['calories']:
-            weekly_avg = {key: sum(weekly_temp[key]) / len(weekly_temp[key]) for key in weekly_temp if weekly_temp[key]}
-            weekly_avg.update({'week': f'Week {week_number}', 'log_date': last_week_start + timedelta(days=6)})
-            weekly_data.append(weekly_avg)
-
-        # Calculate monthly averages
-        monthly_averages = [
-            {
-                'month': datetime(year, month, 1).strftime('%B'),
-                'log_date': max(log.log_date for log in food_logs if log.log_date.month == month and log.log_date.year == year),
-                'calories': sum(data['calories']) / len(data['calories']),
-                'protein': sum(data['protein']) / len(data['protein']),
-                'carbs': sum(data['carbs']) / len(data['carbs']),
-                'fats': sum(data['fats']) / len(data['fats']),
-                'fiber': sum(data['fiber']) / len(data['fiber']),
-                'sat_fat': sum(data['sat_fat']) / len(data['sat_fat']),
-            }
-            for (year, month), data in monthly_data.items()
-        ]
-
-        # Insert into NutritionAnalysis
-        analysis_entries = []
-
-        # Insert daily entries
-        for daily_entry in daily_data:
-            analysis_entries.append(
-                NutritionAnalysis(
-                    user_id=user_id,
-                    log_date=daily_entry['log_date'],
-                    timeframe='daily',
-                    day_variant=daily_entry['day_variant'],
-                    calories=daily_entry['calories'],
-                    protein=daily_entry['protein'],
-                    carbs=daily_entry['carbs'],
-                    fats=daily_entry['fats'],
-                    fiber=daily_entry['fiber'],
-                    sat_fat=daily_entry['sat_fat']
-                )
-            )
-
-        # Insert weekly entries
-        for weekly_entry in weekly_data:
-            analysis_entries.append(
-                NutritionAnalysis(
-                    user_id=user_id,
-                    log_date=weekly_entry['log_date'],  # The last date of the week
-                    timeframe='weekly',
-                    day_variant=weekly_entry['week'],
-                    calories=weekly_entry['calories'],
-                    protein=weekly_entry['protein'],
-                    carbs=weekly_entry['carbs'],
-                    fats=weekly_entry['fats'],
-                    fiber=weekly_entry['fiber'],
-                    sat_fat=weekly_entry['sat_fat']
-                )
-            )
-
-        # Insert monthly entries
-        for monthly_entry in monthly_averages:
-            analysis_entries.append(
-                NutritionAnalysis(
-                    user_id=user_id,
-                    log_date=monthly_entry['log_date'],  # The last date of the month
-                    timeframe='monthly',
-                    day_variant=monthly_entry['month'],
-                    calories=monthly_entry['calories'],
-                    protein=monthly_entry['protein'],
-                    carbs=monthly_entry['carbs'],
-                    fats=monthly_entry['fats'],
-                    fiber=monthly_entry['fiber'],
-                    sat_fat=monthly_entry['sat_fat']
-                )
-            )
+        # ?async=1 queues the work and returns a job to poll instead
+        if request.args.get('async', type=int):
+            return accepted(job_queue().submit('nutritional_analysis', {'user_id': user_id}))
 
-        db.session.bulk_save_objects(analysis_entries)
+        # Re-aggregate only the buckets touched by logs added since the last run
+        buckets = refresh_nutritional_analysis(user_id)
+        if buckets is None:
+            return jsonify({'error': 'No food logs found for the user'}), 404
         db.session.commit()
 
-        return jsonify({'message': 'Nutritional analysis generated successfully'}), 201
+        return jsonify({'message': 'Nutritional analysis generated successfully', 'updated_buckets': buckets}), 201
 
     except Exception as e:
         db.session.rollback()
@@ -172,11 +50,25 @@ def generate_nutritional_analysis():
 @bp.route('/', methods=['POST'])
 def get_nutrition_analysis():
     try:
-        # Get the user_id from the request
-        user_id = request.json.get('user_id')
+        # Get the user_id and optional filters from the request
+        data = request.json
+        user_id = data.get('user_id')
         if not user_id:
             return jsonify({'error': 'user_id is required'}), 400
 
+        # timeframe narrows the response to one series; from/to/limit bound each series
+        timeframe = data.get('timeframe')
+        if timeframe is not None and timeframe not in TIMEFRAMES:
+            return jsonify({'error': f"timeframe must be one of {', '.join(TIMEFRAMES)}"}), 400
+        try:
+            date_from = datetime.strptime(data['from'], '%Y-%m-%d').date() if data.get('from') else None
+            date_to = datetime.strptime(data['to'], '%Y-%m-%d').date() if data.get('to') else None
+            limit = int(data['limit']) if data.get('limit') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'from and to must be YYYY-MM-DD and limit an integer'}), 400
+        if limit is not None and limit < 1:
+            return jsonify({'error': 'limit must be at least 1'}), 400
+
         # Fetch user details
         user = User.query.filter_by(user_id=user_id).first()
         if not user:
@@ -208,37 +100,77 @@ def get_nutrition_analysis():
         monthly_targets = {key: value * 30 for key, value in daily_targets.items()}
         yearly_targets = {key: value * 365 for key, value in daily_targets.items()}
 
-        # Fetch nutrition analysis data
-        nutrition_analysis = (
-            NutritionAnalysis.query
-            .filter_by(user_id=user_id)
-            .order_by(NutritionAnalysis.log_date.desc())
-            .all()
-        )
+        targets = {
+            'daily': daily_targets,
+            'weekly': weekly_targets,
+            'monthly': monthly_targets,
+            'yearly': yearly_targets,
+        }
 
-        if not nutrition_analysis:
-            return jsonify({'error': 'No nutrition analysis data found for the user'}), 404
+        # Fetch each requested series with its filters applied in SQL
+        date_filters = []
+        if date_from:
+            date_filters.append(NutritionAnalysis.log_date >= date_from)
+        if date_to:
+            date_filters.append(NutritionAnalysis.log_date <= date_to)
+
+        response = {}
+        for name in ([timeframe] if timeframe else TIMEFRAMES):
+            if name == 'yearly':
+                # Yearly totals are summed from the daily intake rollup
+                series = yearly_rollup(user_id, date_from, date_to, limit)
+            else:
+                query = (
+                    NutritionAnalysis.query
+                    .filter(NutritionAnalysis.user_id == user_id, NutritionAnalysis.timeframe == name, *date_filters)
+                    .order_by(NutritionAnalysis.log_date.desc())
+                )
+                if limit is not None:
+                    query = query.limit(limit)
+                series = [na.serialize() for na in query]
+            response[name] = {'data': series, 'targets': targets[name]}
 
-        # Organize data into timeframes
-        daily_data = [
-            na.serialize() for na in nutrition_analysis if na.timeframe == 'daily'
-        ]
-        weekly_data = [
-            na.serialize() for na in nutrition_analysis if na.timeframe == 'weekly'
-        ]
-        monthly_data = [
-            na.serialize() for na in nutrition_analysis if na.timeframe == 'monthly'
-        ]
-
-        # Build response
-        response = {
-            'daily': {'data': daily_data, 'targets': daily_targets},
-            'weekly': {'data': weekly_data, 'targets': weekly_targets},
-            'monthly': {'data': monthly_data, 'targets': monthly_targets},
-            'yearly': {'data': monthly_data, 'targets': yearly_targets},  # Yearly uses the monthly data
-        }
+        if not any(entry['data'] for entry in response.values()):
+            return jsonify({'error': 'No nutrition analysis data found for the user'}), 404
 
         return jsonify(response), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/intake/today', methods=['GET'])
+def get_today_intake():
+    user_id = request.args.get('user_id', type=int)
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+
+    # Single primary-key read of the rollup maintained by log_meal
+    today = log_today()
+    intake = db.session.get(DailyIntake, (user_id, today))
+    if not intake:
+        return jsonify({'user_id': user_id, 'log_date': today.isoformat(),
+                        **{nutrient: 0.0 for nutrient in INTAKE_NUTRIENTS}, 'entry_count': 0}), 200
+    return jsonify(intake.serialize()), 200
+
+
+@bp.route('/intake', methods=['GET'])
+def get_intake():
+    user_id = request.args.get('user_id', type=int)
+    timeframe = request.args.get('timeframe', 'daily')
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    if timeframe not in ('daily', 'weekly', 'monthly'):
+        return jsonify({'error': 'timeframe must be daily, weekly or monthly'}), 400
+
+    try:
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else log_today()
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({'error': 'from and to must be YYYY-MM-DD'}), 400
+
+    # Weekly and monthly totals are derived from the daily rollup on demand
+    days = intake_range(user_id, start, end)
+    if timeframe == 'daily':
+        return jsonify([day.serialize() for day in days]), 200
+    return jsonify(rollup_intake(days, timeframe)), 200
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app.models.progress_tracking import ProgressTracking
+from app.models.read_path import stream_rows
 from app.db import db
+from sqlalchemy import select
 
 bp = Blueprint('progress_tracking', __name__)
 
@@ -41,19 +43,20 @@ def log_progress():
 # Get all progress tracking records
 @bp.route('/<int:user_id>', methods=['GET'])
 def get_progress(user_id):
-    progress_entries = (
-        ProgressTracking.query.filter_by(user_id=user_id)
+    progress_entries = stream_rows(
+        select(ProgressTracking.progress_id, ProgressTracking.recorded_at, ProgressTracking.weight_kg,
+               ProgressTracking.blood_pressure, ProgressTracking.glucose_level, ProgressTracking.notes)
+        .where(ProgressTracking.user_id == user_id)
         .order_by(ProgressTracking.progress_id.asc())
-        .all()
     )
     result = [
         {
-            "progress_id": entry.progress_id,
-            "recorded_at": entry.recorded_at.strftime('%Y-%m-%d %H:%M:%S'),
-            "weight_kg": str(entry.weight_kg),
-            "blood_pressure": entry.blood_pressure,
-            "glucose_level": str(entry.glucose_level),
-            "notes": entry.notes,
+            "progress_id": entry['progress_id'],
+            "recorded_at": entry['recorded_at'].strftime('%Y-%m-%d %H:%M:%S'),
+            "weight_kg": str(entry['weight_kg']),
+            "blood_pressure": entry['blood_pressure'],
+            "glucose_level": str(entry['glucose_level']),
+            "notes": entry['notes'],
         }
         for entry in progress_entries
     ]
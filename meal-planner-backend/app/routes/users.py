@@ -1,9 +1,19 @@
 from flask import Blueprint, request, jsonify
 from ..models.users import User
 from ..models.Diseases import Disease
+from ..models.Messages import Message
+from ..models.read_path import stream_rows
 from ..db import db
+from sqlalchemy import select
 from werkzeug.security import generate_password_hash
 from sqlalchemy.exc import IntegrityError
+from ..models.adherence import adherence_panel, DEFAULT_TOLERANCE
+from ..models.foodlog import log_today
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+# Longest window the adherence panel covers
+MAX_ADHERENCE_DAYS = 366
 
 bp = Blueprint('users', __name__)
 
@@ -32,11 +42,56 @@ def login_user():
         'role': user.role  # Assuming 'role' is a field in your User model
     }), 200
 
+def _message_row(message):
+    # Same shape as Message.serialize
+    return {
+        'message_id': message['message_id'],
+        'sender_id': message['sender_id'],
+        'receiver_id': message['receiver_id'],
+        'message_text': message['message_text'],
+        'timestamp': message['timestamp'].isoformat(),
+        'status': message['status'],
+    }
+
+
+def _user_row(user, sent_messages, received_messages):
+    # Same shape as User.serialize
+    return {
+        'user_id': user['user_id'],
+        'name': user['name'],
+        'email': user['email'],
+        'role': user['role'],
+        'age': user['age'],
+        'gender': user['gender'],
+        'height_cm': str(user['height_cm']) if user['height_cm'] is not None else None,
+        'weight_kg': str(user['weight_kg']) if user['weight_kg'] is not None else None,
+        'activity_level': user['activity_level'],
+        'disease_id': user['disease_id'],
+        'disease_name': user['disease_name'],
+        'created_at': user['created_at'].isoformat() if user['created_at'] else None,
+        'sent_messages': sent_messages,
+        'received_messages': received_messages,
+    }
+
+
 # Get all users
 @bp.route('/', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.serialize() for user in users])
+    # Every message in one pass instead of two queries per user; this read
+    # finishes before the user rows below start streaming
+    sent, received = defaultdict(list), defaultdict(list)
+    for message in stream_rows(select(Message.__table__).order_by(Message.message_id)):
+        serialized = _message_row(message)
+        sent[message['sender_id']].append(serialized)
+        received[message['receiver_id']].append(serialized)
+
+    users = stream_rows(
+        select(User.user_id, User.name, User.email, User.role, User.age, User.gender, User.height_cm,
+               User.weight_kg, User.activity_level, User.disease_id, User.created_at, Disease.disease_name)
+        .outerjoin(Disease, User.disease_id == Disease.disease_id)
+        .order_by(User.user_id)
+    )
+    return jsonify([_user_row(user, sent[user['user_id']], received[user['user_id']]) for user in users])
 
 # Get a specific user
 @bp.route('/<int:user_id>', methods=['GET'])
@@ -187,6 +242,27 @@ def get_patients():
     
     return jsonify(result)
 
+# Intake versus meal plan goals for every patient (or one nutritionist's patients)
+@bp.route('/patients/adherence', methods=['GET'])
+def get_patients_adherence():
+    days = request.args.get('days', default=7, type=int)
+    if not 1 <= days <= MAX_ADHERENCE_DAYS:
+        return jsonify({"error": f"days must be between 1 and {MAX_ADHERENCE_DAYS}"}), 400
+    try:
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else log_today()
+    except ValueError:
+        return jsonify({"error": "to must be YYYY-MM-DD"}), 400
+    nutritionist_id = request.args.get('nutritionist_id', type=int)
+    tolerance = request.args.get('tolerance', default=DEFAULT_TOLERANCE, type=float)
+
+    patients = adherence_panel(end, days, nutritionist_id, tolerance)
+    return jsonify({
+        "from": (end - timedelta(days=days - 1)).isoformat(),
+        "to": end.isoformat(),
+        "patients": patients,
+        "out_of_range": sum(1 for patient in patients if patient["out_of_range"]),
+    }), 200
+
 @bp.route('/nutritionists', methods=['GET'])
 def get_nutritionists():
     # Query to fetch patients with their disease details
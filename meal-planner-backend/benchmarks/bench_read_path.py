@@ -0,0 +1,65 @@
+"""Compares ORM loading with streamed Core rows for the food catalog list.
+
+Run from meal-planner-backend/:
+
+    python -m benchmarks.bench_read_path --foods 50000 --runs 5
+
+Uses an in-memory SQLite database, so no MySQL server is needed. The
+numbers cover Python-side row building only; they say nothing about the
+MySQL driver's buffering, which depends on the driver (see read_path).
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import select
+
+from app.db import db
+from app.models.catalog_sync import CATALOG_COLUMNS, catalog_row
+from app.models.food_items import FoodItem
+from app.models.read_path import stream_rows
+from benchmarks.bench_serialization import make_app
+
+
+def orm_items():
+    return [item.serialize() for item in FoodItem.query.all()]
+
+
+def streamed_items():
+    return [catalog_row(item) for item in stream_rows(select(*CATALOG_COLUMNS).order_by(FoodItem.food_id))]
+
+
+def measure(load, runs):
+    # Timed runs, then one traced run: tracemalloc slows allocation down
+    latencies = []
+    for _ in range(runs):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        load()
+        latencies.append(time.perf_counter() - started)
+    db.session.expunge_all()
+    tracemalloc.start()
+    load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return latencies, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=50000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app(args.foods, seed=0)
+    print(f'{args.foods} foods')
+    print(f'{"read path":<12}{"p50 ms":>10}{"peak MB":>10}')
+    with app.app_context():
+        for name, load in (('orm', orm_items), ('rows', streamed_items)):
+            latencies, peak = measure(load, args.runs)
+            print(f'{name:<12}{statistics.median(latencies) * 1000:>10.1f}{peak / 2 ** 20:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
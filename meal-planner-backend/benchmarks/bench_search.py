@@ -0,0 +1,56 @@
+"""Measures food search latency on a synthetic catalog.
+
+Run from meal-planner-backend/:
+
+    python -m benchmarks.bench_search --foods 100000 --runs 200
+
+No database is needed; the catalog snapshot is built in memory.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.models.food_search import FoodSearchIndex
+from benchmarks.bench_solver import synthetic_catalog
+
+WORDS = ['chicken', 'beef', 'rice', 'bean', 'salad', 'soup', 'apple', 'banana', 'oat', 'milk',
+         'yogurt', 'bread', 'egg', 'tomato', 'potato', 'fish', 'lentil', 'cheese', 'pasta', 'spinach']
+
+# Prefixes, whole words and misspellings, as typed into an autocomplete box
+QUERIES = ['ch', 'chick', 'chicken rice', 'bea', 'spinach', 'yoghurt', 'chikcen', 'potatoe', 'lentl', 'xyz']
+
+
+def named_catalog(size, seed):
+    catalog = synthetic_catalog(size, seed)
+    rng = random.Random(seed)
+    for partition in catalog.partitions.values():
+        partition.names = [f'{" ".join(rng.sample(WORDS, rng.randint(1, 3)))} {food_id}'
+                           for food_id in partition.food_ids]
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    catalog = named_catalog(args.foods, seed=0)
+    started = time.perf_counter()
+    index = FoodSearchIndex(catalog)
+    print(f'{args.foods} foods, index built in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+    print(f'{"query":<16}{"p50 ms":>10}{"max ms":>10}{"hits":>6}')
+    for query in QUERIES:
+        latencies = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            results = index.search(query, args.limit)
+            latencies.append(time.perf_counter() - started)
+        print(f'{query:<16}{statistics.median(latencies) * 1000:>10.3f}{max(latencies) * 1000:>10.3f}{len(results):>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Compares row-object and columnar JSON encodings of the food catalog.
+
+Run from meal-planner-backend/:
+
+    python -m benchmarks.bench_serialization --foods 10000 --runs 20
+
+Uses an in-memory SQLite database, so no MySQL server is needed.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from flask import Flask, json
+from sqlalchemy import insert
+
+from app.db import db
+from app.models import columnar
+from app.models.catalog_sync import _columnar_catalog
+from app.models.food_items import FoodItem
+
+
+def make_app(size, seed):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    rng = random.Random(seed)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(FoodItem), [{
+            'name': f'food {food_id}',
+            'measure': '1 serving',
+            'grams': round(rng.uniform(30, 400), 2),
+            'calories': round(rng.uniform(40, 900), 2),
+            'protein': round(rng.uniform(0, 45), 2),
+            'carbs': round(rng.uniform(0, 110), 2),
+            'fiber': round(rng.uniform(0, 12), 2),
+            'fat': round(rng.uniform(0, 40), 2),
+            'sat_fat': round(rng.uniform(0, 15), 2),
+            'food_type': 'Lunch',
+        } for food_id in range(size)])
+        db.session.commit()
+    return app
+
+
+def rows_body():
+    return json.dumps([item.serialize() for item in FoodItem.query.all()]).encode()
+
+
+def measure(encode, runs):
+    latencies = []
+    for _ in range(runs):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        body = encode()
+        latencies.append(time.perf_counter() - started)
+    return latencies, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app(args.foods, seed=0)
+    orjson = columnar.orjson
+    encodings = [('rows (ORM + json)', rows_body)]
+    if orjson is not None:
+        encodings.append(('columnar (orjson)', _columnar_catalog))
+
+    def stdlib_columnar():
+        columnar.orjson = None
+        try:
+            return _columnar_catalog()
+        finally:
+            columnar.orjson = orjson
+    encodings.append(('columnar (json)', stdlib_columnar))
+
+    print(f'{args.foods} foods')
+    print(f'{"encoding":<20}{"p50 ms":>10}{"max ms":>10}{"bytes":>12}')
+    with app.app_context():
+        for name, encode in encodings:
+            latencies, size = measure(encode, args.runs)
+            print(f'{name:<20}{statistics.median(latencies) * 1000:>10.1f}{max(latencies) * 1000:>10.1f}{size:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compares the greedy and knapsack plan solvers on a synthetic catalog.
+
+Run from meal-planner-backend/:
+
+    python -m benchmarks.bench_solver --foods 20000 --runs 20 --time-budget-ms 500
+
+No database is needed; the catalog snapshot is built in memory.
+"""
+import argparse
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.models.catalog import CatalogPartition, CatalogSnapshot
+from app.models.plan_solver import MEAL_TYPES, SOLVERS, day_totals, plan_deviation
+
+
+def synthetic_catalog(size, seed):
+    rng = random.Random(seed)
+    partitions = {}
+    for food_id in range(size):
+        food_type = MEAL_TYPES[food_id % len(MEAL_TYPES)]
+        partition = partitions.setdefault(food_type.lower(), CatalogPartition(food_type))
+        partition.append(SimpleNamespace(
+            food_id=food_id,
+            name=f'food {food_id}',
+            measure='1 serving',
+            grams=rng.uniform(30, 400),
+            calories=rng.uniform(40, 900),
+            protein=rng.uniform(0, 45),
+            carbs=rng.uniform(0, 110),
+            fat=rng.uniform(0, 40),
+            fiber=rng.uniform(0, 12),
+            sat_fat=rng.uniform(0, 15),
+        ))
+    return CatalogSnapshot(1, partitions)
+
+
+def run(solver, catalog, goals, runs, options):
+    latencies, deviations = [], []
+    for seed in range(runs):
+        started = time.perf_counter()
+        week = SOLVERS[solver](catalog, goals, random.Random(seed), **options)
+        latencies.append(time.perf_counter() - started)
+        deviations.extend(plan_deviation(day_totals(day), goals) for day in week.values())
+    return latencies, deviations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--time-budget-ms', type=int, default=500)
+    args = parser.parse_args()
+
+    catalog = synthetic_catalog(args.foods, seed=0)
+    # calories, protein, carbs, fat, fiber, sat_fat
+    goals = np.array([2000.0, 90.0, 250.0, 70.0, 30.0, 20.0])
+
+    print(f'{args.foods} foods, {args.runs} weekly plans per solver')
+    print(f'{"solver":<10}{"p50 ms":>10}{"max ms":>10}{"mean dev":>12}{"worst dev":>12}')
+    for solver, options in [('greedy', {}), ('knapsack', {'time_budget': args.time_budget_ms / 1000})]:
+        latencies, deviations = run(solver, catalog, goals, args.runs, options)
+        print(f'{solver:<10}{statistics.median(latencies) * 1000:>10.1f}{max(latencies) * 1000:>10.1f}'
+              f'{statistics.mean(deviations):>12.3f}{max(deviations):>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
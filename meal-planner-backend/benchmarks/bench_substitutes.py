@@ -0,0 +1,61 @@
+"""Measures substitute lookup and incremental patch times on a synthetic catalog.
+
+Run from meal-planner-backend/:
+
+    python -m benchmarks.bench_substitutes --foods 100000 --runs 200
+
+No database is needed for lookups; the index is built from random vectors.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.models.food_substitutes import SUBSTITUTE_NUTRIENTS, SubstitutionIndex
+
+FOOD_TYPES = ['breakfast', 'lunch', 'supper', 'snack']
+QUERIES = [
+    ('nearest', {}),
+    ('same type', {'same_type': True}),
+    ('lower sat_fat', {'lower': ['sat_fat']}),
+    ('lower carbs+fat', {'same_type': True, 'lower': ['carbs', 'fat']}),
+]
+
+
+def synthetic_index(size, seed):
+    rng = np.random.default_rng(seed)
+    per_gram = rng.uniform(0, 1, (size, len(SUBSTITUTE_NUTRIENTS))) * [9, 0.4, 0.8, 0.4, 0.1, 0.15]
+    food_types = [FOOD_TYPES[food_id % len(FOOD_TYPES)] for food_id in range(size)]
+    return SubstitutionIndex(1, np.arange(size), food_types, per_gram)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = synthetic_index(args.foods, seed=0)
+    print(f'{args.foods} foods, index built in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+    rng = np.random.default_rng(1)
+    print(f'{"query":<18}{"p50 ms":>10}{"max ms":>10}')
+    for name, options in QUERIES:
+        latencies = []
+        for food_id in rng.integers(0, args.foods, args.runs):
+            started = time.perf_counter()
+            index.substitutes(int(food_id), args.k, **options)
+            latencies.append(time.perf_counter() - started)
+        print(f'{name:<18}{statistics.median(latencies) * 1000:>10.3f}{max(latencies) * 1000:>10.3f}')
+
+    # Patching without the database: drop 100 foods, the shape of a delete-only change
+    started = time.perf_counter()
+    index.patched(2, [], list(range(0, args.foods, max(args.foods // 100, 1))))
+    print(f'patch (100 deletes) {(time.perf_counter() - started) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
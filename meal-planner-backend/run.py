@@ -1,7 +1,8 @@
 from app import create_app
 
-# Create the Flask app instance
-app = create_app()
+# Create the Flask app instance; as the serving process it also picks up
+# background jobs orphaned by a restart
+app = create_app({'JOB_RECOVERY': True})
 
 if __name__ == "__main__":
     # Run the app in debug mode for development
@@ -0,0 +1,125 @@
+"""Test fixtures: the app on an in-memory SQLite database, with a small seeded catalog.
+
+Run from meal-planner-backend/:
+
+    python -m pytest
+"""
+import math
+import random
+import sqlite3
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import create_app
+from app.db import db
+from app.models import catalog, food_search, food_substitutes
+from app.models.plan_cache import plan_cache
+from app.models.Diseases import Disease
+from app.models.food_items import FoodItem
+from app.models.meal_plans import MealPlan
+from app.models.users import User
+
+MEAL_TYPES = ('breakfast', 'lunch', 'Supper', 'snack')
+
+
+@event.listens_for(Engine, 'connect')
+def _mysql_functions(connection, record):
+    # MySQL functions the rollup queries use, for the SQLite test database
+    if isinstance(connection, sqlite3.Connection):
+        connection.create_function('datediff', 2, lambda end, start: (
+            date.fromisoformat(str(end)[:10]) - date.fromisoformat(str(start)[:10])).days)
+        connection.create_function('floor', 1, math.floor)
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'JOB_STORE': 'memory',
+        'TESTING': True,
+    })
+    # Process-wide caches are keyed by catalog version, which restarts at 0
+    # with every fresh database
+    catalog._snapshot = None
+    food_search._index = None
+    food_substitutes._index = None
+    plan_cache.clear()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seeded(app):
+    """One disease stage with a meal plan, three patients and 40 foods."""
+    rng = random.Random(0)
+    db.session.add(Disease(disease_id=1, disease_name='Diabetes', stage_name='Stage 1',
+                           stage_description='Early', stage_name_id=1))
+    db.session.add(MealPlan(plan_id=1, disease_id=1, stage_name='Stage 1', caloric_goal=2000, protein_goal=80,
+                            carbs_goal=250, fats_goal=70, fiber_goal=30, sat_fat_goal=20))
+    for user_id in range(1, 4):
+        db.session.add(User(user_id=user_id, name=f'Patient {user_id}', email=f'patient{user_id}@example.com',
+                            password='secret', role='patient', disease_id=1))
+    for food_id in range(1, 41):
+        db.session.add(FoodItem(food_id=food_id, name=f'food {food_id}', measure='1 serving', grams=100,
+                                calories=round(rng.uniform(50, 600), 2), protein=round(rng.uniform(1, 30), 2),
+                                carbs=round(rng.uniform(5, 80), 2), fiber=round(rng.uniform(0, 8), 2),
+                                fat=round(rng.uniform(1, 25), 2), sat_fat=round(rng.uniform(0, 8), 2),
+                                micronutrients='', food_type=MEAL_TYPES[food_id % len(MEAL_TYPES)]))
+    db.session.commit()
+    return app
+
+
+@pytest.fixture
+def count_statements(app):
+    """Returns a context manager collecting the SQL statements run inside it."""
+    from contextlib import contextmanager
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
+
+
+WEEK = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+@pytest.fixture
+def week_plan():
+    """Builds a week for /api/user_meal_plan/save with ``meal_name`` at breakfast and lunch every day."""
+    def build(meal_name):
+        meal = {'name': meal_name, 'measure': '1 serving', 'grams': 100, 'calories': 300,
+                'protein': 20, 'carbs': 30, 'fat': 10, 'fiber': 4, 'sat_fat': 2}
+        return {day: {'breakfast': [dict(meal)], 'lunch': [dict(meal)]} for day in WEEK}
+    return build
+
+
+@pytest.fixture
+def save_plan(client):
+    """Saves a week for patient 1 from 2026-03-02 (a Monday)."""
+    def save(meal_plan, mode='replace'):
+        return client.post('/api/user_meal_plan/save', json={
+            'user_id': 1, 'stage_name': 'Stage 1', 'start_date': '2026-03-02', 'mode': mode, 'meal_plan': meal_plan,
+        })
+    return save
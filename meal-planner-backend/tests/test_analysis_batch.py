@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+from sqlalchemy import select, insert
+
+from app import create_app
+from app.db import db
+from app.models.analysis_batch import user_id_ranges, refresh_partition
+from app.models.foodlog import FoodLog
+from app.models.NutritionAnalysis import NutritionAnalysis
+from app.models.users import User
+
+# Logs per user: user 10 is heavy enough to span several tiles
+LOG_COUNTS = {1: 5, 2: 5, 3: 5, 10: 40, 11: 3, 12: 3, 20: 6}
+
+
+def _seed_logs():
+    for user_id in LOG_COUNTS:
+        if user_id > 3:
+            db.session.add(User(user_id=user_id, name=f'Patient {user_id}', email=f'patient{user_id}@example.com',
+                                password='secret', role='patient', disease_id=1))
+    db.session.commit()
+    db.session.execute(insert(FoodLog), [
+        {'user_id': user_id, 'meal_name': 'food 1', 'meal_type': 'lunch', 'calories': 100 + day, 'protein': 1,
+         'carbs': 1, 'fats': 1, 'fiber': 1, 'sat_fat': 1, 'grams': 100, 'measure': 'g',
+         'log_date': date(2026, 3, 1) + timedelta(days=day)}
+        for user_id, count in LOG_COUNTS.items() for day in range(count)
+    ])
+    db.session.commit()
+
+
+def _analysis():
+    return db.session.execute(
+        select(NutritionAnalysis.user_id, NutritionAnalysis.timeframe, NutritionAnalysis.log_date,
+               NutritionAnalysis.calories).order_by(NutritionAnalysis.user_id, NutritionAnalysis.timeframe,
+                                                    NutritionAnalysis.log_date)
+    ).all()
+
+
+def test_ranges_are_contiguous_and_keep_users_whole(seeded):
+    _seed_logs()
+    ranges = user_id_ranges(4)
+
+    assert ranges[0][0] == 1 and ranges[-1][1] is None
+    assert all(stop == next_start for (_, stop), (next_start, _) in zip(ranges, ranges[1:]))
+    # 67 logs in 4 tiles of about 17: the heavy user starts the last three tiles
+    assert ranges == [(1, 10), (10, None)]
+    assert user_id_ranges(1) == [(1, None)]
+
+
+def test_refreshing_every_range_matches_one_pass(seeded):
+    _seed_logs()
+    for _ in refresh_partition():
+        pass
+    expected = _analysis()
+
+    db.session.query(NutritionAnalysis).delete()
+    db.session.commit()
+    for start, stop in user_id_ranges(4):
+        for _ in refresh_partition(start, stop):
+            pass
+    assert _analysis() == expected
+
+
+def test_small_keyset_pages_match_one_pass(seeded, count_statements):
+    _seed_logs()
+    for _ in refresh_partition():
+        pass
+    expected = _analysis()
+
+    db.session.query(NutritionAnalysis).delete()
+    db.session.commit()
+    with count_statements() as statements:
+        for _ in refresh_partition(fetch_size=4, chunk_size=2):
+            pass
+    assert _analysis() == expected
+    pages = [statement for statement in statements if statement.startswith('SELECT') and 'FROM foodlog' in statement]
+    # 67 logs in pages of 4: 17 pages, the last one short
+    assert len(pages) == 17 and all('LIMIT' in page for page in pages)
+
+
+def test_worker_apps_have_no_job_queue():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JOB_QUEUE': False})
+    assert 'job_queue' not in app.extensions
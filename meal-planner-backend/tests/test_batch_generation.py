@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.mark.parametrize('body', [
+    {'user_ids': 1},
+    {'user_ids': '1,2'},
+    {'user_ids': [1, 'two']},
+    {'user_ids': [True]},
+    {'stage_name_ids': [1.5]},
+    {'user_ids': [1], 'stage_name_ids': {'id': 1}},
+])
+def test_batch_rejects_ids_that_are_not_integer_lists(client, seeded, body):
+    response = client.post('/api/meals/batch', json=body)
+    assert response.status_code == 400
+    assert 'must be a list of integers' in response.get_json()['error']
+
+
+def test_batch_still_requires_some_ids(client, seeded):
+    response = client.post('/api/meals/batch', json={'user_ids': []})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'user_ids or stage_name_ids is required'
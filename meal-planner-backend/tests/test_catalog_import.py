@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, select
+
+from app.db import db
+from app.models.catalog_import import import_food_items, validate_row
+from app.models.catalog_sync import CatalogChange
+from app.models.food_items import FoodItem
+
+
+@pytest.mark.parametrize('value', ['9999.995', '-9999.995', '10000', '1e30', 'nan', 'Infinity'])
+def test_values_out_of_range_after_rounding_are_rejected(value):
+    with pytest.raises(ValueError, match='out of range'):
+        validate_row({'name': 'food', 'food_type': 'lunch', 'calories': value})
+
+
+def test_values_are_rounded_to_the_column_scale():
+    assert validate_row({'name': 'food', 'food_type': 'lunch', 'calories': '9999.994'})['calories'] == Decimal('9999.99')
+
+
+def _logged_creates():
+    return db.session.execute(
+        select(CatalogChange.food_id).where(CatalogChange.op == 'create').order_by(CatalogChange.version)
+    ).scalars().all()
+
+
+@pytest.fixture(params=['returning', 'max id'])
+def write_path(request, app, monkeypatch):
+    if request.param == 'max id':
+        # MySQL cannot return the ids of a multi-row INSERT
+        monkeypatch.setattr(db.engine.dialect, 'insert_executemany_returning', False)
+    return request.param
+
+
+def test_import_logs_its_own_items_once_despite_a_concurrent_create(seeded, write_path):
+    def concurrent_create(conn, cursor, statement, parameters, context, executemany):
+        # Another writer commits an item and its catalog change while the chunk is written
+        if statement.startswith('INSERT INTO food_items') and not concurrent:
+            concurrent.append(1)
+            cursor.execute("INSERT INTO food_items (food_id, name, food_type) VALUES (500, 'other', 'snack')")
+            cursor.execute("INSERT INTO catalog_changes (food_id, op) VALUES (500, 'create')")
+
+    concurrent = []
+    event.listen(db.engine, 'before_cursor_execute', concurrent_create)
+    try:
+        result = import_food_items(enumerate([{'name': f'imported {n}', 'food_type': 'lunch'} for n in range(3)], 1),
+                                   batch_size=2)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', concurrent_create)
+
+    assert result['imported'] == 3
+    imported = db.session.execute(
+        select(FoodItem.food_id).where(FoodItem.name.like('imported %')).order_by(FoodItem.food_id)
+    ).scalars().all()
+    assert sorted(_logged_creates()) == sorted([500] + imported)
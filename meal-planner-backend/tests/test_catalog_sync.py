@@ -0,0 +1,70 @@
+import io
+
+from app.db import db
+from app.models.food_items import FoodItem
+
+URL = '/api/food_items/'
+
+
+def _etag(client):
+    response = client.get(URL)
+    assert response.status_code == 200
+    return response.headers['ETag'], int(response.headers['X-Catalog-Version'])
+
+
+def _delta(client, since):
+    return client.get(URL, query_string={'since': since}).get_json()
+
+
+def test_update_changes_the_etag_and_shows_in_the_delta(client, seeded):
+    etag, version = _etag(client)
+
+    response = client.put(f'{URL}5', json={'calories': 123.45})
+    assert response.status_code == 200
+
+    assert client.get(URL, headers={'If-None-Match': etag}).status_code == 200
+    new_etag, new_version = _etag(client)
+    assert new_etag != etag and new_version > version
+    delta = _delta(client, version)
+    assert [item['food_id'] for item in delta['items']] == [5]
+    assert delta['items'][0]['calories'] == '123.45'
+    assert client.get(URL, headers={'If-None-Match': new_etag}).status_code == 304
+
+
+def test_create_delete_and_import_are_logged(client, seeded):
+    _, version = _etag(client)
+
+    created = client.post(URL, json={'name': 'new food', 'measure': '1 cup', 'grams': 100, 'calories': 50,
+                                     'protein': 1, 'carbs': 1, 'fiber': 1, 'fat': 1, 'sat_fat': 0,
+                                     'micronutrients': '', 'food_type': 'snack'}).get_json()
+    assert client.delete(f'{URL}7').status_code == 204
+    data = io.BytesIO(b'{"name": "imported food", "food_type": "lunch", "grams": 100}\n')
+    assert client.post(f'{URL}import', data={'file': (data, 'foods.ndjson')}).status_code == 201
+
+    delta = _delta(client, version)
+    assert [item['name'] for item in delta['items']] == ['new food', 'imported food']
+    assert delta['items'][0]['food_id'] == created['food_id']
+    assert delta['deleted'] == [7]
+
+
+def test_full_list_and_delta_have_different_etags(client, seeded):
+    etag, version = _etag(client)
+
+    delta = client.get(URL, query_string={'since': version})
+    assert delta.headers['ETag'] != etag
+    assert client.get(URL, query_string={'since': version}, headers={'If-None-Match': etag}).status_code == 200
+    assert client.get(URL, query_string={'since': version},
+                      headers={'If-None-Match': delta.headers['ETag']}).status_code == 304
+    assert client.get(URL, headers={'If-None-Match': delta.headers['ETag']}).status_code == 200
+
+
+def test_update_without_a_difference_keeps_the_version(client, seeded):
+    etag, version = _etag(client)
+    calories = float(db.session.get(FoodItem, 5).calories)
+
+    # Same values, numbers in another spelling, and a field that is not updatable
+    response = client.put(f'{URL}5', json={'name': 'food 5', 'grams': 100, 'calories': str(calories), 'food_id': 9})
+    assert response.status_code == 200
+
+    assert _etag(client) == (etag, version)
+    assert _delta(client, version)['items'] == []
@@ -0,0 +1,25 @@
+from app.db import db
+from app.models.daily_intake import DailyIntake, rebuild_daily_intake
+from app.models.foodlog import FoodLog, log_today
+
+
+def _totals():
+    return [(row.log_date, float(row.calories), row.entry_count) for row in DailyIntake.query.order_by(DailyIntake.log_date)]
+
+
+def test_undated_logs_land_on_the_day_intake_reads(client, seeded):
+    assert client.post('/api/food_items/nutrition/log-meal', json={'user_id': 1, 'food_item': 'food 1', 'meal_time': 'breakfast'}).status_code == 201
+    response = client.post('/api/food_items/nutrition/log-meals', json={'user_id': 1, 'entries': [{'food_item': 'food 2', 'meal_time': 'lunch'}]})
+    assert response.status_code == 201
+
+    assert {log.log_date for log in FoodLog.query} == {log_today()}
+    recorded = _totals()
+    # The backfill groups foodlog by its own dates and must agree with what the writers recorded
+    rebuild_daily_intake()
+    db.session.commit()
+    assert _totals() == recorded
+
+    today = client.get('/api/nutritionalanalysis/intake/today', query_string={'user_id': 1}).get_json()
+    assert today['log_date'] == log_today().isoformat() and today['entry_count'] == 2
+    days = client.get('/api/nutritionalanalysis/intake', query_string={'user_id': 1}).get_json()
+    assert [day['log_date'] for day in days] == [log_today().isoformat()]
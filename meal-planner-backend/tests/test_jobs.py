@@ -0,0 +1,71 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from app.db import db
+from app.models.jobs import DatabaseJobStore, Job, job_queue
+
+
+@pytest.fixture
+def queue(app):
+    queue = job_queue()
+    queue.store = DatabaseJobStore()
+    queue.register('echo', lambda value: {'value': value})
+    return queue
+
+
+def _job(job_id, status, owner=None, heartbeat_at=None):
+    db.session.add(Job(job_id=job_id, kind='echo', status=status, payload=json.dumps({'value': job_id}),
+                       created_at=datetime.utcnow(), started_at=heartbeat_at, owner=owner, heartbeat_at=heartbeat_at))
+    db.session.commit()
+
+
+def test_recovery_runs_orphaned_queued_jobs_and_fails_dead_running_ones(queue):
+    _job('queued', 'queued')
+    _job('dead', 'running', owner='other:1:a', heartbeat_at=datetime.utcnow() - timedelta(minutes=5))
+    _job('alive', 'running', owner='other:2:b', heartbeat_at=datetime.utcnow())
+
+    assert queue.recover(timeout=120) == 1
+    assert queue.wait('queued', timeout=5)['result'] == {'value': 'queued'}
+    dead = queue.get('dead')
+    assert dead['status'] == 'failed' and dead['finished_at']
+    assert queue.get('alive')['status'] == 'running'
+
+
+def test_a_job_is_claimed_once(queue):
+    _job('queued', 'queued')
+    assert queue.store.claim('queued', 'a')
+    assert not queue.store.claim('queued', 'b')
+
+
+def test_a_job_failed_by_recovery_keeps_its_status(queue):
+    _job('slow', 'queued')
+    assert queue.store.claim('slow', 'other:1:a')
+    db.session.execute(Job.__table__.update().values(heartbeat_at=datetime.utcnow() - timedelta(minutes=5)))
+    db.session.commit()
+    queue.recover(timeout=120)
+
+    # The original owner finishes after all; its result is dropped
+    assert not queue.store.finish('slow', 'other:1:a', status='succeeded', result={}, finished_at=datetime.utcnow())
+    assert queue.get('slow')['status'] == 'failed'
+
+
+def test_heartbeat_keeps_a_long_job_from_being_recovered(queue):
+    _job('long', 'queued')
+    assert queue.store.claim('long', queue.owner)
+    db.session.execute(Job.__table__.update().values(heartbeat_at=datetime.utcnow() - timedelta(minutes=5)))
+    db.session.commit()
+
+    queue.store.heartbeat(queue.owner)
+    queue.recover(timeout=120)
+    assert queue.get('long')['status'] == 'running'
+
+
+def test_apps_only_recover_jobs_when_asked(app):
+    # CLI commands and worker processes build the app without JOB_RECOVERY
+    assert not job_queue()._executor._threads
+    served = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JOB_STORE': 'memory', 'JOB_RECOVERY': True})
+    assert served.extensions['job_queue']._executor._threads
+    served.extensions['job_queue'].shutdown()
@@ -0,0 +1,41 @@
+import pytest
+
+from app.db import db
+from app.models.food_items import FoodItem
+from app.models.foodlog import FoodLog
+
+URL = '/api/food_items/nutrition/log-meals'
+
+
+@pytest.mark.parametrize('entry, message', [
+    ('food 1', 'entries[1] must be an object'),
+    ({'food_item': ['food 1'], 'meal_time': 'lunch'}, 'entries[1].food_item must be a string'),
+    ({'food_item': {'name': 'food 1'}, 'meal_time': 'lunch'}, 'entries[1].food_item must be a string'),
+    ({'food_item': 'food 1', 'meal_time': 3}, 'entries[1].meal_time must be a string'),
+    ({'food_item': 'food 1', 'meal_time': 'lunch', 'log_date': 20260302}, 'entries[1].log_date must be a string'),
+])
+def test_malformed_entry_is_a_400_naming_its_index(client, seeded, entry, message):
+    response = client.post(URL, json={'user_id': 1, 'entries': [{'food_item': 'food 1', 'meal_time': 'lunch'}, entry]})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': message, 'index': 1}
+    assert FoodLog.query.count() == 0
+
+
+def test_food_without_a_measure_is_reported_not_a_500(client, seeded):
+    db.session.get(FoodItem, 2).measure = None
+    db.session.commit()
+
+    response = client.post(URL, json={'user_id': 1, 'entries': [
+        {'food_item': 'food 1', 'meal_time': 'lunch'},
+        {'food_item': 'food 2', 'meal_time': 'lunch'},
+    ]})
+
+    assert response.status_code == 201
+    assert response.get_json()['logged'] == 1
+    assert response.get_json()['errors'] == [{'index': 1, 'error': 'Food item has no measure'}]
+
+
+def test_user_id_must_be_an_integer(client, seeded):
+    response = client.post(URL, json={'user_id': '1', 'entries': [{'food_item': 'food 1', 'meal_time': 'lunch'}]})
+    assert response.status_code == 400
@@ -0,0 +1,25 @@
+from datetime import date
+
+from app.db import db
+from app.models.meal_plans import MealPlan
+from app.routes.meals import _weekly_seed
+
+
+def test_repeat_request_without_seed_hits_cache(seeded, client):
+    first = client.get('/api/meals/1')
+    second = client.get('/api/meals/1')
+
+    assert first.status_code == 200
+    assert first.headers['X-Cache'] == 'miss'
+    assert second.headers['X-Cache'] == 'hit'
+    assert second.headers['X-Meal-Plan-Seed'] == first.headers['X-Meal-Plan-Seed']
+    assert second.get_json() == first.get_json()
+
+
+def test_weekly_seed_changes_with_iso_week(seeded):
+    meal_plan = db.session.get(MealPlan, 1)
+
+    monday = _weekly_seed(1, meal_plan, date(2026, 10, 12))
+    assert _weekly_seed(1, meal_plan, date(2026, 10, 18)) == monday
+    assert _weekly_seed(1, meal_plan, date(2026, 10, 19)) != monday
+    assert _weekly_seed(2, meal_plan, date(2026, 10, 12)) != monday
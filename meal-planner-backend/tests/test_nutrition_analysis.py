@@ -0,0 +1,33 @@
+URL = '/api/nutritionalanalysis/'
+
+
+def _log(client, day, food='food 1'):
+    response = client.post('/api/food_items/nutrition/log-meal',
+                           json={'user_id': 1, 'food_item': food, 'meal_time': 'lunch', 'log_date': day})
+    assert response.status_code == 201
+
+
+def test_yearly_series_is_newest_first_and_limited_in_sql(client, seeded, week_plan, save_plan, count_statements):
+    assert save_plan(week_plan('food 1')).status_code == 201
+    for day in ('2024-05-01', '2025-01-02', '2025-12-31', '2026-03-02'):
+        _log(client, day)
+
+    response = client.post(URL, json={'user_id': 1, 'timeframe': 'yearly'})
+    assert [row['day_variant'] for row in response.get_json()['yearly']['data']] == ['2026', '2025', '2024']
+    two_logs = response.get_json()['yearly']['data'][1]
+    assert two_logs['log_date'] == '2025-12-31'
+
+    with count_statements() as statements:
+        response = client.post(URL, json={'user_id': 1, 'timeframe': 'yearly', 'limit': 1, 'to': '2025-12-31'})
+    assert [row['day_variant'] for row in response.get_json()['yearly']['data']] == ['2025']
+    assert response.get_json()['yearly']['data'][0]['calories'] == two_logs['calories']
+    yearly = [statement for statement in statements if 'daily_intake' in statement]
+    assert len(yearly) == 1 and 'LIMIT' in yearly[0]
+    assert not any('FROM foodlog' in statement for statement in statements)
+
+
+def test_limit_below_one_is_rejected(client, seeded):
+    for limit in (0, -1):
+        response = client.post(URL, json={'user_id': 1, 'timeframe': 'yearly', 'limit': limit})
+        assert response.status_code == 400
+    assert client.post(URL, json={'user_id': 1, 'limit': 'x'}).status_code == 400
@@ -0,0 +1,92 @@
+from datetime import date
+
+from sqlalchemy import inspect, text
+
+from app.db import db
+from app.models.foodlog import FoodLog
+from app.models.NutritionAnalysis import NutritionAnalysis, AnalysisWatermark
+from app.models.nutrition_rollups import refresh_nutritional_analysis
+from app.models.schema_upgrade import upgrade_schema
+
+
+def _log(day, calories=100, log_id=None):
+    db.session.add(FoodLog(log_id=log_id, user_id=1, meal_name='food 1', meal_type='lunch', calories=calories,
+                           protein=1, carbs=1, fats=1, fiber=1, sat_fat=1, grams=100, measure='g', log_date=day))
+    db.session.commit()
+
+
+def _buckets(timeframe):
+    return (NutritionAnalysis.query.filter_by(user_id=1, timeframe=timeframe)
+            .order_by(NutritionAnalysis.log_date).all())
+
+
+def test_incremental_refresh_keeps_one_row_per_bucket(seeded):
+    _log(date(2026, 3, 2))
+    _log(date(2026, 3, 3))
+    assert refresh_nutritional_analysis(1) == 4
+    db.session.commit()
+
+    # Same day, same week and same month again, plus a later day of the month
+    _log(date(2026, 3, 3), calories=50)
+    _log(date(2026, 3, 20))
+    refresh_nutritional_analysis(1)
+    db.session.commit()
+
+    daily = _buckets('daily')
+    assert [(row.log_date, float(row.calories)) for row in daily] == [
+        (date(2026, 3, 2), 100.0), (date(2026, 3, 3), 150.0), (date(2026, 3, 20), 100.0)]
+    # The month is re-dated by its newest log instead of getting a second row
+    assert [row.log_date for row in _buckets('monthly')] == [date(2026, 3, 20)]
+    assert len(_buckets('weekly')) == 2
+    assert db.session.get(AnalysisWatermark, 1).last_log_id == 4
+
+
+def test_refresh_without_new_logs_only_rereads_the_overlap(seeded):
+    _log(date(2026, 3, 2))
+    refresh_nutritional_analysis(1)
+    db.session.commit()
+
+    # The day, week and month of the recent log are written again, unchanged
+    assert refresh_nutritional_analysis(1) == 3
+    db.session.commit()
+    assert [float(row.calories) for row in _buckets('daily')] == [100.0]
+    assert db.session.get(AnalysisWatermark, 1).last_log_id == 1
+
+
+def test_refresh_picks_up_a_log_committed_after_a_higher_id(seeded):
+    _log(date(2026, 3, 2), log_id=1)
+    _log(date(2026, 3, 3), log_id=3)
+    refresh_nutritional_analysis(1)
+    db.session.commit()
+
+    # Log 2 was inserted before log 3 but its transaction committed after the refresh
+    _log(date(2026, 3, 2), calories=50, log_id=2)
+    refresh_nutritional_analysis(1)
+    db.session.commit()
+
+    assert [float(row.calories) for row in _buckets('daily')] == [150.0, 100.0]
+    assert db.session.get(AnalysisWatermark, 1).last_log_id == 3
+
+
+def test_upgrade_adds_bucket_constraint_to_an_existing_table(seeded):
+    # nutritionalanalysis as created before the constraint existed, with a duplicated bucket
+    db.session.execute(text('DROP TABLE nutritionalanalysis'))
+    db.session.execute(text(
+        'CREATE TABLE nutritionalanalysis (analysis_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, '
+        'log_date DATE NOT NULL, timeframe VARCHAR(10) NOT NULL, day_variant VARCHAR(20), '
+        'calories NUMERIC(10, 2), protein NUMERIC(10, 2), carbs NUMERIC(10, 2), fats NUMERIC(10, 2), '
+        'fiber NUMERIC(10, 2), sat_fat NUMERIC(10, 2))'
+    ))
+    for calories in (100, 200):
+        db.session.execute(text(
+            "INSERT INTO nutritionalanalysis (user_id, log_date, timeframe, calories) "
+            "VALUES (1, '2026-03-02', 'daily', :calories)"
+        ), {'calories': calories})
+    db.session.commit()
+
+    assert upgrade_schema() == [('uq_nutritionalanalysis_bucket', 1)]
+    assert [float(row.calories) for row in _buckets('daily')] == [200.0]
+    indexes = {index['name'] for index in inspect(db.engine).get_indexes('nutritionalanalysis')}
+    assert 'uq_nutritionalanalysis_bucket' in indexes
+    # Nothing left to do on a second run
+    assert upgrade_schema() == []
@@ -0,0 +1,125 @@
+from datetime import date
+
+from sqlalchemy import inspect, text
+
+from app.db import db
+from app.models.foodlog import FoodLog
+from app.models.plan_adherence import MealAdherence, AdherenceWatermark, refresh_adherence
+from app.models.schema_upgrade import upgrade_schema
+
+SUNDAY = date(2026, 3, 8)
+
+
+def _log(client, user_id, day, meal_time='breakfast'):
+    response = client.post('/api/food_items/nutrition/log-meal',
+                           json={'user_id': user_id, 'food_item': 'food 1', 'meal_time': meal_time, 'log_date': day})
+    assert response.status_code == 201
+
+
+def _scored_days(user_id):
+    return [row.log_date for row in MealAdherence.query.filter_by(user_id=user_id).order_by(MealAdherence.log_date)]
+
+
+def test_refresh_is_one_pass_for_any_number_of_patients(client, seeded, week_plan, save_plan, count_statements):
+    assert save_plan(week_plan('food 1')).status_code == 201
+    for user_id in (1, 2, 3):
+        _log(client, user_id, '2026-03-03')
+
+    with count_statements() as one_patient:
+        assert refresh_adherence([1], today=SUNDAY) == 7
+    with count_statements() as two_patients:
+        assert refresh_adherence([2, 3], today=SUNDAY) == 2
+    db.session.commit()
+
+    assert len(one_patient) == len(two_patients)
+    assert _scored_days(1) == [date(2026, 3, day) for day in range(2, 9)]
+    assert _scored_days(2) == [date(2026, 3, 3)]
+
+
+def test_refresh_reads_only_past_the_watermark(client, seeded, week_plan, save_plan):
+    assert save_plan(week_plan('food 1')).status_code == 201
+    _log(client, 1, '2026-03-03')
+    refresh_adherence([1], today=date(2026, 3, 4))
+    db.session.commit()
+    assert db.session.get(AdherenceWatermark, 1).scored_through == date(2026, 3, 4)
+
+    # Nothing new but the day of the recent log, re-read for late commits;
+    # then a late log for an old day and two planned days that passed
+    assert refresh_adherence([1], today=date(2026, 3, 4)) == 1
+    _log(client, 1, '2026-03-02', 'lunch')
+    assert refresh_adherence([1], today=date(2026, 3, 6)) == 4
+    db.session.commit()
+    monday = db.session.get(MealAdherence, (1, date(2026, 3, 2)))
+    assert (monday.planned_meals, monday.matched_meals) == (2, 1)
+
+
+def test_refresh_picks_up_a_log_committed_after_a_higher_id(client, seeded, week_plan, save_plan):
+    assert save_plan(week_plan('food 1')).status_code == 201
+
+    def add_log(log_id, day, meal_type):
+        db.session.add(FoodLog(log_id=log_id, user_id=1, meal_name='food 1', meal_type=meal_type, calories=100,
+                               protein=1, carbs=1, fats=1, fiber=1, sat_fat=1, grams=100, measure='g', log_date=day))
+        db.session.commit()
+
+    add_log(10, date(2026, 3, 3), 'breakfast')
+    refresh_adherence([1], today=SUNDAY)
+    db.session.commit()
+
+    # Log 5 was inserted before log 10 but its transaction committed after the refresh
+    add_log(5, date(2026, 3, 2), 'lunch')
+    refresh_adherence([1], today=SUNDAY)
+    db.session.commit()
+
+    monday = db.session.get(MealAdherence, (1, date(2026, 3, 2)))
+    assert (monday.logged_meals, monday.matched_meals) == (1, 1)
+    assert db.session.get(AdherenceWatermark, 1).last_log_id == 10
+
+
+def test_refresh_chunks_patients(client, seeded, week_plan, save_plan, monkeypatch):
+    monkeypatch.setattr('app.models.plan_adherence.ADHERENCE_CHUNK_SIZE', 2)
+    for user_id in (1, 2, 3):
+        _log(client, user_id, '2026-03-03')
+
+    assert refresh_adherence([1, 2, 3], today=SUNDAY) == 3
+    db.session.commit()
+    assert AdherenceWatermark.query.count() == 3
+
+
+def test_plan_change_rescores_the_invalidated_days(client, seeded, week_plan, save_plan):
+    assert save_plan(week_plan('food 1')).status_code == 201
+    refresh_adherence([1], today=SUNDAY)
+    db.session.commit()
+
+    meal_plan = week_plan('food 1')
+    del meal_plan['Monday']['lunch']
+    assert save_plan(meal_plan, 'diff').status_code == 201
+    assert refresh_adherence([1], today=SUNDAY) == 7
+    db.session.commit()
+    assert sorted(row.planned_meals for row in MealAdherence.query.filter_by(user_id=1)) == [1] + [2] * 6
+
+
+def test_panel_combines_intake_goals_and_plan_scores(client, seeded, week_plan, save_plan):
+    assert save_plan(week_plan('food 1')).status_code == 201
+    _log(client, 1, '2026-03-03')
+
+    response = client.get('/api/user_meal_plan/adherence/panel', query_string={'from': '2026-03-02', 'to': '2026-03-08'})
+    assert response.status_code == 200
+    (patient,) = response.get_json()
+    assert patient['user_id'] == 1 and patient['stage_name'] == 'Stage 1'
+    assert patient['days_logged'] == 1 and patient['days'] == 7
+    assert patient['average_score'] is not None
+
+    assert client.get('/api/user_meal_plan/adherence/panel',
+                      query_string={'from': '2026-03-08', 'to': '2026-03-02'}).status_code == 400
+
+
+
+def test_upgrade_adds_the_scored_through_column(seeded):
+    db.session.execute(text('DROP TABLE adherence_watermarks'))
+    db.session.execute(text('CREATE TABLE adherence_watermarks (user_id INTEGER PRIMARY KEY, last_log_id INTEGER NOT NULL)'))
+    db.session.execute(text('INSERT INTO adherence_watermarks VALUES (1, 5)'))
+    db.session.commit()
+
+    assert ('adherence_watermarks.scored_through', 0) in upgrade_schema()
+    assert 'scored_through' in {column['name'] for column in inspect(db.engine).get_columns('adherence_watermarks')}
+    assert db.session.get(AdherenceWatermark, 1).scored_through is None
@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize('solver', ['greedy', 'knapsack'])
+def test_no_slot_is_empty_when_the_window_covers_the_catalog(seeded, client, solver):
+    # 10 foods per meal type, but a 21-day window: the window runs out of dishes
+    response = client.get(f'/api/meals/1/stream?weeks=3&variety_days=21&seed=1&solver={solver}&time_budget_ms=300')
+    assert response.status_code == 200
+
+    days = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(days) == 21
+    for day in days:
+        for meal_type, meals in day['meals'].items():
+            assert meals, (day['week'], day['day'], meal_type)
+
+
+def test_least_recently_served_dishes_return_first(seeded, client):
+    response = client.get('/api/meals/1/stream?weeks=2&variety_days=14&seed=1')
+    days = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    # Within the first 10 days every breakfast is new (10 breakfast foods)
+    breakfasts = [day['meals']['breakfast'][0]['name'] for day in days]
+    assert len(set(breakfasts[:10])) == 10
+    # Day 11 reuses the dish served longest ago
+    assert breakfasts[10] == breakfasts[0]
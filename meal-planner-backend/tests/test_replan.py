@@ -0,0 +1,59 @@
+from app.db import db
+from app.models.User_Meal_Plan import UserMealPlan
+
+
+def _replan(client, **values):
+    return client.post('/api/user_meal_plan/replan_slot', json={
+        'user_id': 1, 'stage_name': 'Stage 1', 'log_date': '2026-03-02', 'seed': 1, **values,
+    })
+
+
+def test_update_and_insert_return_the_same_shape(seeded, client, week_plan, save_plan):
+    assert save_plan(week_plan('food 1')).status_code == 201
+
+    updated = _replan(client, meal_type='lunch')
+    inserted = _replan(client, meal_type='Supper')
+
+    assert updated.status_code == inserted.status_code == 200
+    assert updated.get_json()['meal'].keys() == inserted.get_json()['meal'].keys()
+    assert inserted.get_json()['meal']['meal_type'] == 'Supper'
+    assert inserted.get_json()['meal']['id'] is not None
+
+
+def test_insert_stores_the_enum_spelling_of_the_meal_type(seeded, client, week_plan, save_plan):
+    assert save_plan(week_plan('food 1')).status_code == 201
+
+    response = _replan(client, meal_type='SUPPER')
+
+    assert response.status_code == 200
+    assert response.get_json()['meal']['meal_type'] == 'Supper'
+    assert db.session.get(UserMealPlan, response.get_json()['meal']['id']).meal_type == 'Supper'
+
+
+def test_unknown_meal_type_is_a_400(seeded, client, week_plan, save_plan):
+    assert save_plan(week_plan('food 1')).status_code == 201
+
+    response = _replan(client, meal_type='brunch')
+
+    assert response.status_code == 400
+    assert 'meal_type' in response.get_json()['error']
+
+
+def test_bad_date_is_a_400(seeded, client):
+    response = _replan(client, meal_type='lunch', log_date='02/03/2026')
+
+    assert response.status_code == 400
+    assert 'log_date' in response.get_json()['error']
+
+
+def test_value_error_while_replanning_is_not_reported_as_a_bad_date(seeded, client, week_plan, save_plan, monkeypatch):
+    assert save_plan(week_plan('food 1')).status_code == 201
+
+    def broken(*args, **kwargs):
+        raise ValueError('solver failure')
+    monkeypatch.setattr('app.routes.User_meal_plan.replan_slot', broken)
+
+    response = _replan(client, meal_type='lunch')
+
+    assert response.status_code == 500
+    assert response.get_json()['error'] == 'solver failure'
@@ -0,0 +1,36 @@
+from app.models.catalog import get_catalog
+from app.models.meal_generation import generate_weekly_meals
+
+
+def test_generate_weekly_meals_statement_count(seeded, count_statements):
+    get_catalog()  # Snapshot loading is not part of the count
+
+    with count_statements() as statements:
+        meals = generate_weekly_meals(1, seed=1)
+
+    assert meals > 0
+    # meal plan lookup, catalog version check, DELETE, multi-row INSERT
+    assert len(statements) == 4, statements
+
+
+def test_save_replace_statement_count(seeded, week_plan, save_plan, count_statements):
+    with count_statements() as statements:
+        response = save_plan(week_plan('food 1'))
+
+    assert response.status_code == 201
+    # adherence invalidation (cached scores, watermark), DELETE, multi-row INSERT
+    assert len(statements) == 4, statements
+
+
+def test_save_diff_statement_count(seeded, week_plan, save_plan, count_statements):
+    assert save_plan(week_plan('food 1')).status_code == 201
+    meal_plan = week_plan('food 1')
+    meal_plan['Monday']['lunch'][0] = {**meal_plan['Monday']['lunch'][0], 'name': 'food 2'}
+
+    with count_statements() as statements:
+        response = save_plan(meal_plan, 'diff')
+
+    assert response.status_code == 201
+    assert response.get_json()['updated'] == 1
+    # adherence invalidation (cached scores, watermark), SELECT of the stored week, one bulk UPDATE
+    assert len(statements) == 4, statements